@@ -11,11 +11,21 @@ class Settings(BaseSettings):
     
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "undefined")
+    MONGODB_BULK_CHUNK_SIZE: int = int(os.getenv("MONGODB_BULK_CHUNK_SIZE", "1000"))  # 批量写入每批最大操作数
+    MONGODB_CHECK_QUERY_PLANS: bool = os.getenv("MONGODB_CHECK_QUERY_PLANS", "false").lower() == "true"  # 启动时explain已登记的查询形态，发现全表扫描时告警
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")  # /internal/metrics的访问令牌（请求头X-Metrics-Token），为空时不开放该接口
     
     # Auth0配置
     
     WECHAT_APP_ID: str = os.getenv("WECHAT_APP_ID", "wx78a6328bda6d1b87")
     WECHAT_APP_SECRET: str = os.getenv("WECHAT_APP_SECRET", "23008719bb083537d11d8d66068fb535")
+    WECHAT_API_BASE_URL: str = os.getenv("WECHAT_API_BASE_URL", "https://api.weixin.qq.com")  # 微信接口地址（可指向本地桩服务）
+    WECHAT_CODE_SESSION_TTL: int = int(os.getenv("WECHAT_CODE_SESSION_TTL", "300"))  # code2session结果缓存时间（秒），与code有效期一致
+    WECHAT_CODE_ERROR_TTL: int = int(os.getenv("WECHAT_CODE_ERROR_TTL", "10"))  # code无效/已使用时失败结果的缓存时间（秒）
+    WECHAT_DECRYPT_OFFLOAD_BYTES: int = int(os.getenv("WECHAT_DECRYPT_OFFLOAD_BYTES", "16384"))  # 加密数据超过该长度时在线程池中解密
+    WECHAT_TOKEN_REFRESH_AHEAD: int = int(os.getenv("WECHAT_TOKEN_REFRESH_AHEAD", "300"))  # access_token过期前多少秒刷新（旧token在换发后仅5分钟有效，不应超过300）
+    WECHAT_TOKEN_SYNC_INTERVAL: int = int(os.getenv("WECHAT_TOKEN_SYNC_INTERVAL", "60"))  # 各worker读取Redis中最新token的间隔（秒）
+    WECHAT_TOKEN_LOCK_MS: int = int(os.getenv("WECHAT_TOKEN_LOCK_MS", "15000"))  # 刷新锁有效期（毫秒），应大于HTTP请求超时
 
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: str = os.getenv("REDIS_PORT", "6379")
@@ -23,7 +33,69 @@ class Settings(BaseSettings):
     REDIS_USERNAME: str = os.getenv("REDIS_USERNAME", "")
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "")
     REDIS_PREFIX: str = os.getenv("REDIS_PREFIX", "undefined:")
+    REDIS_MODE: str = os.getenv("REDIS_MODE", "standalone")  # 部署模式: standalone / sentinel / cluster
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "2000"))  # 连接池上限（cluster模式为每个节点）
+    REDIS_SENTINELS: str = os.getenv("REDIS_SENTINELS", "")  # 哨兵地址，逗号分隔: host1:26379,host2:26379
+    REDIS_SENTINEL_SERVICE: str = os.getenv("REDIS_SENTINEL_SERVICE", "mymaster")  # 哨兵监控的主节点名称
+    REDIS_SENTINEL_PASSWORD: str = os.getenv("REDIS_SENTINEL_PASSWORD", "")
+    REDIS_CLUSTER_NODES: str = os.getenv("REDIS_CLUSTER_NODES", "")  # 集群启动节点，逗号分隔；为空时使用REDIS_HOST:REDIS_PORT
+    REDIS_REPLICA_HOSTS: str = os.getenv("REDIS_REPLICA_HOSTS", "")  # standalone模式的只读副本，逗号分隔: host1:6379,host2:6379
+    REDIS_READ_FROM_REPLICAS: bool = os.getenv("REDIS_READ_FROM_REPLICAS", "false").lower() == "true"  # 可容忍短暂旧数据的读路由到副本：两级缓存等待回源时的轮询、系统配置缓存（登录态等始终读主节点）
+    REDIS_READ_TIMEOUT_MS: int = int(os.getenv("REDIS_READ_TIMEOUT_MS", "50"))  # 读操作截止时间（毫秒）
+    REDIS_WRITE_TIMEOUT_MS: int = int(os.getenv("REDIS_WRITE_TIMEOUT_MS", "100"))  # 写操作截止时间（毫秒）
+    REDIS_PIPELINE_TIMEOUT_MS: int = int(os.getenv("REDIS_PIPELINE_TIMEOUT_MS", "300"))  # pipeline截止时间（毫秒）
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))  # socket读写超时（秒）
+    REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1"))  # socket连接超时（秒）
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", "5"))  # 连续失败/慢调用次数达到后熔断
+    REDIS_BREAKER_SLOW_CALL_MS: int = int(os.getenv("REDIS_BREAKER_SLOW_CALL_MS", "100"))  # 单命令延迟SLO（毫秒），超过记为慢调用
+    REDIS_BREAKER_SLOW_PIPELINE_MS: int = int(os.getenv("REDIS_BREAKER_SLOW_PIPELINE_MS", "300"))  # pipeline/批量脚本的延迟SLO（毫秒），默认同pipeline截止时间
+    REDIS_BREAKER_RESET_TIMEOUT: float = float(os.getenv("REDIS_BREAKER_RESET_TIMEOUT", "2"))  # 熔断后半开探测间隔（秒）
+    REDIS_DEGRADED_START: bool = os.getenv("REDIS_DEGRADED_START", "true").lower() == "true"  # Redis不可用时是否以降级模式启动
+    REDIS_READ_BATCHING: bool = os.getenv("REDIS_READ_BATCHING", "false").lower() == "true"  # 是否合并并发GET为MGET
+    REDIS_READ_BATCH_WINDOW_MS: float = float(os.getenv("REDIS_READ_BATCH_WINDOW_MS", "0"))  # 合并窗口（毫秒），0表示同一事件循环轮次
+    REDIS_READ_BATCH_MAX: int = int(os.getenv("REDIS_READ_BATCH_MAX", "100"))  # 单批最大键数
+    # 值编码: json / msgpack。新版本读取兼容两者，旧版本只能读json：先以json发布，全部worker升级后再切换为msgpack
+    REDIS_CODEC: str = os.getenv("REDIS_CODEC", "json")
+    REDIS_CODEC_COMPRESS_THRESHOLD: int = int(os.getenv("REDIS_CODEC_COMPRESS_THRESHOLD", "1024"))  # 超过该字节数时压缩，0为不压缩
+    REDIS_CODEC_COMPRESS_LEVEL: int = int(os.getenv("REDIS_CODEC_COMPRESS_LEVEL", "1"))  # zlib压缩级别
+
+    # 用户缓存配置
+    USER_CACHE_L1_MAXSIZE: int = int(os.getenv("USER_CACHE_L1_MAXSIZE", "10000"))  # 进程内缓存最大用户数
+    USER_CACHE_L1_TTL: int = int(os.getenv("USER_CACHE_L1_TTL", "300"))  # 进程内缓存过期时间（秒）
+    USER_CACHE_REDIS_TTL: int = int(os.getenv("USER_CACHE_REDIS_TTL", "3600"))  # Redis缓存过期时间（秒）
+    USER_CACHE_REFRESH_AHEAD_RATIO: float = float(os.getenv("USER_CACHE_REFRESH_AHEAD_RATIO", "0.2"))  # TTL剩余比例低于该值时后台刷新
+    USER_CACHE_REFRESH_CONCURRENCY: int = int(os.getenv("USER_CACHE_REFRESH_CONCURRENCY", "16"))  # 后台刷新最大并发数
+    USER_CACHE_WRITE_BEHIND_MAX_PENDING: int = int(os.getenv("USER_CACHE_WRITE_BEHIND_MAX_PENDING", "10000"))  # 待写入Redis的最大条目数
+    USER_CACHE_WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("USER_CACHE_WRITE_BEHIND_BATCH_SIZE", "200"))  # 单次pipeline最大条目数
+    USER_CACHE_WRITE_BEHIND_FLUSH_MS: int = int(os.getenv("USER_CACHE_WRITE_BEHIND_FLUSH_MS", "5"))  # 批量刷写间隔（毫秒）
+    USER_CACHE_TOKEN_INDEX_MAXSIZE: int = int(os.getenv("USER_CACHE_TOKEN_INDEX_MAXSIZE", "100000"))  # token->用户ID索引大小（Redis降级时用于回源）
+    USER_CACHE_DEGRADED_CONCURRENCY: int = int(os.getenv("USER_CACHE_DEGRADED_CONCURRENCY", "32"))  # Redis降级时回源数据库的最大并发数
+    USER_CACHE_L1_BACKEND: str = os.getenv("USER_CACHE_L1_BACKEND", "memory")  # 内存层实现: memory(进程内) / shared(同主机worker共享)
+    USER_CACHE_SHM_SLOTS: int = int(os.getenv("USER_CACHE_SHM_SLOTS", "8192"))  # 共享内存缓存槽数
+    USER_CACHE_SHM_SLOT_SIZE: int = int(os.getenv("USER_CACHE_SHM_SLOT_SIZE", "4096"))  # 共享内存缓存单槽字节数
+
+    # 通用两级缓存配置（@cached）
+    CACHE_L1_MAXSIZE: int = int(os.getenv("CACHE_L1_MAXSIZE", "1024"))  # 每个缓存的进程内最大条目数
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "30"))  # 进程内缓存过期时间（秒），其他worker的失效依赖该过期
+    CACHE_TTL_JITTER: float = float(os.getenv("CACHE_TTL_JITTER", "0.1"))  # Redis过期时间随机抖动比例
+    CACHE_LOCK_MS: int = int(os.getenv("CACHE_LOCK_MS", "2000"))  # 回源重建锁有效期（毫秒），也是其他进程的最长等待时间
+
+    # 限流配置（GCRA，任意60秒滑动区间内的额度上限；普通接口成本为1，路由可用rate_limit_cost标注成本）
+    RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "600"))  # 已登录用户额度
+    RATE_LIMIT_ANONYMOUS_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_ANONYMOUS_PER_MINUTE", "300"))  # 未登录（按IP）额度
+    RATE_LIMIT_MODE: str = os.getenv("RATE_LIMIT_MODE", "redis")  # redis: 每次请求一次原子往返；hybrid: 本地令牌桶+定期对账
+    RATE_LIMIT_SYNC_MS: int = int(os.getenv("RATE_LIMIT_SYNC_MS", "200"))  # hybrid模式对账间隔（毫秒）
+    RATE_LIMIT_LOCAL_SHARE: float = float(os.getenv("RATE_LIMIT_LOCAL_SHARE", "0.1"))  # hybrid模式每个worker可先行放行的额度比例
     
+    # 出站HTTP客户端配置
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "10"))  # 请求超时（秒）
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))  # 建立连接超时（秒）
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))  # 其他域名共用连接池的总连接数
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "50"))  # 单个外部服务的最大连接数
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # 空闲连接保持时间（秒）
+    HTTP_DNS_CACHE_TTL: float = float(os.getenv("HTTP_DNS_CACHE_TTL", "300"))  # DNS解析缓存时间（秒）
+    HTTP_CONNECT_RETRIES: int = int(os.getenv("HTTP_CONNECT_RETRIES", "1"))  # 建立连接失败时的重试次数
+
     # DeepSeek AI配置
     DEEPSEEK_API_KEY: str = os.getenv("DEEPSEEK_API_KEY", "")
     DEEPSEEK_BASE_URL: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
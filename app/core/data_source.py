@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from app.core.config import settings
 from app.entities import (User, SystemConfig)
+from app.core.migrations import migrate_indexes
 from datetime import timezone
 # 创建一个全局client变量
 client: AsyncIOMotorClient = None
@@ -24,9 +25,13 @@ async def init_db():
         tzinfo=timezone.utc  # 指定默认时区为UTC
     )
     
+    # 建立新的唯一索引前先合并重复数据（init_beanie遇到重复数据会建索引失败）
+    database = client[settings.DATABASE_NAME]
+    await migrate_indexes(database)
+
     # 初始化Beanie
     await init_beanie(
-        database=client[settings.DATABASE_NAME],
+        database=database,
         document_models=[
             User,
             SystemConfig
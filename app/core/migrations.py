@@ -0,0 +1,133 @@
+from datetime import datetime, UTC
+from typing import Any, Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from app.entities.user_entity import User
+from app.utils.search_tokens import ngram_tokens
+from app.utils.logger_service import logger
+
+# 合并重复用户时，保留用户为空则从被合并用户补全的字段
+MERGE_FIELDS = (
+    "wechat_openid", "wechat_unionid", "nickname", "avatar_url", "name", "bio", "status", "country", "province", "city",
+)
+# 唯一索引建立失败（滚动发布期间旧版本又写入了重复数据）时的最大重试次数
+MAX_UNIQUE_INDEX_ATTEMPTS = 3
+# 已被created_at_id_active等部分索引取代的旧索引（存在时删除）
+LEGACY_INDEXES = ("created_at_1", "created_at_-1", "is_deleted_1")
+
+
+async def migrate_indexes(database: AsyncIOMotorDatabase) -> None:
+    """
+    在init_beanie之前执行：为User上新增的唯一索引做准备，并删除已不再声明的旧索引
+    唯一索引已存在时直接跳过，只在首次部署时扫描重复数据
+    """
+    collection = database[User.Settings.name]
+    await ensure_unique_index(collection, "wechat_openid_unique", "wechat_openid", drop=["wechat_openid_1"])
+    # 先按openid合并，再按unionid合并（同一主体下的多个应用各有openid，unionid相同）
+    await ensure_unique_index(collection, "wechat_unionid_unique", "wechat_unionid", drop=["wechat_unionid_1"])
+    # 被部分索引取代的旧单字段索引
+    existing = await collection.index_information()
+    for old_name in LEGACY_INDEXES:
+        if old_name in existing:
+            await collection.drop_index(old_name)
+            logger.info(f"已删除被部分索引取代的索引{old_name}")
+    await drop_text_indexes(collection)
+
+
+def _index_model(name: str):
+    for index in User.Settings.indexes:
+        if getattr(index, "document", {}).get("name") == name:
+            return index
+    raise ValueError(f"User未声明索引: {name}")
+
+
+async def ensure_unique_index(collection, name: str, field: str, drop: List[str] = ()) -> None:
+    """
+    唯一索引不存在时先合并未删除用户中field重复的数据，再按User中的声明建立唯一索引；之后删除被取代的旧索引
+    多个worker同时启动时重复执行也是安全的（合并幂等，建立相同索引为空操作）
+    """
+    existing = await collection.index_information()
+    if name not in existing:
+        await _build_unique_index(collection, name, field)
+    for old_name in drop:
+        if old_name in existing:
+            await collection.drop_index(old_name)
+            logger.info(f"已删除被{name}取代的索引{old_name}")
+
+
+async def drop_text_indexes(collection) -> List[str]:
+    """
+    删除旧的昵称/姓名全文索引（检索已改用n-gram检索词，见app/utils/search_tokens.py）
+    User不再声明text索引，集合上的text索引都是遗留的；返回删除的索引名
+    """
+    dropped = []
+    for name, info in (await collection.index_information()).items():
+        if any(kind == "text" for _, kind in info["key"]):
+            await collection.drop_index(name)
+            dropped.append(name)
+            logger.info(f"已删除不再使用的全文索引{name}")
+    return dropped
+
+
+async def _build_unique_index(collection, name: str, field: str) -> None:
+    index = _index_model(name)
+    for attempt in range(1, MAX_UNIQUE_INDEX_ATTEMPTS + 1):
+        merged = await merge_duplicate_users(collection, field)
+        if merged:
+            logger.warning(f"已合并{merged}个{field}重复的用户")
+        try:
+            await collection.create_indexes([index])
+            break
+        except (DuplicateKeyError, OperationFailure) as e:
+            if attempt == MAX_UNIQUE_INDEX_ATTEMPTS or getattr(e, "code", None) != 11000:
+                raise
+            logger.warning(f"建立索引{name}时仍有重复数据，重新合并: {e}")
+
+
+async def merge_duplicate_users(collection, field: str) -> int:
+    """
+    按field合并重复的未删除用户：保留最早创建的用户，空字段从较新的重复用户补全，
+    fcm_token合并，其余用户软删除并在metadata.merged_into中记录保留用户ID；返回软删除的用户数
+    """
+    groups = await collection.aggregate([
+        {"$match": {field: {"$gt": ""}, "is_deleted": False}},
+        {"$group": {"_id": f"${field}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True).to_list(length=None)
+
+    now = datetime.now(UTC)
+    operations: List[UpdateOne] = []
+    for group in groups:
+        users = await collection.find({"_id": {"$in": group["ids"]}}).sort([("created_at", 1), ("_id", 1)]).to_list(
+            length=None
+        )
+        keeper, duplicates = users[0], users[1:]
+        changes: Dict[str, Any] = {}
+        for duplicate in reversed(duplicates):
+            for merge_field in MERGE_FIELDS:
+                if not keeper.get(merge_field) and not changes.get(merge_field) and duplicate.get(merge_field):
+                    changes[merge_field] = duplicate[merge_field]
+        fcm_token: Dict[str, Any] = {}
+        for user in duplicates + [keeper]:
+            fcm_token.update(user.get("fcm_token") or {})
+        if fcm_token != (keeper.get("fcm_token") or {}):
+            changes["fcm_token"] = fcm_token
+        for source, tokens_field in (("nickname", "nickname_tokens"), ("name", "name_tokens")):
+            if source in changes:
+                changes[tokens_field] = ngram_tokens(changes[source])
+        if changes:
+            changes["updated_at"] = now
+            operations.append(UpdateOne({"_id": keeper["_id"]}, {"$set": changes}))
+        operations.extend(
+            UpdateOne({"_id": duplicate["_id"]}, {"$set": {
+                "is_deleted": True,
+                "deleted_at": now,
+                "updated_at": now,
+                "metadata.merged_into": keeper["_id"],
+            }})
+            for duplicate in duplicates
+        )
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return sum(len(group["ids"]) - 1 for group in groups)
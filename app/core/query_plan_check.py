@@ -0,0 +1,87 @@
+import sys
+import asyncio
+from typing import Any, Dict, List, Set
+from app.crud.base_crud import BaseCRUD, QueryShape
+from app.utils.logger_service import logger
+
+
+def _winning_plan_stages(plan: Any, stages: List[str], indexes: Set[str]) -> None:
+    """收集执行计划树中的阶段名与使用的索引（兼容经典引擎、SBE的queryPlan与分片的shards）"""
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.append(plan["stage"])
+        if plan.get("indexName"):
+            indexes.add(plan["indexName"])
+        for key, value in plan.items():
+            # rejectedPlans不是实际执行的计划
+            if key != "rejectedPlans":
+                _winning_plan_stages(value, stages, indexes)
+    elif isinstance(plan, list):
+        for item in plan:
+            _winning_plan_stages(item, stages, indexes)
+
+
+async def explain_shape(crud: BaseCRUD, shape: QueryShape) -> Dict[str, Any]:
+    """
+    对单个查询形态执行explain，返回 {"collection", "name", "stages", "indexes", "collscan"}
+    只取1条，检查开销与一次普通查询相当
+    """
+    cursor = crud.model.get_motor_collection().find(shape.filter).limit(1)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    if shape.hint:
+        cursor = cursor.hint(shape.hint)
+    explain = await cursor.explain()
+    stages: List[str] = []
+    indexes: Set[str] = set()
+    _winning_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}), stages, indexes)
+    return {
+        "collection": crud.model.get_collection_name(),
+        "name": shape.name,
+        "stages": stages,
+        "indexes": sorted(indexes),
+        "collscan": "COLLSCAN" in stages,
+    }
+
+
+async def check_query_plans(cruds: List[BaseCRUD] = None) -> List[Dict[str, Any]]:
+    """
+    explain所有CRUD登记的查询形态（QUERY_SHAPES），全表扫描的形态记录告警
+    需在init_db之后调用；单个形态explain失败只记录日志，不影响其他形态
+    """
+    if cruds is None:
+        from app.crud import user_crud, system_config_crud
+        cruds = [user_crud, system_config_crud]
+
+    reports = []
+    for crud in cruds:
+        for shape in crud.QUERY_SHAPES:
+            try:
+                report = await explain_shape(crud, shape)
+            except Exception as e:
+                logger.warning(f"查询形态 {crud.model.__name__}.{shape.name} explain失败: {e}")
+                continue
+            if report["collscan"]:
+                logger.warning(f"查询形态 {report['collection']}.{shape.name} 全表扫描: {report['stages']}")
+            reports.append(report)
+    return reports
+
+
+async def main() -> int:
+    """命令行入口：打印每个查询形态的执行计划，存在全表扫描时返回1"""
+    from app.core.data_source import init_db, get_client
+    await init_db()
+    try:
+        reports = await check_query_plans()
+    finally:
+        get_client().close()
+    for report in reports:
+        mark = "COLLSCAN" if report["collscan"] else "ok"
+        print(f"[{mark}] {report['collection']}.{report['name']}: "
+              f"{' <- '.join(report['stages'])} indexes={report['indexes']}")
+    return 1 if any(report["collscan"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    # 用法: python -m app.core.query_plan_check
+    sys.exit(asyncio.run(main()))
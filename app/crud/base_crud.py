@@ -1,72 +1,213 @@
-from typing import Generic, TypeVar, Type, List, Optional, Dict, Any, Tuple
+import copy
+from datetime import datetime
+from typing import Generic, TypeVar, Type, List, Optional, Dict, Any, Tuple, Sequence, Union
 from beanie import Document
-from pydantic import BaseModel
+from beanie.odm.utils.encoder import Encoder
+from pydantic import BaseModel, ConfigDict, create_model
+from pydantic_core import PydanticUndefined
+from pymongo import InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
 
 ModelType = TypeVar("ModelType", bound=Document)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+ProjectionType = TypeVar("ProjectionType", bound=BaseModel)
+
+# 可直接写入BSON、无需经过Encoder的值类型（按精确类型判断，str子类如枚举仍需编码）
+BSON_NATIVE_TYPES = {str, int, float, bool, type(None), datetime}
+
+
+class BulkWriteResult:
+    """
+    批量写入结果
+    errors中每项为 {"index": 调用方传入列表中的下标, "code": 错误码, "message": 错误信息}
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.matched = 0
+        self.modified = 0
+        self.upserted = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "matched": self.matched,
+            "modified": self.modified,
+            "upserted": self.upserted,
+            "errors": self.errors,
+        }
+
+
+class QueryShape:
+    """
+    登记的查询形态，供执行计划检查（app/core/query_plan_check.py）对其explain
+    filter中的值仅为示例，执行计划取决于字段与操作符；聚合查询登记其$match与排序
+    """
+
+    def __init__(
+        self,
+        name: str,
+        filter: Dict[str, Any],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        hint: Optional[str] = None,
+    ):
+        self.name = name
+        self.filter = filter
+        self.sort = sort
+        self.hint = hint
 
 
 class BaseCRUD(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # update不会写入的字段（主键与由服务器维护的时间戳）
+    IMMUTABLE_FIELDS = {"id", "_id", "created_at", "updated_at"}
+    # 热点查询的形态，子类登记后由执行计划检查确认其走索引
+    QUERY_SHAPES: List[QueryShape] = []
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD基类，提供默认的数据库操作
         """
         self.model = model
+        self._encoder = Encoder(to_db=True)
+        # (字段名, 数据库字段名, 字段定义)，用于跳过校验的批量写入
+        self._fields = [
+            (name, field.alias or name, field)
+            for name, field in model.model_fields.items()
+            if name != "revision_id"
+        ]
+        # fields组合 -> 动态生成的精简读模型
+        self._field_projections: Dict[Tuple[str, ...], Type[BaseModel]] = {}
+
+    def _encode_value(self, value: Any) -> Any:
+        """
+        值转为BSON可存储的类型（与find_one_and_update一致使用Encoder，如枚举、子模型、Decimal）
+        原生类型直接保留、dict/list逐项处理，只有其余类型才走Encoder（Encoder处理每个容器都有数微秒开销）
+        """
+        value_type = type(value)
+        if value_type in BSON_NATIVE_TYPES:
+            return value
+        if value_type is dict:
+            return {key: self._encode_value(item) for key, item in value.items()}
+        if value_type is list or value_type is tuple:
+            return [self._encode_value(item) for item in value]
+        return self._encoder.encode(value)
+
+    def _derived_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据本次写入的字段计算需要同步写入的派生字段（如检索词），子类按需覆盖
+        create/update及批量写入都会调用
+        """
+        return {}
 
     async def create(self, obj_in: CreateSchemaType) -> ModelType:
         """
         创建对象
         """
         obj_data = obj_in.model_dump(exclude_none=True)
+        obj_data.update(self._derived_fields(obj_data))
         db_obj = self.model(**obj_data)
         await db_obj.insert()
         return db_obj
 
-    async def get(self, id: str) -> Optional[ModelType]:
+    async def get(
+        self,
+        id: str,
+        projection: Optional[Type[ProjectionType]] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Union[ModelType, ProjectionType]]:
         """
         通过ID获取对象
+        指定projection（读模型）或fields（字段名列表）时，只从数据库读取并校验这些字段
         """
-        return await self.model.get(id)
+        projection = self._projection(projection, fields)
+        if projection is None:
+            return await self.model.get(id)
+        return await self.model.find_one({"_id": id}, projection_model=projection)
+
+    def _projection(
+        self, projection: Optional[Type[BaseModel]], fields: Optional[Sequence[str]]
+    ) -> Optional[Type[BaseModel]]:
+        """解析投影：projection优先；fields按字段组合生成并缓存只含这些字段（及id）的读模型"""
+        if projection is not None or not fields:
+            return projection
+        key = tuple(sorted(set(fields) | {"id"}))
+        model = self._field_projections.get(key)
+        if model is None:
+            model_fields = self.model.model_fields
+            unknown = [name for name in key if name not in model_fields]
+            if unknown:
+                raise ValueError(f"{self.model.__name__}没有字段: {unknown}")
+            model = create_model(
+                f"{self.model.__name__}Projection",
+                __config__=ConfigDict(populate_by_name=True, arbitrary_types_allowed=True),
+                **{name: (model_fields[name].annotation, model_fields[name]) for name in key}
+            )
+            self._field_projections[key] = model
+        return model
 
     async def update(self, id: str, obj_in: UpdateSchemaType) -> Optional[ModelType]:
         """
-        更新对象
+        更新对象（单条find_one_and_update，$set只包含提交的非空字段，返回更新后的对象）
         """
         update_data = {
             k: v for k, v in obj_in.model_dump(exclude_unset=True).items()
-            if v is not None
+            if v is not None and k not in self.IMMUTABLE_FIELDS
         }
         
         if not update_data:
             return await self.get(id)
-        db_obj = await self.get(id)
-        if db_obj:
-            for field, value in update_data.items():
-                setattr(db_obj, field, value)
-            await db_obj.save()
-        
-        return db_obj
+        update_data.update(self._derived_fields(update_data))
+        return await self.find_one_and_update({"_id": id}, {"$set": update_data})
+
+    def _soft_delete_update(self) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """软删除的更新操作（delete与bulk_soft_delete共用），子类可覆盖以附加其他改动"""
+        return {"$set": {"is_deleted": True}, "$currentDate": {"deleted_at": True, "updated_at": True}}
+
+    async def _after_write(self, ids: List[Any]) -> None:
+        """
+        批量写入完成后的钩子（如失效缓存），ids为可能被修改的对象ID，子类按需覆盖
+        单条的update/delete由子类自行处理
+        """
+
+    @property
+    def _has_after_write(self) -> bool:
+        return type(self)._after_write is not BaseCRUD._after_write
 
     async def delete(self, id: str) -> bool:
         """
-        删除对象
+        软删除对象（单条语句，删除时间由服务器写入）
         """
-        db_obj = await self.get(id)
-        if db_obj:
-            await db_obj.soft_delete()
-            return True
-        return False
+        result = await self.model.get_motor_collection().update_one({"_id": id}, self._soft_delete_update())
+        return result.matched_count > 0
 
     async def increment_field(self, id: str, field: str, value: int) -> Optional[ModelType]:
         """
-        增加对象字段值
+        增加对象字段值（$inc原子自增，并发时不会丢失增量）
         """
-        db_obj = await self.get(id)
-        if db_obj:
-            setattr(db_obj, field, getattr(db_obj, field) + value)
-            await db_obj.save()
-        return db_obj
+        return await self.find_one_and_update({"_id": id}, {"$inc": {field: value}})
+
+    async def find_one_and_update(self, query: Dict, update: Dict[str, Any]) -> Optional[ModelType]:
+        """
+        按更新操作符原子更新单个对象并返回更新后的对象，不存在时返回None
+        updated_at由服务器时间写入（$currentDate），不经过文档状态跟踪和save()
+        """
+        update = {key: self._encoder.encode(value) for key, value in update.items()}
+        update.setdefault("$currentDate", {})["updated_at"] = True
+        document = await self.model.get_motor_collection().find_one_and_update(
+            query,
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if document is None:
+            return None
+        return self.model.model_validate(document)
 
     async def count(self, query: Dict = None) -> int:
         """
@@ -76,14 +217,178 @@ class BaseCRUD(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             query = {}
         return await self.model.find(query).count()
     
-    async def find(self, query: Dict = None) -> List[ModelType]:
+    async def find(
+        self,
+        query: Dict = None,
+        projection: Optional[Type[ProjectionType]] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Union[ModelType, ProjectionType]]:
         """
-        查找对象
+        查找对象（projection/fields用法同get）
         """
-        return await self.model.find(query).to_list()
+        return await self.model.find(query, projection_model=self._projection(projection, fields)).to_list()
         
-    async def find_one(self, query: Dict = None) -> Optional[ModelType]:
+    async def find_one(
+        self,
+        query: Dict = None,
+        projection: Optional[Type[ProjectionType]] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Union[ModelType, ProjectionType]]:
+        """
+        查找单个对象（projection/fields用法同get）
+        """
+        return await self.model.find_one(query, projection_model=self._projection(projection, fields))
+
+    def _to_document(self, obj_in: CreateSchemaType, validate: bool = True) -> Dict[str, Any]:
         """
-        查找单个对象
+        创建数据转为数据库文档（字段值经_encode_value编码）
+        validate为False时不构造模型，直接按字段默认值补全（比model_construct更快），类型由调用方保证
+        """
+        obj_data = obj_in.model_dump(exclude_none=True)
+        obj_data.update(self._derived_fields(obj_data))
+        if validate:
+            return self._encode_value(self.model(**obj_data).model_dump(by_alias=True, exclude={"revision_id"}))
+        document = {}
+        for name, key, field in self._fields:
+            if name in obj_data:
+                document[key] = obj_data[name]
+            elif field.default_factory is not None:
+                document[key] = field.default_factory()
+            elif field.default is not PydanticUndefined:
+                document[key] = copy.copy(field.default)
+        return self._encode_value(document)
+
+    def _update_fields(self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]) -> Dict[str, Any]:
+        """提取需要$set的字段（与update一致：只取提交的非空字段，忽略不可修改字段），字段值经_encode_value编码"""
+        if isinstance(obj_in, BaseModel):
+            obj_in = obj_in.model_dump(exclude_unset=True)
+        update_data = {
+            k: v for k, v in obj_in.items()
+            if v is not None and k not in self.IMMUTABLE_FIELDS
+        }
+        if update_data:
+            update_data.update(self._derived_fields(update_data))
+        return self._encode_value(update_data)
+
+    async def _bulk_write(self, operations: List[Tuple[int, Any]], chunk_size: Optional[int] = None) -> BulkWriteResult:
         """
-        return await self.model.find_one(query)
\ No newline at end of file
+        按chunk_size分批执行无序bulk_write（单批失败的条目不影响其他条目）
+        operations为 (调用方列表下标, 写操作) 列表
+        """
+        chunk_size = chunk_size or settings.MONGODB_BULK_CHUNK_SIZE
+        collection = self.model.get_motor_collection()
+        result = BulkWriteResult()
+        for start in range(0, len(operations), chunk_size):
+            chunk = operations[start:start + chunk_size]
+            try:
+                chunk_result = await collection.bulk_write([op for _, op in chunk], ordered=False)
+                details = chunk_result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for error in details.get("writeErrors", []):
+                    result.errors.append({
+                        "index": chunk[error["index"]][0],
+                        "code": error.get("code"),
+                        "message": error.get("errmsg"),
+                    })
+            result.inserted += details.get("nInserted", 0)
+            result.matched += details.get("nMatched", 0)
+            result.modified += details.get("nModified", 0)
+            result.upserted += details.get("nUpserted", 0)
+        return result
+
+    async def bulk_create(
+        self, objs_in: Sequence[CreateSchemaType], validate: bool = True, chunk_size: Optional[int] = None
+    ) -> BulkWriteResult:
+        """
+        批量创建对象
+        validate为False时跳过逐条模型校验（调用方保证数据合法，如回填脚本），大批量时可显著降低CPU开销
+        """
+        operations = [
+            (index, InsertOne(self._to_document(obj_in, validate)))
+            for index, obj_in in enumerate(objs_in)
+        ]
+        return await self._bulk_write(operations, chunk_size)
+
+    async def bulk_update(
+        self,
+        updates: Sequence[Tuple[str, Union[UpdateSchemaType, Dict[str, Any]]]],
+        chunk_size: Optional[int] = None
+    ) -> BulkWriteResult:
+        """
+        批量更新对象，updates为 (id, 更新数据) 列表；每条为一次$set，updated_at由服务器写入
+        没有可更新字段的条目直接跳过
+        """
+        operations = []
+        ids = []
+        for index, (id, obj_in) in enumerate(updates):
+            update_data = self._update_fields(obj_in)
+            if update_data:
+                ids.append(id)
+                operations.append((index, UpdateOne(
+                    {"_id": id},
+                    {"$set": update_data, "$currentDate": {"updated_at": True}}
+                )))
+        result = await self._bulk_write(operations, chunk_size)
+        if ids:
+            await self._after_write(ids)
+        return result
+
+    async def bulk_upsert(
+        self,
+        objs_in: Sequence[CreateSchemaType],
+        keys: Sequence[str],
+        validate: bool = True,
+        chunk_size: Optional[int] = None
+    ) -> BulkWriteResult:
+        """
+        按keys字段批量插入或更新（keys为字段名，如id、wechat_openid）
+        已存在的对象只$set调用方提交的字段；不存在时插入完整文档（默认值通过$setOnInsert写入）
+        """
+        aliases = {name: alias for name, alias, _ in self._fields}
+        keys = [aliases.get(key, key) for key in keys]
+        operations = []
+        filters = []
+        for index, obj_in in enumerate(objs_in):
+            document = self._to_document(obj_in, validate)
+            update_data = self._update_fields(obj_in)
+            on_insert = {
+                k: v for k, v in document.items()
+                if k not in update_data and k != "updated_at"
+            }
+            update = {"$setOnInsert": on_insert, "$currentDate": {"updated_at": True}}
+            if update_data:
+                update["$set"] = update_data
+            filters.append({key: document[key] for key in keys})
+            operations.append((index, UpdateOne(filters[-1], update, upsert=True)))
+        result = await self._bulk_write(operations, chunk_size)
+        if filters and self._has_after_write:
+            await self._after_write(await self._matching_ids(filters, chunk_size))
+        return result
+
+    async def _matching_ids(self, filters: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[Any]:
+        """按过滤条件查出对象ID（条件本身就是_id时不查询）"""
+        if all(list(query) == ["_id"] for query in filters):
+            return [query["_id"] for query in filters]
+        chunk_size = chunk_size or settings.MONGODB_BULK_CHUNK_SIZE
+        collection = self.model.get_motor_collection()
+        ids = []
+        for start in range(0, len(filters), chunk_size):
+            cursor = collection.find({"$or": filters[start:start + chunk_size]}, {"_id": 1})
+            ids.extend([document["_id"] async for document in cursor])
+        return ids
+
+    async def bulk_soft_delete(self, ids: Sequence[str], chunk_size: Optional[int] = None) -> BulkWriteResult:
+        """批量软删除对象（每批一条UpdateMany，删除时间由服务器写入，更新内容与delete一致）"""
+        chunk_size = chunk_size or settings.MONGODB_BULK_CHUNK_SIZE
+        operations = [
+            (start, UpdateMany(
+                {"_id": {"$in": list(ids[start:start + chunk_size])}},
+                self._soft_delete_update()
+            ))
+            for start in range(0, len(ids), chunk_size)
+        ]
+        result = await self._bulk_write(operations, chunk_size)
+        if ids:
+            await self._after_write(list(ids))
+        return result
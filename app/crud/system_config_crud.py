@@ -1,10 +1,16 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from app.entities.system_config_entity import SystemConfig
-from app.crud.base_crud import BaseCRUD
+from app.crud.base_crud import BaseCRUD, QueryShape
 from app.schemas.system_config_schema import SystemConfigCreate, SystemConfigUpdate
 
 class SystemConfigCRUD(BaseCRUD[SystemConfig, SystemConfigCreate, SystemConfigUpdate]):
+    QUERY_SHAPES = [
+        QueryShape("get_by_key", {"key": "key"}),
+        QueryShape("get_by_keys", {"key": {"$in": ["key1", "key2"]}}),
+        QueryShape("get_public_configs", {"is_public": True}),
+    ]
+
     def __init__(self):
         super().__init__(SystemConfig)
 
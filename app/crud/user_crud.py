@@ -1,21 +1,92 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Type
+from beanie.odm.utils.projection import get_projection
+from pydantic import BaseModel
 from app.entities.user_entity import User
-from app.schemas.user_schema import UserCreate, UserUpdate, UserFilter
-from app.crud.base_crud import BaseCRUD
+from app.schemas.user_schema import UserCreate, UserUpdate, UserFilter, UserSummary
+from app.crud.base_crud import BaseCRUD, QueryShape
+from app.infrastructure.redis.two_tier_cache import cached, invalidate_tags
+from app.utils.search_tokens import ngram_tokens, query_tokens
 from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
+    # 维护检索词的字段：字段 -> 检索词字段
+    SEARCH_FIELDS = {"nickname": "nickname_tokens", "name": "name_tokens"}
+    # 未删除用户的列表索引，用于只按is_deleted过滤的计数
+    ACTIVE_INDEX = "created_at_id_active"
+    # 以下查询都应命中User上的部分索引（partialFilterExpression含is_deleted=False）或_id索引；
+    # 部分索引只在查询条件蕴含其过滤条件时可用，$or的每个分支都需自带is_deleted=False
+    QUERY_SHAPES = [
+        QueryShape("get_by_wechat_openid", {"wechat_openid": "openid", "is_deleted": False}),
+        QueryShape("get_by_wechat_unionid", {"wechat_unionid": "unionid", "is_deleted": False}),
+        QueryShape("get_or_create_wechat_user", {"$or": [
+            {"wechat_openid": "openid", "is_deleted": False},
+            {"wechat_unionid": "unionid", "is_deleted": False},
+        ]}),
+        QueryShape("get_user_fcm_token", {"_id": "id", "is_deleted": False}),
+        QueryShape("get_users_by_ids", {"_id": {"$in": ["id1", "id2"]}, "is_deleted": False}),
+        QueryShape(
+            "search_users_keyword",
+            {"is_deleted": False, "$or": [
+                {"nickname_tokens": {"$all": ["三丰"]}, "is_deleted": False},
+                {"name_tokens": {"$all": ["三丰"]}, "is_deleted": False},
+            ]},
+            sort=[("created_at", -1), ("_id", -1)],
+        ),
+        QueryShape(
+            "search_users_filters",
+            {"is_deleted": False, "gender": 1, "city": "city"},
+            sort=[("created_at", -1), ("_id", -1)],
+        ),
+        QueryShape(
+            "list_users_keyset",
+            {"is_deleted": False, "created_at": {"$lte": datetime(2024, 1, 1)}, "$or": [
+                {"created_at": {"$lt": datetime(2024, 1, 1)}, "is_deleted": False},
+                {"created_at": datetime(2024, 1, 1), "_id": {"$lt": "id"}, "is_deleted": False},
+            ]},
+            sort=[("created_at", -1), ("_id", -1)],
+        ),
+        QueryShape("count_active", {"is_deleted": False}, hint=ACTIVE_INDEX),
+    ]
+
     def __init__(self):
         super().__init__(User)
+
+    def _derived_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """昵称、姓名变更时同步写入检索词"""
+        return {
+            tokens_field: ngram_tokens(data[field] or "")
+            for field, tokens_field in self.SEARCH_FIELDS.items()
+            if field in data
+        }
     
+    async def update(self, id: str, obj_in: UserUpdate) -> Optional[User]:
+        """更新用户并失效相关缓存"""
+        user = await super().update(id, obj_in)
+        await invalidate_tags(f"user:{id}")
+        return user
+
+    def _soft_delete_update(self) -> List[Dict[str, Any]]:
+        """软删除时改名释放原用户名（管道更新，delete与bulk_soft_delete共用）"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        return [{"$set": {
+            "is_deleted": True,
+            "deleted_at": "$$NOW",
+            "updated_at": "$$NOW",
+            # name缺失或为null时$concat结果为null，按空字符串处理
+            "name": {"$concat": ["deleted_", {"$ifNull": ["$name", ""]}, f"_{suffix}"]},
+        }}]
+
+    async def _after_write(self, ids: List[Any]) -> None:
+        """批量写入后失效相关用户缓存"""
+        if ids:
+            await invalidate_tags(*[f"user:{id}" for id in ids])
+
     async def delete(self, id: str) -> bool:
-        """软删除用户"""
-        user = await self.get(id)
-        if user:
-            user.is_deleted = True
-            user.deleted_at = datetime.now()
-            user.name = f"deleted_{user.name}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            await user.save()
+        """软删除用户（单条管道更新，改名释放原用户名）"""
+        if await super().delete(id):
+            await invalidate_tags(f"user:{id}")
             return True
         else:
             return False
@@ -32,61 +103,91 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
         self,
         openid: str,
         unionid: Optional[str] = None,
-        user_info: Optional[Dict] = None
+        user_info: Optional[Dict] = None,
+        metadata: Optional[Dict[str, Any]] = None
     ) -> Tuple[User, bool]:
         """
-        获取或创建微信用户
+        获取或创建微信用户（单次find_one_and_update upsert）
+        - 按openid匹配；提供unionid时同时按unionid匹配，命中同主体其他应用的用户则原子地绑定当前openid
+        - 新用户的资料仅通过$setOnInsert写入，已存在用户的资料不会被覆盖
+        - wechat_openid唯一索引保证并发登录不会重复创建：落败方收到DuplicateKeyError后按openid重试
         
         Args:
             openid: 微信openid
             unionid: 微信unionid（可选）
-            user_info: 微信用户信息（可选）
+            user_info: 微信用户信息（可选，支持nickName/nickname等两种写法）
+            metadata: 新用户的附加元数据（可选）
             
         Returns:
             Tuple[User, bool]: (用户对象, 是否新创建)
         """
-        # 1. 先通过openid查找
-        user = await self.get_by_wechat_openid(openid)
-        if user:
-            return user, False
-            
-        # 2. 如果有unionid，尝试通过unionid查找
+        profile = self._profile_from_user_info(user_info)
+        new_user = User(
+            wechat_openid=openid,
+            wechat_unionid=unionid or "",
+            metadata={**(metadata or {}), "register_time": datetime.now().isoformat()},
+            **profile,
+            **self._derived_fields(profile),
+        )
+        on_insert = new_user.model_dump(by_alias=True, exclude={"revision_id"})
+        bind = {"wechat_openid": on_insert.pop("wechat_openid")}
         if unionid:
-            user = await self.get_by_wechat_unionid(unionid)
-            if user:
-                # 更新openid
-                user.wechat_openid = openid
-                await user.save()
-                return user, False
-        
-        # 3. 创建新用户
-        user_data = {
-            "wechat_openid": openid,
-            "wechat_unionid": unionid,
-            "is_deleted": False,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
+            bind["wechat_unionid"] = on_insert.pop("wechat_unionid")
+            # 每个分支自带is_deleted条件，才能分别命中openid、unionid的部分唯一索引
+            query = {"$or": [
+                {"wechat_openid": openid, "is_deleted": False},
+                {"wechat_unionid": unionid, "is_deleted": False},
+            ]}
+        else:
+            query = {"is_deleted": False, "wechat_openid": openid}
+
+        collection = User.get_motor_collection()
+
+        async def upsert(query: Dict[str, Any], bind: Dict[str, Any], on_insert: Dict[str, Any]) -> Optional[Dict]:
+            return await collection.find_one_and_update(
+                query,
+                {"$set": bind, "$setOnInsert": on_insert},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+
+        try:
+            before = await upsert(query, bind, on_insert)
+        except DuplicateKeyError:
+            # 并发登录已创建该openid的用户，或openid与unionid分别命中了两个用户：以openid对应的用户为准
+            openid_bind = {"wechat_openid": bind["wechat_openid"]}
+            try:
+                before = await upsert(
+                    {"is_deleted": False, "wechat_openid": openid},
+                    openid_bind,
+                    {**on_insert, "wechat_unionid": unionid or ""},
+                )
+                bind = openid_bind
+            except DuplicateKeyError:
+                # 同主体其他应用的并发登录刚用该unionid创建了用户：重新按unionid匹配并绑定openid
+                before = await upsert(query, bind, on_insert)
+
+        if before is None:
+            return new_user, True
+        user = User.model_validate({**before, **bind})
+        if any(before.get(field) != value for field, value in bind.items()):
+            await invalidate_tags(f"user:{user.id}")
+        return user, False
+
+    @staticmethod
+    def _profile_from_user_info(user_info: Optional[Dict]) -> Dict[str, Any]:
+        """从微信用户信息中提取资料字段（忽略为空的值）"""
+        if not user_info:
+            return {}
+        profile = {
+            "nickname": user_info.get("nickName", user_info.get("nickname")),
+            "avatar_url": user_info.get("avatarUrl", user_info.get("avatar_url")),
+            "gender": user_info.get("gender"),
+            "country": user_info.get("country"),
+            "province": user_info.get("province"),
+            "city": user_info.get("city"),
         }
-        
-        # 如果有用户信息，添加到用户数据中
-        if user_info:
-            user_data.update({
-                "nickname": user_info.get("nickName"),
-                "avatar_url": user_info.get("avatarUrl"),
-                "gender": user_info.get("gender"),
-                "country": user_info.get("country"),
-                "province": user_info.get("province"),
-                "city": user_info.get("city"),
-                "language": user_info.get("language"),
-                "metadata": {
-                    "wechat_user_info": user_info,
-                    "register_time": datetime.now().isoformat()
-                }
-            })
-        
-        user_create = UserCreate(**user_data)
-        user = await self.create(user_create)
-        return user, True
+        return {field: value for field, value in profile.items() if value is not None}
 
     async def update_wechat_user_info(
         self,
@@ -120,20 +221,28 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
 
     async def get_user_fcm_token(self, user_id: str) -> Optional[Dict[str, Tuple[str, str]]]:
         """根据用户ID查询用户FCM token"""
-        user = await User.find_one({"_id": user_id, "is_deleted": False})
+        user = await self.find_one({"_id": user_id, "is_deleted": False}, fields=["fcm_token"])
         if user:
             return user.fcm_token
         return None
         
-    async def get_users_by_ids(self, user_ids: List[str]) -> List[User]:
+    @cached(
+        "users_by_ids",
+        key=lambda self, user_ids: ",".join(user_ids),
+        ttl=600,
+        tags=lambda self, user_ids: [f"user:{user_id}" for user_id in user_ids],
+        dump=lambda users: [user.model_dump() for user in users],
+        load=lambda users: [UserSummary(**user) for user in users],
+    )
+    async def get_users_by_ids(self, user_ids: List[str]) -> List[UserSummary]:
         """
-        根据用户ID列表批量查询用户信息
+        根据用户ID列表批量查询用户摘要（只读取UserSummary的字段，不传输metadata等大字段）
         
         Args:
             user_ids: 用户ID列表
             
         Returns:
-            用户列表（过滤掉已删除的用户）
+            用户摘要列表（过滤掉已删除的用户）
         """
         if not user_ids:
             return []
@@ -143,7 +252,7 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
             "is_deleted": False
         }
         
-        users = await User.find(query).to_list()
+        users = await User.find(query, projection_model=UserSummary).to_list()
         return users
 
     async def search_users(
@@ -151,8 +260,9 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
         keyword: Optional[str] = None,
         filters: Optional[UserFilter] = None,
         skip: int = 0,
-        limit: int = 20
-    ) -> Tuple[List[User], int]:
+        limit: int = 20,
+        projection: Type[BaseModel] = UserSummary
+    ) -> Tuple[List[BaseModel], int]:
         """
         搜索用户
         
@@ -161,19 +271,23 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
             filters: 过滤条件
             skip: 跳过数量
             limit: 返回数量限制
+            projection: 返回的读模型（只读取其字段），需要完整文档时传User
             
         Returns:
-            Tuple[List[User], int]: (用户列表, 总数)
+            Tuple[List[BaseModel], int]: (用户列表, 总数)
         """
-        base_query = {"is_deleted": False}
+        base_query: Dict[str, Any] = {"is_deleted": False}
         
         if keyword:
-            base_query.update({
-                "$or": [
-                    {"nickname": {"$regex": keyword, "$options": "i"}},
-                    {"name": {"$regex": keyword, "$options": "i"}},
-                ]
-            })
+            tokens = query_tokens(keyword)
+            if not tokens:
+                return [], 0
+            # 文档需包含关键词的全部检索词（两字关键词即精确子串匹配）；各字段分别走自己的检索词部分索引，
+            # 因此每个分支自带is_deleted条件
+            base_query["$or"] = [
+                {tokens_field: {"$all": tokens}, "is_deleted": False}
+                for tokens_field in self.SEARCH_FIELDS.values()
+            ]
             
         if filters:
             if filters.gender is not None:
@@ -185,10 +299,94 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserUpdate]):
             if filters.city:
                 base_query["city"] = filters.city
         
-        total = await User.find(base_query).count()
-        users = await User.find(base_query).skip(skip).limit(limit).to_list()
+        # 结果与总数在一次聚合中返回
+        page_stages: List[Dict[str, Any]] = [
+            {"$sort": {"created_at": -1, "_id": -1}},
+            {"$skip": skip},
+            {"$limit": limit},
+        ]
+        fields = get_projection(projection)
+        if fields:
+            page_stages.append({"$project": fields})
+        result = await User.get_motor_collection().aggregate([
+            {"$match": base_query},
+            {"$facet": {
+                "items": page_stages,
+                "total": [{"$count": "count"}],
+            }},
+        ]).to_list(length=1)
+        facet = result[0] if result else {"items": [], "total": []}
+        users = [projection.model_validate(document) for document in facet["items"]]
+        total = facet["total"][0]["count"] if facet["total"] else 0
         
         return users, total
 
+    async def backfill_search_tokens(self, batch_size: int = 1000) -> int:
+        """
+        为已有用户补全检索词（上线后执行一次），按_id分批，返回处理的用户数
+        只写检索词字段，不改动updated_at
+        """
+        processed = 0
+        last_id = None
+        while True:
+            query: Dict[str, Any] = {"_id": {"$gt": last_id}} if last_id else {}
+            users = await User.find(
+                query, projection_model=self._projection(None, list(self.SEARCH_FIELDS))
+            ).sort([("_id", 1)]).limit(batch_size).to_list()
+            if not users:
+                return processed
+            await self._bulk_write([
+                (index, UpdateOne(
+                    {"_id": user.id},
+                    {"$set": self._derived_fields({field: getattr(user, field) for field in self.SEARCH_FIELDS})}
+                ))
+                for index, user in enumerate(users)
+            ])
+            processed += len(users)
+            last_id = users[-1].id
+
+    async def list_users_keyset(
+        self,
+        last_created_at: Optional[datetime] = None,
+        last_id: Optional[str] = None,
+        limit: int = 20,
+        direction: str = "before",
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[BaseModel], bool]:
+        """
+        按 (created_at, _id) 键集分页查询未删除用户，使用created_at_id_active索引，翻页深度不影响耗时
+        
+        Args:
+            last_created_at: 上一页最后一条的创建时间（须与last_id同时传入，同时为空时从头开始）
+            last_id: 上一页最后一条的用户ID
+            limit: 返回数量限制
+            direction: before按创建时间从新到旧，after从旧到新
+            fields: 只读取的字段（用法同BaseCRUD.find）
+            
+        Returns:
+            Tuple[List[BaseModel], bool]: (用户列表, 是否还有更多)
+        """
+        if (last_created_at is None) != (last_id is None):
+            raise ValueError("last_created_at与last_id必须同时传入")
+        order = -1 if direction == "before" else 1
+        op = "$lt" if direction == "before" else "$gt"
+        query: Dict[str, Any] = {"is_deleted": False}
+        if last_created_at is not None:
+            # 顶层created_at范围让索引按区间扫描；每个$or分支都带is_deleted才能命中部分索引
+            query["created_at"] = {op + "e": last_created_at}
+            query["$or"] = [
+                {"created_at": {op: last_created_at}, "is_deleted": False},
+                {"created_at": last_created_at, "_id": {op: last_id}, "is_deleted": False},
+            ]
+        # 多取一条判断是否还有更多，避免额外计数
+        users = await User.find(query, projection_model=self._projection(None, fields)).sort(
+            [("created_at", order), ("_id", order)]
+        ).limit(limit + 1).to_list()
+        return users[:limit], len(users) > limit
+
+    async def count_active(self) -> int:
+        """未删除用户数量（条件不含索引字段，需指定部分索引，否则全表扫描）"""
+        return await User.get_motor_collection().count_documents({"is_deleted": False}, hint=self.ACTIVE_INDEX)
+
 # 创建单例实例
 user_crud = UserCRUD()
\ No newline at end of file
@@ -1,5 +1,6 @@
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import Field
+from pymongo import IndexModel
 from datetime import datetime
 from app.entities.base import BaseDocument
 
@@ -19,12 +20,43 @@ class User(BaseDocument):
     status: str = Field(default="")
     
     fcm_token: Dict[str, Tuple[str, str]] = Field(default={})
+    # 检索词（由UserCRUD在写入nickname/name时维护，见app/utils/search_tokens.py）
+    nickname_tokens: List[str] = Field(default_factory=list)
+    name_tokens: List[str] = Field(default_factory=list)
     metadata: Dict[str, Any] = Field(default={})
 
     class Settings:
         name = "users"
         indexes = [
-            [("wechat_openid", 1)],
-            [("wechat_unionid", 1)],
-            [("nickname", "text"), ("name", "text")]
+            # 未删除用户的openid唯一，保证并发登录不会重复创建
+            IndexModel(
+                [("wechat_openid", 1)],
+                name="wechat_openid_unique",
+                unique=True,
+                partialFilterExpression={"wechat_openid": {"$gt": ""}, "is_deleted": False},
+            ),
+            # 同一主体下unionid只对应一个未删除用户（get_or_create_wechat_user按unionid合并账号）
+            IndexModel(
+                [("wechat_unionid", 1)],
+                name="wechat_unionid_unique",
+                unique=True,
+                partialFilterExpression={"wechat_unionid": {"$gt": ""}, "is_deleted": False},
+            ),
+            # 用户列表键集分页：按 (created_at, _id) 排序，只包含未删除用户
+            IndexModel(
+                [("created_at", -1), ("_id", -1)],
+                name="created_at_id_active",
+                partialFilterExpression={"is_deleted": False},
+            ),
+            # 昵称/姓名子串检索（n-gram检索词，支持中文）
+            IndexModel(
+                [("nickname_tokens", 1)],
+                name="nickname_tokens_active",
+                partialFilterExpression={"is_deleted": False},
+            ),
+            IndexModel(
+                [("name_tokens", 1)],
+                name="name_tokens_active",
+                partialFilterExpression={"is_deleted": False},
+            ),
         ]
\ No newline at end of file
@@ -5,12 +5,14 @@ from app.schemas.ai_agent_schema import DecisionRequest, DecisionResponse, Healt
 from app.schemas.response_schema import BaseResponse
 from app.entities.user_entity import User
 from app.middleware.auth_middleware import get_current_user_optional, get_current_user_required
+from app.middleware.rate_limiter import rate_limit_cost
 
 
 router = APIRouter(prefix="/ai-agent", tags=["AI智能决策助手"])
 
 
 @router.post("/decision", response_model=BaseResponse[DecisionResponse])
+@rate_limit_cost(50)
 async def get_decision_advice(
     request: DecisionRequest,
     user: User = Depends(get_current_user_optional),
@@ -46,6 +48,7 @@ async def get_decision_advice(
 
 
 @router.post("/decision/authenticated", response_model=BaseResponse[DecisionResponse])
+@rate_limit_cost(50)
 async def get_decision_advice_authenticated(
     request: DecisionRequest,
     user: User = Depends(get_current_user_required),
@@ -80,6 +83,7 @@ async def get_decision_advice_authenticated(
 
 
 @router.get("/health", response_model=BaseResponse[HealthCheckResponse])
+@rate_limit_cost(0)
 async def health_check(
     ai_agent_controller: AIAgentController = Depends(AIAgentController)
 ):
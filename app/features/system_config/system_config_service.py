@@ -1,6 +1,7 @@
 from typing import Dict, Any, List, Optional
 from app.crud.system_config_crud import system_config_crud
 from app.entities.system_config_entity import SystemConfig
+from app.infrastructure.redis.two_tier_cache import cached, invalidate_tags
 from app.schemas.system_config_schema import (
     SystemConfigCreate,
     SystemConfigUpdate,
@@ -11,6 +12,14 @@ class SystemConfigService:
     def __init__(self):
         self.system_config_crud = system_config_crud
 
+    @cached(
+        "system_config",
+        key=lambda self, keys: ",".join(keys),
+        ttl=300,
+        tags=lambda self, keys: ["system_config"],
+        # 配置可容忍副本复制延迟
+        replica_reads=True,
+    )
     async def get_configs(self, keys: List[str]) -> Dict[str, Any]:
         """获取配置值"""
         data = await self.system_config_crud.get_by_keys(keys)
@@ -30,10 +39,10 @@ class SystemConfigService:
                 str(existing_config.id), 
                 SystemConfigUpdate.model_validate(config_data.model_dump())
             )
-            return data
         else:
             data = await self.system_config_crud.create(config_data)
-            return data
+        await invalidate_tags("system_config")
+        return data
 
     async def update_config(
         self,
@@ -42,11 +51,13 @@ class SystemConfigService:
     ) -> Optional[SystemConfig]:
         """更新配置"""
         data = await self.system_config_crud.update(key, config_data)
+        await invalidate_tags("system_config")
         return data
 
     async def delete_config(self, key: str) -> bool:
         """删除配置"""
         await self.system_config_crud.delete(key)
+        await invalidate_tags("system_config")
         return True
 
 # 全局服务实例
@@ -2,7 +2,8 @@ from fastapi import HTTPException, status
 from app.features.user.user_service import UserService
 from app.schemas.user_schema import (
     UserResponse, UserProfileResponse, WechatCode,
-    WechatUserInfo, WechatLoginResponse, UserUpdate
+    WechatUserInfo, WechatLoginResponse, UserUpdate,
+    UserIncrementalParams, UserIncrementalResponse
 )
 from typing import Dict, Any, Optional, List
 from fastapi import Form, File, UploadFile
@@ -36,4 +37,7 @@ class UserController:
 
     async def update_current_user_info(self, user: User, user_info: UserUpdate) -> UserResponse:
         result = await self.user_service.update_user_info(user.id, user_info)
-        return UserResponse.model_validate(result.model_dump())
\ No newline at end of file
+        return UserResponse.model_validate(result.model_dump())
+
+    async def list_users_incremental(self, params: UserIncrementalParams) -> UserIncrementalResponse:
+        return await self.user_service.list_users_incremental(params)
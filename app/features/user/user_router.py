@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, Body
 from app.features.user.user_controller import UserController
 from app.schemas.user_schema import (
     UserResponse, UserProfileResponse, WechatCode,
-    WechatUserInfo, WechatLoginResponse, UserUpdate
+    WechatUserInfo, WechatLoginResponse, UserUpdate,
+    UserIncrementalParams, UserIncrementalResponse
 )
 from typing import Dict, Any, Optional
 from fastapi import Form
@@ -35,4 +36,18 @@ async def update_current_user_info(
     user_controller: UserController = Depends(UserController)
 ):
     data = await user_controller.update_current_user_info(user, user_info)
-    return BaseResponse.success(data=data)
\ No newline at end of file
+    return BaseResponse.success(data=data)
+
+@router.get("/incremental", response_model=BaseResponse[UserIncrementalResponse])
+async def list_users_incremental(
+    params: UserIncrementalParams = Depends(),
+    user: User = Depends(get_current_user_required),
+    user_controller: UserController = Depends(UserController)
+):
+    """
+    增量获取用户列表（键集分页）
+    
+    首页不传last_id；翻页时传上一页返回的last_id和last_timestamp
+    """
+    data = await user_controller.list_users_incremental(params)
+    return BaseResponse.success(data=data)
@@ -1,6 +1,8 @@
 # app/features/user/user_service.py
 from typing import Dict, Any, Optional
-from app.schemas.user_schema import UserCreate, UserUpdate, UserProfileResponse
+from app.schemas.user_schema import (
+    UserUpdate, UserProfileResponse, UserIncrementalParams, UserIncrementalResponse
+)
 from app.entities.user_entity import User
 from app.crud import user_crud, system_config_crud
 from fastapi import HTTPException
@@ -23,6 +25,7 @@ class UserService:
         - 支持两种 user_info 形态：
           1) 明文：{ nickname/nickName, avatar_url/avatarUrl, gender, country, province, city, language }
           2) 加密：{ encrypted_data, iv, signature, raw_data }
+        - 同一code可重复调用（客户端重试）：code2session结果按code缓存，重试返回同一会话
         """
         try:
             # 1. code -> openid, session_key
@@ -30,23 +33,13 @@ class UserService:
             openid = wechat_data["openid"]
             session_key = wechat_data["session_key"]
 
-            # 2. 查找或创建用户（确保language为字符串，避免MongoDB text index语言覆盖字段报错）
-            user = await self.user_crud.get_by_wechat_openid(openid)
-            if not user:
-                create_data = UserCreate(
-                    wechat_openid=openid,
-                    wechat_unionid=wechat_data.get("unionid"),
-                    # 若你的实体/schema已有默认字符串，这里可省略
-                    # language="zh-CN",
-                    metadata={
-                        "wechat_data": wechat_data,
-                        "register_time": datetime.now(UTC).isoformat()
-                    },
-                    nickname=user_info.get("nickname") if user_info else None,
-                    avatar_url=user_info.get("avatar_url") if user_info else None,
-                    gender=user_info.get("gender") if user_info else None
-                )
-                user = await self.user_crud.create(create_data)
+            # 2. 查找或创建用户（单次原子upsert，并发登录不会重复创建）
+            user, _ = await self.user_crud.get_or_create_wechat_user(
+                openid,
+                unionid=wechat_data.get("unionid"),
+                user_info=user_info,
+                metadata={"wechat_data": wechat_data}
+            )
 
             # 4. 缓存会话（openid -> session_key, user 映射）
             await self.user_cache.cache_user_by_token(
@@ -89,6 +82,46 @@ class UserService:
         user = await self.user_crud.update(user_id, user_info)
         return user
 
+    async def list_users_incremental(self, params: UserIncrementalParams) -> UserIncrementalResponse:
+        """增量获取用户列表（键集分页，只读取公开资料字段）"""
+        last_created_at = params.last_timestamp
+        if last_created_at is not None and not params.last_id:
+            # 只有时间戳无法确定同一时刻内的位置，不能静默从头开始
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "code": 400,
+                    "message": "last_timestamp须与last_id一起传入"
+                }
+            )
+        if params.last_id and last_created_at is None:
+            cursor_user = await self.user_crud.get(params.last_id, fields=["created_at"])
+            if not cursor_user:
+                raise HTTPException(
+                    status_code=400,
+                    detail={
+                        "code": 400,
+                        "message": "无效的last_id"
+                    }
+                )
+            last_created_at = cursor_user.created_at
+
+        users, has_more = await self.user_crud.list_users_keyset(
+            last_created_at=last_created_at,
+            last_id=params.last_id,
+            limit=params.limit,
+            direction=params.direction,
+            fields=list(UserProfileResponse.model_fields)
+        )
+        total = await self.user_crud.count_active() if params.with_total else None
+        return UserIncrementalResponse(
+            items=[UserProfileResponse.model_validate(user, from_attributes=True) for user in users],
+            has_more=has_more,
+            last_id=users[-1].id if users else params.last_id,
+            last_timestamp=users[-1].created_at if users else last_created_at,
+            total=total
+        )
+
     async def get_current_user(self, token: str) -> User:
         cached_user = await self.user_cache.get_user_by_token(token)
         if cached_user:
@@ -3,7 +3,8 @@ import json
 from typing import Dict, Any, List, Optional
 from app.utils.logger_service import logger
 from app.core.config import settings
-from openai import OpenAI
+from openai import AsyncOpenAI
+from app.infrastructure.http.http_client import http_client
 
 class DeepSeekModel:
     """
@@ -21,11 +22,19 @@ class DeepSeekModel:
         if not self.api_key:
             logger.warning("DeepSeek API Key 未配置，请设置环境变量 DEEPSEEK_API_KEY")
 
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url,
-            timeout=30.0
-        )
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """异步客户端（首次使用时创建，复用全局共享的HTTP连接池）"""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=30.0,
+                http_client=http_client.client
+            )
+        return self._client
     
     async def chat_completion(
         self, 
@@ -51,7 +60,7 @@ class DeepSeekModel:
         """
         
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 max_tokens=max_tokens,
@@ -0,0 +1,304 @@
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Iterator, Optional, Tuple
+from app.utils.json_serializer import json_serializer
+from app.utils.logger_service import logger
+
+
+# 文件头: magic, 版本, 桶数, 每桶槽数, 槽大小
+_HEADER = struct.Struct("<4sIIII")
+_HEADER_SIZE = 64
+_MAGIC = b"SHMC"
+_VERSION = 1
+
+# 槽头: seq(顺序锁), flags, key哈希, 过期时间, 最近访问时间, key长度, value长度
+_SLOT = struct.Struct("<IIQddII")
+_SEQ = struct.Struct("<I")
+_ACCESS = struct.Struct("<d")
+_ACCESS_OFFSET = 24
+_FLAG_USED = 1
+_MAX_READ_RETRIES = 16
+
+
+def _default_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=json_serializer, ensure_ascii=False).encode("utf-8")
+
+
+def _default_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+class SharedMemoryCache:
+    """
+    基于mmap的跨进程共享内存缓存（同一主机的多个worker共享一份热点数据）
+    - 固定大小槽位，组相联哈希（每个key只落在一个桶内的ways个槽中）
+    - 条目带TTL；桶满时淘汰最久未访问的槽（近似LRU）
+    - 写入按桶加文件区间锁，读取使用顺序锁（seqlock）无锁读
+    接口与cachetools.TTLCache保持一致，可直接替换UserCache的内存层
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 4096,
+        ttl: float = 300,
+        slot_size: int = 4096,
+        ways: int = 8,
+        path: Optional[str] = None,
+        dumps: Callable[[Any], bytes] = _default_dumps,
+        loads: Callable[[bytes], Any] = _default_loads,
+    ):
+        self.ttl = ttl
+        self.ways = ways
+        self.n_buckets = max(1, (maxsize + ways - 1) // ways)
+        self.maxsize = self.n_buckets * ways
+        self.slot_size = slot_size
+        self._dumps = dumps
+        self._loads = loads
+        self._max_payload = slot_size - _SLOT.size
+        self._thread_lock = threading.Lock()
+        self._stats = {"oversize": 0, "read_retries": 0}
+
+        if path is None:
+            # 布局写入文件名：配置变更（滚动发布）时新worker使用新文件，不改动旧worker仍映射着的文件
+            base_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(base_dir, f"{name}-v{_VERSION}-{self.n_buckets}x{ways}x{slot_size}.cache")
+        self.path = path
+
+        size = _HEADER_SIZE + self.maxsize * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._init_file(size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._mm = mmap.mmap(self._fd, size)
+
+    def _init_file(self, size: int) -> None:
+        """
+        初始化共享文件（多worker同时启动时通过文件锁串行化）
+        只初始化新建的文件；其他进程可能已映射该文件，截断会使其访问时收到SIGBUS，因此布局不一致时报错而不重建
+        """
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            expected = _HEADER.pack(_MAGIC, _VERSION, self.n_buckets, self.ways, self.slot_size)
+            current = os.pread(self._fd, _HEADER.size, 0)
+            current_size = os.fstat(self._fd).st_size
+            if current == expected and current_size == size:
+                return
+            # 新建的文件（或创建后尚未写入文件头）
+            if current_size == 0 or (current_size == size and not current.strip(b"\0")):
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, expected, 0)
+                logger.info(f"共享内存缓存已初始化: {self.path} ({self.maxsize}槽 x {self.slot_size}字节)")
+                return
+            raise ValueError(f"共享内存缓存文件布局不一致: {self.path}")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+    def close(self) -> None:
+        """关闭映射（不删除共享文件，其他worker可能仍在使用）"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # 不能使用内置hash()：各进程的哈希种子不同
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _slot_offset(self, bucket: int, way: int) -> int:
+        return _HEADER_SIZE + (bucket * self.ways + way) * self.slot_size
+
+    def _bucket_lock(self, bucket: int, op: int) -> None:
+        start = self._slot_offset(bucket, 0)
+        fcntl.lockf(self._fd, op, self.ways * self.slot_size, start)
+
+    def _read_slot(self, offset: int) -> Optional[Tuple[int, float, bytes, bytes]]:
+        """顺序锁读取单个槽，返回(hash, 过期时间, key, value)；空槽返回None"""
+        mm = self._mm
+        for _ in range(_MAX_READ_RETRIES):
+            seq, flags, key_hash, expires_at, _, key_len, value_len = _SLOT.unpack_from(mm, offset)
+            if seq & 1:
+                self._stats["read_retries"] += 1
+                continue
+            if not flags & _FLAG_USED:
+                return None
+            if key_len + value_len > self._max_payload:
+                # 读到撕裂的槽头，重试
+                self._stats["read_retries"] += 1
+                continue
+            data_offset = offset + _SLOT.size
+            key = mm[data_offset:data_offset + key_len]
+            value = mm[data_offset + key_len:data_offset + key_len + value_len]
+            if _SEQ.unpack_from(mm, offset)[0] == seq:
+                return key_hash, expires_at, key, value
+            self._stats["read_retries"] += 1
+        return None
+
+    def _find(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """查找key，返回(槽偏移, value字节)"""
+        key_hash = self._hash(key)
+        key_bytes = key.encode("utf-8")
+        bucket = key_hash % self.n_buckets
+        now = time.time()
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            slot = self._read_slot(offset)
+            if slot is None:
+                continue
+            slot_hash, expires_at, slot_key, value = slot
+            if slot_hash == key_hash and slot_key == key_bytes:
+                if expires_at <= now:
+                    return None
+                return offset, value
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        found = self._find(key)
+        if found is None:
+            return default
+        offset, value = found
+        # 更新访问时间（无锁写，仅用于近似LRU）
+        _ACCESS.pack_into(self._mm, offset + _ACCESS_OFFSET, time.time())
+        return self._loads(value)
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def __getitem__(self, key: str) -> Any:
+        found = self._find(key)
+        if found is None:
+            raise KeyError(key)
+        return self._loads(found[1])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        key_bytes = key.encode("utf-8")
+        value_bytes = self._dumps(value)
+        if len(key_bytes) + len(value_bytes) > self._max_payload:
+            self._stats["oversize"] += 1
+            return
+
+        key_hash = self._hash(key)
+        bucket = key_hash % self.n_buckets
+        now = time.time()
+        with self._thread_lock:
+            self._bucket_lock(bucket, fcntl.LOCK_EX)
+            try:
+                offset = self._choose_slot(bucket, key_hash, key_bytes, now)
+                self._write_slot(offset, _FLAG_USED, key_hash, now + self.ttl, now, key_bytes, value_bytes)
+            finally:
+                self._bucket_lock(bucket, fcntl.LOCK_UN)
+
+    def _choose_slot(self, bucket: int, key_hash: int, key_bytes: bytes, now: float) -> int:
+        """选择写入槽：同key槽 > 空槽/过期槽 > 最久未访问槽（调用方需持有桶锁）"""
+        mm = self._mm
+        free_offset = None
+        lru_offset = None
+        lru_access = None
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            _, flags, slot_hash, expires_at, last_access, key_len, _ = _SLOT.unpack_from(mm, offset)
+            if not flags & _FLAG_USED or expires_at <= now:
+                if free_offset is None:
+                    free_offset = offset
+                continue
+            if slot_hash == key_hash:
+                data_offset = offset + _SLOT.size
+                if mm[data_offset:data_offset + key_len] == key_bytes:
+                    return offset
+            if lru_access is None or last_access < lru_access:
+                lru_offset, lru_access = offset, last_access
+        return free_offset if free_offset is not None else lru_offset
+
+    def _write_slot(
+        self, offset: int, flags: int, key_hash: int, expires_at: float,
+        last_access: float, key_bytes: bytes, value_bytes: bytes
+    ) -> None:
+        """顺序锁写入：seq置为奇数 -> 写数据 -> seq置为偶数（调用方需持有桶锁）"""
+        mm = self._mm
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        _SEQ.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF)
+        _SLOT.pack_into(
+            mm, offset, (seq + 1) & 0xFFFFFFFF, flags, key_hash, expires_at,
+            last_access, len(key_bytes), len(value_bytes)
+        )
+        data_offset = offset + _SLOT.size
+        mm[data_offset:data_offset + len(key_bytes)] = key_bytes
+        value_offset = data_offset + len(key_bytes)
+        mm[value_offset:value_offset + len(value_bytes)] = value_bytes
+        _SEQ.pack_into(mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        key_hash = self._hash(key)
+        key_bytes = key.encode("utf-8")
+        bucket = key_hash % self.n_buckets
+        with self._thread_lock:
+            self._bucket_lock(bucket, fcntl.LOCK_EX)
+            try:
+                for way in range(self.ways):
+                    offset = self._slot_offset(bucket, way)
+                    slot = self._read_slot(offset)
+                    if slot is None:
+                        continue
+                    slot_hash, expires_at, slot_key, value = slot
+                    if slot_hash == key_hash and slot_key == key_bytes:
+                        self._write_slot(offset, 0, 0, 0.0, 0.0, b"", b"")
+                        return self._loads(value) if expires_at > time.time() else default
+            finally:
+                self._bucket_lock(bucket, fcntl.LOCK_UN)
+        return default
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """遍历所有未过期条目（全表扫描，仅用于失效与统计等低频操作）"""
+        now = time.time()
+        for index in range(self.maxsize):
+            slot = self._read_slot(_HEADER_SIZE + index * self.slot_size)
+            if slot is None:
+                continue
+            _, expires_at, key, value = slot
+            if expires_at > now:
+                yield key.decode("utf-8"), self._loads(value)
+
+    def clear(self) -> None:
+        for bucket in range(self.n_buckets):
+            with self._thread_lock:
+                self._bucket_lock(bucket, fcntl.LOCK_EX)
+                try:
+                    for way in range(self.ways):
+                        self._write_slot(self._slot_offset(bucket, way), 0, 0, 0.0, 0.0, b"", b"")
+                finally:
+                    self._bucket_lock(bucket, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for index in range(self.maxsize):
+            _, flags, _, expires_at, _, _, _ = _SLOT.unpack_from(self._mm, _HEADER_SIZE + index * self.slot_size)
+            if flags & _FLAG_USED and expires_at > now:
+                count += 1
+        return count
+
+    @property
+    def currsize(self) -> int:
+        return len(self)
+
+    def get_stats(self) -> dict:
+        """获取共享缓存统计信息"""
+        return {
+            "path": self.path,
+            "slots": self.maxsize,
+            "slot_size": self.slot_size,
+            "ways": self.ways,
+            **self._stats,
+        }
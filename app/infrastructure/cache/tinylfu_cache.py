@@ -0,0 +1,206 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+
+class CountMinSketch:
+    """
+    频率估计（Count-Min Sketch，4行，计数上限15）
+    累计增量达到sample_size后所有计数减半，使旧热点逐渐老化
+    """
+
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+    _MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        width = 1
+        while width < max(capacity, 16):
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+        self._sample_size = 10 * max(capacity, 16)
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        h = hash(key)
+        for seed in self._SEEDS:
+            x = (h ^ seed) * 0x100000001B3
+            yield (x ^ (x >> 29)) & self._mask
+
+    def increment(self, key: Hashable) -> None:
+        added = False
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self._MAX_COUNT:
+                row[index] += 1
+                added = True
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._reset()
+
+    def frequency(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            for i, count in enumerate(row):
+                if count:
+                    row[i] = count >> 1
+        self._additions //= 2
+
+    def clear(self) -> None:
+        for row in self._rows:
+            row[:] = bytes(len(row))
+        self._additions = 0
+
+
+class TinyLFUCache:
+    """
+    带TTL的W-TinyLFU缓存
+    - 窗口区（约1%容量，LRU）接收新条目，吸收突发访问
+    - 主区为分段LRU：试用区（20%）+ 保护区（80%）
+    - 访问频率只在get时计数（写入不计）；窗口区淘汰的候选者只有在访问频率高于试用区淘汰者时才被接纳，
+      避免一次性key（如扫描器随机token）挤掉真正的热点
+    接口与cachetools.TTLCache保持一致
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(maxsize, 1)
+        self.ttl = ttl
+        self._window_max = max(1, self.maxsize // 100)
+        main_max = max(self.maxsize - self._window_max, 1)
+        self._protected_max = max(1, main_max * 8 // 10)
+        self._probation_max = main_max - self._protected_max
+
+        self._window: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._probation: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._protected: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._sketch = CountMinSketch(self.maxsize)
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "admission_rejections": 0,
+        }
+
+    def _segment_of(self, key: Hashable) -> Optional["OrderedDict"]:
+        if key in self._window:
+            return self._window
+        if key in self._probation:
+            return self._probation
+        if key in self._protected:
+            return self._protected
+        return None
+
+    def _lookup(self, key: Hashable) -> Tuple[Optional["OrderedDict"], Any]:
+        """查找条目并处理过期，返回(所在分区, 值)"""
+        segment = self._segment_of(key)
+        if segment is None:
+            return None, None
+        value, expires_at = segment[key]
+        if expires_at <= time.monotonic():
+            del segment[key]
+            self._stats["expirations"] += 1
+            return None, None
+        return segment, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._sketch.increment(key)
+        segment, value = self._lookup(key)
+        if segment is None:
+            self._stats["misses"] += 1
+            return default
+        self._stats["hits"] += 1
+        self._on_hit(key, segment)
+        return value
+
+    def __getitem__(self, key: Hashable) -> Any:
+        segment, value = self._lookup(key)
+        if segment is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key)[0] is not None
+
+    def _on_hit(self, key: Hashable, segment: "OrderedDict") -> None:
+        if segment is self._probation:
+            # 试用区命中晋升到保护区，保护区溢出的条目降级回试用区
+            self._protected[key] = self._probation.pop(key)
+            if len(self._protected) > self._protected_max:
+                demoted_key, demoted = self._protected.popitem(last=False)
+                self._probation[demoted_key] = demoted
+        else:
+            segment.move_to_end(key)
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        entry = (value, time.monotonic() + self.ttl)
+        segment = self._segment_of(key)
+        if segment is not None:
+            segment[key] = entry
+            segment.move_to_end(key)
+            return
+
+        # 频率只在get中计数：先未命中再写入的key若在此再计一次，会比只读的key多算一次访问
+        self._window[key] = entry
+        if len(self._window) > self._window_max:
+            candidate_key, candidate = self._window.popitem(last=False)
+            self._admit(candidate_key, candidate)
+
+    def _admit(self, candidate_key: Hashable, candidate: Tuple[Any, float]) -> None:
+        """窗口区淘汰的候选者与试用区淘汰者比较频率，决定是否进入主区"""
+        if len(self._probation) + len(self._protected) < self._probation_max + self._protected_max:
+            self._probation[candidate_key] = candidate
+            return
+
+        victims = self._probation if self._probation else self._protected
+        victim_key, victim = next(iter(victims.items()))
+        if victim[1] <= time.monotonic():
+            del victims[victim_key]
+            self._stats["expirations"] += 1
+            self._probation[candidate_key] = candidate
+            return
+
+        if self._sketch.frequency(candidate_key) > self._sketch.frequency(victim_key):
+            del victims[victim_key]
+            self._probation[candidate_key] = candidate
+        else:
+            self._stats["admission_rejections"] += 1
+        self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        segment, value = self._lookup(key)
+        if segment is None:
+            return default
+        del segment[key]
+        return value
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        now = time.monotonic()
+        for segment in (self._window, self._probation, self._protected):
+            for key, (value, expires_at) in list(segment.items()):
+                if expires_at > now:
+                    yield key, value
+
+    def clear(self) -> None:
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._sketch.clear()
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    @property
+    def currsize(self) -> int:
+        return len(self)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        return {
+            "window_size": len(self._window),
+            "probation_size": len(self._probation),
+            "protected_size": len(self._protected),
+            **self._stats,
+        }
@@ -0,0 +1,145 @@
+import time
+import socket
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+import httpcore
+from app.core.config import settings
+from app.utils.logger_service import logger
+
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    带DNS缓存的网络后端
+    新建连接时按TTL缓存域名解析结果；依次尝试解析到的所有地址（与未缓存时一致），
+    任一地址连接失败即清除该域名的缓存，下次重新解析
+    TLS握手的SNI与证书校验仍使用原域名（由httpcore传入server_hostname）
+    """
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, ttl: float = 300):
+        self._backend = backend
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._stats = {"hits": 0, "misses": 0, "failures": 0}
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        cached = self._cache.get((host, port))
+        if cached is not None and cached[1] > time.monotonic():
+            self._stats["hits"] += 1
+            return cached[0]
+        self._stats["misses"] += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[(host, port)] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = await self._resolve(host, port)
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout, OSError) as e:
+                # 单个A/AAAA记录不可达（如仅IPv4的主机上的IPv6地址）时尝试下一个；地址可能已变更，下次重新解析
+                self._stats["failures"] += 1
+                self._cache.pop((host, port), None)
+                last_error = e
+        if isinstance(last_error, (httpcore.ConnectError, httpcore.ConnectTimeout)):
+            raise last_error
+        # 统一为httpcore异常，使连接重试与httpx的异常映射照常生效
+        raise httpcore.ConnectError(str(last_error)) from last_error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+    def get_stats(self) -> dict:
+        return {"entries": len(self._cache), **self._stats}
+
+
+class HttpClient:
+    """
+    全局共享的出站HTTP客户端（在lifespan中初始化与关闭）
+    - 连接保持与复用，避免每次请求重新进行TCP+TLS握手
+    - 各外部服务域名使用独立连接池，单个域名的连接数受HTTP_MAX_CONNECTIONS_PER_HOST限制
+    - DNS解析结果按HTTP_DNS_CACHE_TTL缓存
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._dns_backend: Optional[CachingDNSBackend] = None
+
+    def _transport(self, limits: httpx.Limits) -> httpx.AsyncHTTPTransport:
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=settings.HTTP_CONNECT_RETRIES)
+        # httpx 0.28未提供传入network_backend的参数，只能替换httpcore连接池的私有属性；
+        # 依赖requirements.txt中固定的httpx==0.28.1/httpcore==1.0.9，升级时属性不存在则直接报错而非静默失去DNS缓存
+        pool = transport._pool
+        if not isinstance(pool, httpcore.AsyncConnectionPool) or not hasattr(pool, "_network_backend"):
+            raise RuntimeError("当前httpcore版本不支持替换network_backend，请检查httpx/httpcore版本")
+        pool._network_backend = self._dns_backend
+        return transport
+
+    async def init(self):
+        """创建客户端"""
+        if self._client is not None:
+            return
+        self._dns_backend = CachingDNSBackend(httpcore.AnyIOBackend(), ttl=settings.HTTP_DNS_CACHE_TTL)
+        keepalive_expiry = settings.HTTP_KEEPALIVE_EXPIRY
+        per_host_limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # 已知外部服务各自一个连接池
+        hosts = {
+            f"{parts.scheme}://{parts.netloc}"
+            for parts in (urlsplit(url) for url in (settings.WECHAT_API_BASE_URL, settings.DEEPSEEK_BASE_URL))
+            if parts.scheme and parts.netloc
+        }
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            transport=self._transport(httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=keepalive_expiry,
+            )),
+            mounts={host: self._transport(per_host_limits) for host in hosts},
+        )
+        logger.info(f"出站HTTP客户端已初始化，独立连接池: {sorted(hosts)}")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取共享客户端"""
+        if self._client is None:
+            raise RuntimeError("HTTP client not initialized. Call init() first.")
+        return self._client
+
+    async def close(self):
+        """关闭所有连接"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> dict:
+        """获取客户端状态"""
+        if self._client is None:
+            return {"status": "not_initialized"}
+        return {
+            "status": "ok",
+            "dns_cache": self._dns_backend.get_stats(),
+        }
+
+
+http_client = HttpClient()
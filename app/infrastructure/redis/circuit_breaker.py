@@ -0,0 +1,128 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional
+from app.utils.logger_service import logger
+
+
+class CircuitOpenError(ConnectionError):
+    """熔断器打开，调用被直接拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - closed: 正常放行；连续失败或连续慢调用（超过延迟SLO）达到阈值后打开
+    - open: 直接拒绝调用；后台每隔reset_timeout秒执行一次探测
+    - half_open: 探测进行中，仍拒绝业务调用；探测成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        probe: Callable[[], Awaitable[object]],
+        failure_threshold: int = 5,
+        slow_call_threshold: float = 0.1,
+        reset_timeout: float = 2.0,
+        probe_timeout: float = 0.5,
+    ):
+        self.name = name
+        self._probe = probe
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "failures": 0,
+            "slow_calls": 0,
+            "rejected": 0,
+            "opened": 0,
+            "probes": 0,
+        }
+
+    def allow(self) -> bool:
+        """是否放行本次调用"""
+        if self.state == self.CLOSED:
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def record_success(self, latency: float, slow_call_threshold: Optional[float] = None) -> None:
+        """记录成功调用；slow_call_threshold按操作类型覆盖默认的延迟SLO（如pipeline、批量脚本）"""
+        if slow_call_threshold is None:
+            slow_call_threshold = self.slow_call_threshold
+        if latency > slow_call_threshold:
+            self._stats["slow_calls"] += 1
+            self._on_failure()
+        else:
+            self._consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self._stats["failures"] += 1
+        self._on_failure()
+
+    def _on_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self.state == self.CLOSED and self._consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self, reason: Optional[str] = None) -> None:
+        """打开熔断器并启动后台探测"""
+        if self.state != self.CLOSED:
+            return
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._stats["opened"] += 1
+        logger.warning(f"{self.name}熔断器打开: {reason or f'连续失败{self._consecutive_failures}次'}")
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        logger.info(f"{self.name}熔断器关闭，恢复正常")
+
+    async def _probe_loop(self) -> None:
+        """后台半开探测，直到探测成功"""
+        while self.state != self.CLOSED:
+            await asyncio.sleep(self.reset_timeout)
+            self.state = self.HALF_OPEN
+            self._stats["probes"] += 1
+            try:
+                async with asyncio.timeout(self.probe_timeout):
+                    await self._probe()
+            except Exception as e:
+                self.state = self.OPEN
+                logger.warning(f"{self.name}熔断器探测失败: {e}")
+                continue
+            self._close()
+
+    async def close(self) -> None:
+        """停止后台探测"""
+        if self._probe_task:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def get_stats(self) -> dict:
+        """获取熔断器状态"""
+        return {
+            "state": self.state,
+            "healthy": self.state == self.CLOSED,
+            "consecutive_failures": self._consecutive_failures,
+            "open_seconds": round(time.monotonic() - self._opened_at, 3) if self._opened_at else 0,
+            **self._stats,
+        }
@@ -0,0 +1,69 @@
+import json
+import zlib
+import msgpack
+from typing import Any, Optional, Union
+from app.utils.json_serializer import json_serializer
+
+
+# 值格式头（1字节）。JSON文本不会以0x00-0x08开头，因此无头部的值按旧版JSON解析
+CODEC_MSGPACK = 0x01
+CODEC_MSGPACK_ZLIB = 0x02
+
+
+class CodecError(ValueError):
+    """Redis值编解码错误"""
+    pass
+
+
+class RedisCodec:
+    """
+    Redis值编解码器
+    - msgpack: 1字节格式头 + msgpack，超过阈值时zlib压缩（仅在压缩后更小时采用）
+    - json: 无格式头的JSON文本（旧格式，默认）
+    解码始终兼容以上所有格式，切换编码无需清空缓存；
+    但旧版本代码无法读取msgpack，需所有worker都升级到本版本后再切换为msgpack（两阶段发布）
+    """
+
+    def __init__(self, name: str = "json", compress_threshold: int = 1024, compress_level: int = 1):
+        if name not in ("msgpack", "json"):
+            raise ValueError(f"不支持的Redis编码: {name}")
+        self.name = name
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def encode(self, value: Any) -> Union[bytes, str]:
+        """序列化值"""
+        if self.name == "json":
+            # default只在遇到不支持的类型时调用，无需二次序列化
+            return json.dumps(value, default=json_serializer, ensure_ascii=False)
+
+        packed = msgpack.packb(value, default=json_serializer, use_bin_type=True)
+        if self.compress_threshold > 0 and len(packed) >= self.compress_threshold:
+            compressed = zlib.compress(packed, self.compress_level)
+            if len(compressed) < len(packed):
+                return bytes((CODEC_MSGPACK_ZLIB,)) + compressed
+        return bytes((CODEC_MSGPACK,)) + packed
+
+    def decode(self, data: Optional[Union[bytes, str]]) -> Any:
+        """反序列化值，兼容旧版JSON文本"""
+        if not data:
+            return None
+        if isinstance(data, str):
+            return self._loads_json(data)
+
+        header = data[0]
+        try:
+            if header == CODEC_MSGPACK:
+                return msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+            if header == CODEC_MSGPACK_ZLIB:
+                return msgpack.unpackb(zlib.decompress(data[1:]), raw=False, strict_map_key=False)
+        except (ValueError, zlib.error, msgpack.UnpackException) as e:
+            raise CodecError(f"Redis值解码失败: {e}") from e
+        return self._loads_json(data)
+
+    @staticmethod
+    def _loads_json(data: Union[bytes, str]) -> Any:
+        try:
+            return json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CodecError(f"Redis值解码失败: {e}") from e
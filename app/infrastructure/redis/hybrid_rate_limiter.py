@@ -0,0 +1,271 @@
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from cachetools import TTLCache
+from app.infrastructure.redis.redis_client import RedisClient, redis_client
+from app.core.config import settings
+from app.utils.logger_service import logger
+
+
+class _LocalBucket:
+    """单个限流键在本worker内的状态"""
+
+    __slots__ = (
+        "key", "limit", "period_ms", "allowance", "remaining", "pending", "debiting", "blocked_until", "reset_at",
+        "synced",
+    )
+
+    def __init__(self, limit: int, period_ms: int, key: str = ""):
+        self.key = key
+        self.limit = limit
+        self.period_ms = period_ms
+        self.allowance = 0.0  # 本worker在下次对账前可直接放行的额度
+        self.remaining = 0  # 最近一次对账得到的全局剩余额度，扣除本地消耗后的估计值
+        self.pending = 0  # 已在本地放行、尚未扣除到Redis的消耗
+        self.debiting = 0  # pending中正在扣除（请求已发出）的部分，避免重复扣除
+        self.blocked_until = 0.0  # 全局额度耗尽时，本地直接拒绝到该时间（毫秒）
+        self.reset_at = 0.0
+        self.synced = False
+
+
+class _BucketCache(TTLCache):
+    """按最近访问时间过期的桶缓存（访问时重新写入以刷新过期时间），被淘汰的桶交给on_evict处理未对账的消耗"""
+
+    def __init__(self, maxsize: int, ttl: float, on_evict):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _, bucket in expired:
+            self._on_evict(bucket)
+        return expired
+
+    def popitem(self):
+        key, bucket = super().popitem()
+        self._on_evict(bucket)
+        return key, bucket
+
+
+class HybridRateLimiter:
+    """
+    本地令牌桶 + Redis定期对账的GCRA限流
+    - 每个worker从最近一次对账的全局剩余额度中取至多 local_share * limit 作为本地额度，放行时无需I/O
+    - 后台每隔sync_interval秒把各键的本地消耗通过一次pipeline扣除到Redis（gcra_debit），并按全局剩余额度重新分配本地额度
+    - 本地额度用尽或首次遇到某键时，同步对账一次（同键并发合并为一次往返）；全局已耗尽时本地拒绝到额度恢复
+    精度与吞吐的取舍：
+    - W个worker时，一个对账周期内全局最多超出约 W * local_share * limit（各worker在互相不可见的额度上放行）；
+      超出部分会被记入Redis，后续请求相应推迟，长期速率仍不超过上限
+    - local_share越大、sync_interval越长，Redis往返越少，瞬时超限越多；local_share为0时退化为每次请求一次往返
+    - 进程退出时未对账的消耗（至多一个周期）会丢失
+    """
+
+    def __init__(
+        self,
+        client: RedisClient,
+        sync_interval: float = 0.2,
+        local_share: float = 0.1,
+        max_keys: int = 100000,
+        idle_ttl: float = 600,
+    ):
+        self.client = client
+        self.sync_interval = sync_interval
+        self.local_share = local_share
+        # 超过idle_ttl秒未访问（每次acquire都会刷新过期时间）或超出max_keys时淘汰；
+        # 淘汰的桶若仍有未扣除的消耗，在下一次flush中一并扣除
+        self._buckets = _BucketCache(max_keys, idle_ttl, self._on_evict)
+        self._evicted: List[Tuple[str, _LocalBucket]] = []
+        # 自上次flush以来有本地消耗的桶，flush只处理这些桶而不遍历全部键
+        self._dirty: Dict[str, _LocalBucket] = {}
+        self._syncing: Dict[str, Tuple[_LocalBucket, asyncio.Task]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "local_allowed": 0,
+            "local_rejected": 0,
+            "sync_rejected": 0,
+            "sync_calls": 0,
+            "batch_syncs": 0,
+            "batch_keys": 0,
+            "sync_errors": 0,
+        }
+
+    def start(self) -> None:
+        """启动后台对账任务（首次限流时也会自动启动）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def acquire(self, key: str, limit: int, period_ms: int, cost: int = 1) -> Tuple[bool, int, int, int]:
+        """
+        检查并消耗额度，返回 (是否放行, 剩余额度估计, 需等待毫秒, 额度完全恢复的毫秒)
+        Redis出错时抛出异常，由调用方降级
+        """
+        self.start()
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.limit != limit or bucket.period_ms != period_ms:
+            if bucket is not None:
+                self._on_evict(bucket)
+            bucket = _LocalBucket(limit, period_ms, key)
+        # 重新写入以刷新过期时间（TTLCache只按写入时间过期）
+        self._buckets[key] = bucket
+
+        now = time.monotonic() * 1000
+        if bucket.synced and bucket.blocked_until > now:
+            self._stats["local_rejected"] += 1
+            return False, 0, int(bucket.blocked_until - now), int(max(0, bucket.reset_at - now))
+
+        if not bucket.synced or bucket.allowance < cost:
+            # 本地额度不足时按刚对账的全局剩余额度判断
+            await self._sync_key(key, bucket)
+            now = time.monotonic() * 1000
+            if bucket.remaining < cost:
+                self._stats["sync_rejected"] += 1
+                retry_after = max(bucket.blocked_until - now, bucket.period_ms / bucket.limit * (cost - bucket.remaining))
+                return False, bucket.remaining, int(max(1, retry_after)), int(max(0, bucket.reset_at - now))
+
+        bucket.allowance = max(0.0, bucket.allowance - cost)
+        bucket.remaining = max(0, bucket.remaining - cost)
+        bucket.pending += cost
+        bucket.reset_at = max(bucket.reset_at, now) + bucket.period_ms / bucket.limit * cost
+        self._mark_dirty(key, bucket)
+        self._stats["local_allowed"] += 1
+        return True, bucket.remaining, 0, int(bucket.reset_at - now)
+
+    def _debit_call(self, key: str, bucket: _LocalBucket, consumed: int):
+        return (
+            [self.client.generate_key(key)],
+            [bucket.period_ms / bucket.limit, bucket.period_ms, consumed],
+        )
+
+    @staticmethod
+    def _take_pending(bucket: _LocalBucket) -> int:
+        """取出尚未发出扣除的消耗"""
+        consumed = bucket.pending - bucket.debiting
+        bucket.debiting += consumed
+        return consumed
+
+    def _apply(self, bucket: _LocalBucket, consumed: int, result) -> None:
+        """根据对账结果更新本地状态"""
+        remaining, retry_after, reset_after = (int(value) for value in result)
+        now = time.monotonic() * 1000
+        bucket.pending -= consumed
+        bucket.debiting -= consumed
+        # 对账期间本地新放行的消耗尚未计入全局结果
+        bucket.remaining = max(0, remaining - bucket.pending)
+        bucket.allowance = min(self.local_share * bucket.limit, bucket.remaining)
+        bucket.reset_at = now + reset_after
+        bucket.blocked_until = now + retry_after if bucket.remaining < 1 else 0.0
+        bucket.synced = True
+
+    def _mark_dirty(self, key: str, bucket: _LocalBucket) -> None:
+        """登记有待扣除消耗的桶；同键的旧桶仍有消耗时转入淘汰列表"""
+        current = self._dirty.get(key)
+        if current is bucket:
+            return
+        if current is not None and current.pending > current.debiting:
+            self._evicted.append((key, current))
+        self._dirty[key] = bucket
+
+    def _on_evict(self, bucket: _LocalBucket) -> None:
+        """桶被淘汰或替换：保留未扣除的消耗，下次flush时扣除到Redis"""
+        if bucket.pending > bucket.debiting and self._dirty.get(bucket.key) is not bucket:
+            self._evicted.append((bucket.key, bucket))
+
+    async def _sync_key(self, key: str, bucket: _LocalBucket) -> None:
+        """同步对账单个键（同键同桶的并发合并为一次）"""
+        syncing = self._syncing.get(key)
+        if syncing is not None and syncing[0] is not bucket:
+            # 正在对账的是已被替换的旧桶：等待其完成后再对账当前桶
+            await asyncio.shield(syncing[1])
+            syncing = self._syncing.get(key)
+        if syncing is None or syncing[0] is not bucket:
+            task = asyncio.create_task(self._sync_key_once(key, bucket))
+            self._syncing[key] = (bucket, task)
+            task.add_done_callback(
+                lambda _: self._syncing.pop(key) if self._syncing.get(key, (None, None))[1] is task else None
+            )
+            syncing = (bucket, task)
+        await asyncio.shield(syncing[1])
+
+    async def _sync_key_once(self, key: str, bucket: _LocalBucket) -> None:
+        consumed = self._take_pending(bucket)
+        self._stats["sync_calls"] += 1
+        try:
+            result = await self.client.eval_script("gcra_debit", *self._debit_call(key, bucket, consumed))
+        except BaseException:
+            bucket.debiting -= consumed
+            if consumed:
+                self._mark_dirty(key, bucket)
+            raise
+        self._apply(bucket, consumed, result)
+
+    async def _run(self) -> None:
+        """后台对账循环"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self._stats["sync_errors"] += 1
+                logger.warning(f"限流对账失败: {e}")
+
+    async def flush(self) -> None:
+        """把有本地消耗的键扣除到Redis（单次pipeline往返）"""
+        dirty, self._dirty = self._dirty, {}
+        evicted, self._evicted = self._evicted, []
+        batch = [
+            (key, bucket, self._take_pending(bucket))
+            for key, bucket in list(dirty.items()) + evicted
+            if bucket.pending > bucket.debiting
+        ]
+        if not batch:
+            return
+        try:
+            results = await self.client.eval_script_batch(
+                "gcra_debit", [self._debit_call(key, bucket, consumed) for key, bucket, consumed in batch]
+            )
+        except BaseException:
+            for _, bucket, consumed in batch:
+                bucket.debiting -= consumed
+            # 留待下次重试
+            for key, bucket in dirty.items():
+                if bucket.pending > bucket.debiting:
+                    self._mark_dirty(key, bucket)
+            self._evicted.extend(item for item in evicted if item[1].pending > item[1].debiting)
+            raise
+        for (_, bucket, consumed), result in zip(batch, results):
+            self._apply(bucket, consumed, result)
+        self._stats["batch_syncs"] += 1
+        self._stats["batch_keys"] += len(batch)
+
+    async def close(self) -> None:
+        """停止后台任务并对账剩余消耗"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not self.client.is_healthy:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"限流关闭时对账失败: {e}")
+
+    def get_stats(self) -> dict:
+        """获取限流统计信息"""
+        return {
+            "keys": len(self._buckets),
+            "dirty_keys": len(self._dirty),
+            "sync_interval": self.sync_interval,
+            "local_share": self.local_share,
+            **self._stats,
+        }
+
+
+hybrid_rate_limiter = HybridRateLimiter(
+    redis_client,
+    sync_interval=settings.RATE_LIMIT_SYNC_MS / 1000,
+    local_share=settings.RATE_LIMIT_LOCAL_SHARE,
+)
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class RedisReadBatcher:
+    """
+    Redis读取自动合并（DataLoader风格）
+    - 收集window秒内（window为0时即同一事件循环轮次内）发起的GET，合并为一次MGET
+    - 同一键的并发读取共享一次查询结果
+    - 累积max_batch个不同键时立即发出
+    """
+
+    def __init__(
+        self,
+        mget: Callable[[List[str]], Awaitable[List[Optional[Any]]]],
+        window: float = 0.0,
+        max_batch: int = 100,
+    ):
+        self._mget = mget
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._tasks: set = set()
+        self._stats = {
+            "requests": 0,
+            "keys": 0,
+            "batches": 0,
+            "errors": 0,
+        }
+
+    async def get(self, key: str) -> Optional[Any]:
+        """加入当前批次并等待结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self._stats["requests"] += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            if self.window > 0:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """发出当前批次"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._execute(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        keys = list(batch)
+        self._stats["batches"] += 1
+        self._stats["keys"] += len(keys)
+        try:
+            values = await self._mget(keys)
+        except Exception as e:
+            self._stats["errors"] += 1
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, value in zip(keys, values):
+            for future in batch[key]:
+                # 调用方可能已超时取消
+                if not future.done():
+                    future.set_result(value)
+
+    def get_stats(self) -> dict:
+        """获取合并统计信息"""
+        return {
+            "pending_keys": len(self._pending),
+            **self._stats,
+        }
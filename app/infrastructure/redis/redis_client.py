@@ -1,14 +1,49 @@
-import json
+import time
 import asyncio
-from typing import Any, Optional, Union, List, Dict
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Union, List, Dict, Tuple, AsyncIterator
+import itertools
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.cluster import RedisCluster, ClusterNode
+from redis.asyncio.sentinel import Sentinel
+from redis.client import NEVER_DECODE
+from redis.exceptions import NoScriptError
 from app.core.config import settings
-from app.utils.json_serializer import json_serializer
+from app.infrastructure.redis.read_batcher import RedisReadBatcher
+from app.infrastructure.redis.codec import RedisCodec, CodecError
+from app.infrastructure.redis.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.infrastructure.redis.scripts import SCRIPTS
 from app.utils.logger_service import logger
 
 class RedisClient:
     def __init__(self):
         self.redis = None
+        self._pool = None
+        self._replicas: List[redis.Redis] = []
+        self._replica_cycle = None
+        self._read_batchers: Dict[bool, RedisReadBatcher] = {}
+        self.mode = settings.REDIS_MODE
+        self.codec = RedisCodec(
+            settings.REDIS_CODEC,
+            compress_threshold=settings.REDIS_CODEC_COMPRESS_THRESHOLD,
+            compress_level=settings.REDIS_CODEC_COMPRESS_LEVEL,
+        )
+        # 单次操作截止时间（秒）
+        self.read_timeout = settings.REDIS_READ_TIMEOUT_MS / 1000
+        self.write_timeout = settings.REDIS_WRITE_TIMEOUT_MS / 1000
+        self.pipeline_timeout = settings.REDIS_PIPELINE_TIMEOUT_MS / 1000
+        # pipeline/批量脚本一次往返处理多条命令，慢调用阈值单独配置，避免正常的大批量写入触发熔断
+        self.pipeline_slow_call_threshold = settings.REDIS_BREAKER_SLOW_PIPELINE_MS / 1000
+        self.breaker = CircuitBreaker(
+            "Redis",
+            probe=self._ping,
+            failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+            slow_call_threshold=settings.REDIS_BREAKER_SLOW_CALL_MS / 1000,
+            reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT,
+            probe_timeout=self.pipeline_timeout,
+        )
+        self._script_reloads = 0
         self._initialized = False
     
     async def init(self):
@@ -16,36 +51,120 @@ class RedisClient:
         if self._initialized:
             return
         
-        # 先创建连接池
-        self._pool = redis.ConnectionPool(
-            host=settings.REDIS_HOST,
-            port=int(settings.REDIS_PORT),
+        # 各模式通用的连接参数
+        connection_kwargs = dict(
             decode_responses=True,
             username=settings.REDIS_USERNAME if settings.REDIS_USERNAME else None,
             password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-            
-            # 连接池配置
-            max_connections=2000,  # 适中的连接数
-            retry_on_timeout=True,
-            retry_on_error=[redis.ConnectionError, redis.TimeoutError],
-            socket_timeout=30,
-            socket_connect_timeout=15,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
             socket_keepalive=True,
-            socket_keepalive_options={},
         )
-        
-        # 使用连接池创建Redis客户端
-        self.redis = redis.Redis(connection_pool=self._pool)
+
+        if self.mode == "cluster":
+            nodes = self._parse_hosts(settings.REDIS_CLUSTER_NODES) or [(settings.REDIS_HOST, int(settings.REDIS_PORT))]
+            startup_nodes = [ClusterNode(host, port) for host, port in nodes]
+            self.redis = RedisCluster(
+                startup_nodes=startup_nodes,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **connection_kwargs,
+            )
+            if settings.REDIS_READ_FROM_REPLICAS:
+                # 独立的客户端实例负责副本读，主客户端仍只读主节点
+                self._replicas = [RedisCluster(
+                    startup_nodes=startup_nodes,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    read_from_replicas=True,
+                    **connection_kwargs,
+                )]
+        else:
+            connection_kwargs.update(
+                db=int(settings.REDIS_DB),
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                retry_on_timeout=True,
+                retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+                socket_keepalive_options={},
+            )
+            if self.mode == "sentinel":
+                sentinel = Sentinel(
+                    self._parse_hosts(settings.REDIS_SENTINELS),
+                    sentinel_kwargs={
+                        "password": settings.REDIS_SENTINEL_PASSWORD or None,
+                        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+                        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+                    },
+                    **connection_kwargs,
+                )
+                # 主节点故障切换由SentinelConnectionPool自动处理
+                self.redis = sentinel.master_for(settings.REDIS_SENTINEL_SERVICE)
+                self._pool = self.redis.connection_pool
+                if settings.REDIS_READ_FROM_REPLICAS:
+                    self._replicas = [sentinel.slave_for(settings.REDIS_SENTINEL_SERVICE)]
+            else:
+                # 先创建连接池
+                self._pool = redis.ConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=int(settings.REDIS_PORT),
+                    **connection_kwargs,
+                )
+                # 使用连接池创建Redis客户端
+                self.redis = redis.Redis(connection_pool=self._pool)
+                if settings.REDIS_READ_FROM_REPLICAS:
+                    self._replicas = [
+                        redis.Redis(host=host, port=port, **connection_kwargs)
+                        for host, port in self._parse_hosts(settings.REDIS_REPLICA_HOSTS)
+                    ]
+        if self._replicas:
+            self._replica_cycle = itertools.cycle(self._replicas)
+
+        # 可选：合并同一时间窗口内的GET（统一读取原始字节，由调用方解码）
+        if settings.REDIS_READ_BATCHING:
+            for replica in (False, True):
+                self._read_batchers[replica] = RedisReadBatcher(
+                    lambda full_keys, replica=replica: self._mget_raw(full_keys, replica),
+                    window=settings.REDIS_READ_BATCH_WINDOW_MS / 1000,
+                    max_batch=settings.REDIS_READ_BATCH_MAX,
+                )
         
         try:
-            await self.redis.ping()
-            self._initialized = True
-
+            async with asyncio.timeout(settings.REDIS_CONNECT_TIMEOUT):
+                await self.redis.ping()
+                await self._load_scripts()
         except Exception as e:
-            raise Exception(f"Redis连接失败: {e}")
+            if not settings.REDIS_DEGRADED_START:
+                raise Exception(f"Redis连接失败: {e}")
+            # 降级启动：标记为不可用，由熔断器在后台探测重连
+            self.breaker.trip(f"启动时连接失败: {e}")
+        self._initialized = True
+
+    @staticmethod
+    def _parse_hosts(value: str) -> List[Tuple[str, int]]:
+        """解析 host1:port1,host2:port2 格式的地址列表"""
+        hosts = []
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            host, _, port = item.rpartition(":")
+            hosts.append((host, int(port)))
+        return hosts
+
+    def _reader(self, replica: bool = False) -> Union[redis.Redis, RedisCluster]:
+        """选择读客户端：replica=True且配置了副本时轮询副本，否则使用主节点"""
+        if replica and self._replica_cycle is not None:
+            return next(self._replica_cycle)
+        return self.redis
+
+    @property
+    def is_healthy(self) -> bool:
+        """Redis是否可用（熔断器关闭）"""
+        return self._initialized and self.breaker.state == CircuitBreaker.CLOSED
 
     async def close(self):
         """正确关闭连接池"""
+        await self.breaker.close()
+        for replica in self._replicas:
+            await replica.aclose()
         if self.redis:
             await self.redis.aclose()
         if self._pool:
@@ -55,27 +174,92 @@ class RedisClient:
     # 添加连接池状态监控
     def get_pool_status(self) -> dict:
         """获取连接池状态"""
-        if not self._pool:
+        if not self.redis:
             return {"status": "not_initialized"}
         
-        return {
-            "max_connections": self._pool.max_connections,
-            "created_connections": self._pool.created_connections,
-            "available_connections": len(self._pool._available_connections),
-            "in_use_connections": len(self._pool._in_use_connections),
+        status = {
+            "status": "healthy" if self.is_healthy else "degraded",
+            "mode": self.mode,
+            "replicas": len(self._replicas),
+            "script_reloads": self._script_reloads,
+            "breaker": self.breaker.get_stats(),
+            "read_batching": {
+                ("replica" if replica else "primary"): batcher.get_stats()
+                for replica, batcher in self._read_batchers.items()
+            },
         }
+        if self.mode == "cluster":
+            status["nodes"] = len(self.redis.get_nodes())
+        elif self._pool:
+            status.update({
+                "max_connections": self._pool.max_connections,
+                "created_connections": len(self._pool._available_connections) + len(self._pool._in_use_connections),
+                "available_connections": len(self._pool._available_connections),
+                "in_use_connections": len(self._pool._in_use_connections),
+            })
+        return status
+
+    async def _ping(self):
+        return await self.redis.ping()
+
+    @asynccontextmanager
+    async def guard(self, timeout: float, slow_call_threshold: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        熔断 + 截止时间保护
+        熔断打开时立即抛出CircuitOpenError；超时或连接错误计入熔断失败，
+        延迟超过slow_call_threshold（秒，默认为熔断器的延迟SLO）计为慢调用
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Redis熔断中，调用被拒绝")
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout):
+                yield
+        except (asyncio.TimeoutError, redis.ConnectionError, redis.TimeoutError, OSError):
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - start, slow_call_threshold)
     
-    def generate_key(self, key: str) -> str:
-        """生成带前缀的键名"""
+    def generate_key(self, key: str, hash_tag: Optional[str] = None) -> str:
+        """
+        生成带前缀的键名
+        hash_tag: 集群模式下，hash_tag相同的键落在同一槽位，可用于多键原子操作（如Lua脚本、MULTI）
+                  例: generate_key("minute", hash_tag="user:1") -> "undefined:{user:1}:minute"
+        """
+        if hash_tag:
+            return f"{settings.REDIS_PREFIX}{{{hash_tag}}}:{key}"
         return f"{settings.REDIS_PREFIX}{key}"
     
-    async def get(self, key: str) -> Optional[str]:
-        """获取字符串值（只加超时控制）"""
+    async def _mget_raw(self, full_keys: List[str], replica: bool = False) -> List[Optional[bytes]]:
+        """MGET并跳过响应解码（编码后的值不一定是UTF-8）"""
+        client = self._reader(replica)
+        if self.mode != "cluster":
+            return await client.execute_command("MGET", *full_keys, **{NEVER_DECODE: []})
+
+        # 集群模式下MGET不能跨槽位，按槽位拆分后并发执行
+        slots: Dict[int, List[int]] = {}
+        for index, full_key in enumerate(full_keys):
+            slots.setdefault(client.keyslot(full_key), []).append(index)
+        results: List[Optional[bytes]] = [None] * len(full_keys)
+        slot_values = await asyncio.gather(*[
+            client.execute_command("MGET", *[full_keys[i] for i in indexes], **{NEVER_DECODE: []})
+            for indexes in slots.values()
+        ])
+        for indexes, values in zip(slots.values(), slot_values):
+            for index, value in zip(indexes, values):
+                results[index] = value
+        return results
+
+    async def get(self, key: str, replica: bool = False) -> Optional[str]:
+        """获取字符串值（replica=True时可读副本，可能读到略旧的数据）"""
         full_key = self.generate_key(key)
         try:
-            # 只加超时控制，其他什么都不改
-            async with asyncio.timeout(10.0):  # 3秒超时
-                return await self.redis.get(full_key)
+            async with self.guard(self.read_timeout):
+                batcher = self._read_batchers.get(replica)
+                if batcher is not None:
+                    value = await batcher.get(full_key)
+                    return value.decode("utf-8") if value is not None else None
+                return await self._reader(replica).get(full_key)
         except asyncio.TimeoutError:
             return None
         except Exception as e:
@@ -83,16 +267,31 @@ class RedisClient:
             if "max number of clients" in str(e).lower():
                 logger.error(f"Redis连接池耗尽: {self.get_pool_status()}")
             raise
+
+    async def get_raw(self, key: str, replica: bool = False) -> Optional[bytes]:
+        """获取原始字节值（用于编码后的数据）"""
+        full_key = self.generate_key(key)
+        try:
+            async with self.guard(self.read_timeout):
+                batcher = self._read_batchers.get(replica)
+                if batcher is not None:
+                    return await batcher.get(full_key)
+                return await self._reader(replica).execute_command("GET", full_key, **{NEVER_DECODE: []})
+        except asyncio.TimeoutError:
+            return None
+        except Exception as e:
+            if "max number of clients" in str(e).lower():
+                logger.error(f"Redis连接池耗尽: {self.get_pool_status()}")
+            raise
     
-    async def set(self, key: str, value: str, expire: int = None) -> bool:
+    async def set(self, key: str, value: Union[str, bytes], expire: int = None) -> bool:
         """设置字符串值（只加超时控制）"""
         full_key = self.generate_key(key)
         if expire is None:
             expire = getattr(settings, 'REDIS_DEFAULT_EXPIRE', 3600)
         
         try:
-            # 只加超时控制
-            async with asyncio.timeout(10.0):  # 3秒超时
+            async with self.guard(self.write_timeout):
                 return await self.redis.set(full_key, value, ex=expire)
         except asyncio.TimeoutError:
             return False
@@ -102,32 +301,221 @@ class RedisClient:
                 logger.error(f"Redis连接池耗尽: {self.get_pool_status()}")
             raise
     
+    async def get_raw_with_ttl(self, key: str, replica: bool = False) -> Tuple[Optional[bytes], int]:
+        """获取原始字节值及剩余TTL（单次pipeline往返）"""
+        full_key = self.generate_key(key)
+        try:
+            async with self.guard(self.read_timeout):
+                async with self._reader(replica).pipeline(transaction=False) as pipe:
+                    pipe.execute_command("GET", full_key, **{NEVER_DECODE: []})
+                    pipe.ttl(full_key)
+                    value, ttl = await pipe.execute()
+                return value, ttl
+        except asyncio.TimeoutError:
+            return None, -2
+        except Exception as e:
+            if "max number of clients" in str(e).lower():
+                logger.error(f"Redis连接池耗尽: {self.get_pool_status()}")
+            raise
+
+    async def mget_raw(self, keys: List[str], replica: bool = False) -> List[Optional[bytes]]:
+        """批量获取原始字节值（单次MGET，集群模式下按槽位拆分）"""
+        if not keys:
+            return []
+        full_keys = [self.generate_key(key) for key in keys]
+        try:
+            async with self.guard(self.read_timeout):
+                return await self._mget_raw(full_keys, replica)
+        except asyncio.TimeoutError:
+            return [None] * len(keys)
+        except Exception as e:
+            if "max number of clients" in str(e).lower():
+                logger.error(f"Redis连接池耗尽: {self.get_pool_status()}")
+            raise
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Pipeline]:
+        """
+        Pipeline上下文管理器，退出时执行尚未执行的命令
+        整个代码块受熔断与pipeline截止时间保护
+        注意：直接使用原生pipeline，键名需自行调用generate_key加前缀；集群模式不支持transaction
+
+        用法：
+            async with redis_client.pipeline() as pipe:
+                pipe.get(redis_client.generate_key("a"))
+                pipe.incr(redis_client.generate_key("b"))
+                results = await pipe.execute()
+        """
+        async with self.guard(self.pipeline_timeout, self.pipeline_slow_call_threshold):
+            async with self.redis.pipeline(transaction=transaction) as pipe:
+                yield pipe
+                if len(pipe):
+                    await pipe.execute()
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """自增计数"""
+        async with self.guard(self.write_timeout):
+            return await self.redis.incr(self.generate_key(key), amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        """设置过期时间"""
+        async with self.guard(self.write_timeout):
+            return await self.redis.expire(self.generate_key(key), seconds)
+
     async def delete(self, *keys: str) -> int:
         """删除键 - 支持批量删除"""
         if not keys:
             return 0
         full_keys = [self.generate_key(key) for key in keys]
-        return await self.redis.delete(*full_keys)
+        async with self.guard(self.write_timeout):
+            return await self.redis.delete(*full_keys)
     
-    # JSON操作
+    # Lua脚本（多步读改写合并为一次原子往返）
+    async def _load_scripts(self) -> None:
+        """预加载所有Lua脚本（集群模式下加载到所有主节点）"""
+        for script in SCRIPTS.values():
+            await self.redis.script_load(script.source)
+
+    async def eval_script(self, name: str, keys: List[str], args: List[Any], raw: bool = False) -> Any:
+        """
+        执行已注册的Lua脚本
+        优先EVALSHA；Redis重启或主从切换后脚本缓存丢失（NOSCRIPT）时重新加载并重试一次
+        keys需为完整键名（generate_key），集群模式下所有键须在同一槽位（使用相同hash_tag）
+        raw=True时不解码返回值（值为编码后的字节）
+        """
+        script = SCRIPTS[name]
+        options = {NEVER_DECODE: []} if raw else {}
+        async with self.guard(self.write_timeout):
+            try:
+                return await self.redis.execute_command("EVALSHA", script.sha, len(keys), *keys, *args, **options)
+            except NoScriptError:
+                self._script_reloads += 1
+                await self.redis.script_load(script.source)
+                return await self.redis.execute_command("EVALSHA", script.sha, len(keys), *keys, *args, **options)
+
+    async def eval_script_batch(self, name: str, calls: List[Tuple[List[str], List[Any]]]) -> List[Any]:
+        """
+        批量执行同一Lua脚本（单次pipeline往返），calls为(完整键名列表, 参数列表)
+        NOSCRIPT时所有调用均未执行，重新加载后整体重试一次
+        """
+        if not calls:
+            return []
+        script = SCRIPTS[name]
+        for attempt in range(2):
+            try:
+                async with self.pipeline() as pipe:
+                    for keys, args in calls:
+                        pipe.execute_command("EVALSHA", script.sha, len(keys), *keys, *args)
+                    return await pipe.execute()
+            except NoScriptError:
+                if attempt:
+                    raise
+                self._script_reloads += 1
+                async with self.guard(self.write_timeout):
+                    await self.redis.script_load(script.source)
+
+    async def rate_window(self, key: str, limit: int, window_ms: int) -> Tuple[bool, int, int]:
+        """
+        固定窗口限流（原子的检查+计数+设置过期）
+        返回 (是否放行, 当前窗口计数, 窗口剩余毫秒)；被拒绝的请求不计数
+        """
+        allowed, count, ttl = await self.eval_script(
+            "rate_window", [self.generate_key(key)], [limit, window_ms]
+        )
+        return bool(allowed), int(count), int(ttl)
+
+    async def gcra(
+        self, key: str, limit: int, period_ms: int, cost: int = 1
+    ) -> Tuple[bool, int, int, int]:
+        """
+        GCRA限流：任意period_ms长度的滑动区间内最多消耗limit单位（单次原子往返）
+        返回 (是否放行, 剩余额度, 需等待毫秒, 额度完全恢复的毫秒)；被拒绝的请求不消耗额度
+        """
+        allowed, remaining, retry_after, reset_after = await self.eval_script(
+            "gcra", [self.generate_key(key)], [period_ms / limit, period_ms, cost]
+        )
+        return bool(allowed), int(remaining), int(retry_after), int(reset_after)
+
+    async def incr_with_expire(self, key: str, seconds: int, amount: int = 1) -> int:
+        """自增计数，键无过期时间时设置过期（替代INCR + EXPIRE两次往返）"""
+        return await self.eval_script("incr_with_expire", [self.generate_key(key)], [amount, seconds])
+
+    async def get_or_lock(
+        self, key: str, token: str, lock_ms: int, hash_tag: Optional[str] = None
+    ) -> Tuple[Optional[bytes], bool]:
+        """
+        读取原始字节值，不存在时尝试获取重建锁（锁键为 key:lock）
+        返回 (值, 是否获得锁)：值存在时不加锁；值不存在且获得锁的调用方负责回源并写入，之后调用release_lock
+        """
+        value, acquired = await self.eval_script(
+            "get_or_lock",
+            [self.generate_key(key, hash_tag), self.generate_key(f"{key}:lock", hash_tag)],
+            [token, lock_ms],
+            raw=True,
+        )
+        return value, bool(acquired)
+
+    async def release_lock(self, key: str, token: str, hash_tag: Optional[str] = None) -> bool:
+        """释放get_or_lock获取的锁（仅当锁仍由token持有时删除）"""
+        return await self.compare_and_delete(f"{key}:lock", token, hash_tag)
+
+    async def compare_and_set(
+        self, key: str, expected: Optional[Union[str, bytes]], value: Union[str, bytes],
+        expire_ms: int = 0, hash_tag: Optional[str] = None
+    ) -> bool:
+        """当前值等于expected时写入value并设置过期（expected为None表示要求键不存在）"""
+        return bool(await self.eval_script(
+            "compare_and_set",
+            [self.generate_key(key, hash_tag)],
+            [expected if expected is not None else "", value, expire_ms, "1" if expected is None else "0"],
+        ))
+
+    async def compare_and_delete(self, key: str, expected: Union[str, bytes], hash_tag: Optional[str] = None) -> bool:
+        """当前值等于expected时删除"""
+        return bool(await self.eval_script("compare_and_delete", [self.generate_key(key, hash_tag)], [expected]))
+
+    # JSON操作（值经codec编码，兼容旧版JSON文本）
+    def encode_value(self, value: Any) -> Union[bytes, str]:
+        """按当前codec序列化"""
+        return self.codec.encode(value)
+
+    def decode_value(self, data: Optional[Union[bytes, str]]) -> Any:
+        """反序列化，无法解析时返回None"""
+        try:
+            return self.codec.decode(data)
+        except CodecError as e:
+            logger.warning(str(e))
+            return None
+
     async def set_json(self, key: str, value: Any, expire: int = None) -> bool:
         """保存JSON数据"""
-        try:
-            # 尝试直接序列化
-            json_value = json.dumps(value, ensure_ascii=False)
-        except TypeError:
-            # 如果失败，使用自定义编码器
-            json_value = json.dumps(value, default=json_serializer, ensure_ascii=False)
-        
-        return await self.set(key, json_value, expire)
+        return await self.set(key, self.encode_value(value), expire)
 
-    async def get_json(self, key: str) -> Any:
+    async def get_json(self, key: str, replica: bool = False) -> Any:
         """获取JSON数据"""
-        json_value = await self.get(key)
-        if json_value:
-            try:
-                return json.loads(json_value)
-            except json.JSONDecodeError:
-                return None
-        return None
+        return self.decode_value(await self.get_raw(key, replica))
+
+    async def mget_json(self, keys: List[str], replica: bool = False) -> List[Any]:
+        """批量获取JSON数据，结果与keys顺序一致，不存在或无法解析的为None"""
+        return [self.decode_value(value) for value in await self.mget_raw(keys, replica)]
+
+    async def mset_json(self, mapping: Dict[str, Any], expire: int = None) -> bool:
+        """批量保存JSON数据（单次pipeline往返，逐键设置过期时间）"""
+        if not mapping:
+            return True
+        if expire is None:
+            expire = getattr(settings, 'REDIS_DEFAULT_EXPIRE', 3600)
+        try:
+            async with self.pipeline() as pipe:
+                for key, value in mapping.items():
+                    pipe.set(self.generate_key(key), self.encode_value(value), ex=expire)
+                results = await pipe.execute()
+            return all(results)
+        except asyncio.TimeoutError:
+            return False
+
+    async def get_json_with_ttl(self, key: str, replica: bool = False) -> Tuple[Any, int]:
+        """获取JSON数据及剩余TTL"""
+        value, ttl = await self.get_raw_with_ttl(key, replica)
+        return self.decode_value(value), ttl
 redis_client = RedisClient()
\ No newline at end of file
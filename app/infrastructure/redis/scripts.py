@@ -0,0 +1,142 @@
+import hashlib
+from typing import Dict
+
+
+class RedisScript:
+    """Lua脚本（SHA1在本地计算，与SCRIPT LOAD返回值一致）"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.sha = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+# 固定窗口限流：未超限时计数+1，窗口首次计数时设置过期
+# KEYS[1] 计数键  ARGV[1] 上限  ARGV[2] 窗口毫秒
+# 返回 {是否放行(1/0), 当前计数, 窗口剩余毫秒}
+RATE_WINDOW = RedisScript("rate_window", """
+local limit = tonumber(ARGV[1])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current >= limit then
+    return {0, current, redis.call('PTTL', KEYS[1])}
+end
+current = redis.call('INCR', KEYS[1])
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    ttl = tonumber(ARGV[2])
+end
+return {1, current, ttl}
+""")
+
+# GCRA限流（通用信元速率算法，等价于平滑的滑动窗口，无窗口边界突发）
+# 键中保存理论到达时间TAT（毫秒），时间取Redis服务器时钟，各worker时钟偏差不影响结果
+# KEYS[1] 限流键  ARGV[1] 单位成本的发放间隔（毫秒，周期/上限）  ARGV[2] 突发容忍（毫秒，通常为整个周期）  ARGV[3] 本次成本
+# 返回 {是否放行(1/0), 剩余额度, 需等待毫秒(放行时为0), 额度完全恢复的毫秒}
+GCRA = RedisScript("gcra", """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission * cost
+local diff = now - (new_tat - tolerance)
+if diff < 0 then
+    return {0, math.max(0, math.floor((now - (tat - tolerance)) / emission)), math.ceil(-diff), math.ceil(tat - now)}
+end
+local reset_after = math.ceil(new_tat - now)
+if reset_after > 0 then
+    redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', reset_after)
+end
+return {1, math.floor(diff / emission), 0, reset_after}
+""")
+
+# GCRA记账：无条件扣除已在本地放行的消耗，返回扣除后的全局剩余额度（用于本地令牌桶对账）
+# KEYS[1] 限流键  ARGV[1] 发放间隔（毫秒）  ARGV[2] 突发容忍（毫秒）  ARGV[3] 已消耗的成本（可为0，仅查询）
+# 返回 {剩余额度, 下一单位额度可用的等待毫秒, 额度完全恢复的毫秒}
+GCRA_DEBIT = RedisScript("gcra_debit", """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local consumed = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+tat = tat + emission * consumed
+local reset_after = math.ceil(tat - now)
+if consumed > 0 and reset_after > 0 then
+    redis.call('SET', KEYS[1], string.format('%.3f', tat), 'PX', reset_after)
+end
+local remaining = math.max(0, math.floor((now - (tat - tolerance)) / emission))
+return {remaining, math.max(0, math.ceil(tat + emission - tolerance - now)), reset_after}
+""")
+
+# 读取值，不存在时尝试加锁（用于缓存重建时只让一个调用方回源）
+# KEYS[1] 值键  KEYS[2] 锁键  ARGV[1] 锁标识  ARGV[2] 锁毫秒
+# 返回 {值或false, 是否获得锁(1/0)}
+GET_OR_LOCK = RedisScript("get_or_lock", """
+local value = redis.call('GET', KEYS[1])
+if value then
+    return {value, 0}
+end
+if redis.call('SET', KEYS[2], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return {false, 1}
+end
+return {false, 0}
+""")
+
+# 比较并设置：当前值等于期望值时写入新值并设置过期
+# KEYS[1] 键  ARGV[1] 期望值  ARGV[2] 新值  ARGV[3] 过期毫秒（<=0不过期）  ARGV[4] 为'1'时期望键不存在
+# 返回 1成功 0失败
+COMPARE_AND_SET = RedisScript("compare_and_set", """
+local current = redis.call('GET', KEYS[1])
+if ARGV[4] == '1' then
+    if current then
+        return 0
+    end
+elseif current ~= ARGV[1] then
+    return 0
+end
+local ttl = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+return 1
+""")
+
+# 比较并删除：当前值等于期望值时删除（释放自己持有的锁）
+# KEYS[1] 键  ARGV[1] 期望值
+# 返回 删除数量
+COMPARE_AND_DELETE = RedisScript("compare_and_delete", """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+# 计数并保证过期：键无过期时间时设置（避免INCR后EXPIRE前进程退出留下永久键）
+# KEYS[1] 计数键  ARGV[1] 增量  ARGV[2] 过期秒数
+# 返回 自增后的值
+INCR_WITH_EXPIRE = RedisScript("incr_with_expire", """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return value
+""")
+
+
+SCRIPTS: Dict[str, RedisScript] = {
+    script.name: script
+    for script in (RATE_WINDOW, GCRA, GCRA_DEBIT, GET_OR_LOCK, COMPARE_AND_SET, COMPARE_AND_DELETE, INCR_WITH_EXPIRE)
+}
@@ -0,0 +1,376 @@
+import copy
+import uuid
+import random
+import asyncio
+import hashlib
+import functools
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from cachetools import TTLCache
+from app.core.config import settings
+from app.infrastructure.redis.redis_client import redis_client
+from app.utils.logger_service import logger
+
+
+# 已创建的缓存实例，用于按标签跨缓存失效与统计
+_caches: Dict[str, "TwoTierCache"] = {}
+# 进程内失效序号：标签 -> 最近一次失效时的序号，回源期间标签被失效则丢弃回源结果
+_invalidation_seq = 0
+_tag_invalidated_at: TTLCache = TTLCache(maxsize=100000, ttl=600)
+# Redis中标签版本号的保留时间（秒），需远大于单次回源耗时
+TAG_VERSION_TTL = 86400
+
+
+class TwoTierCache:
+    """
+    两级读穿缓存：进程内TTLCache（L1）+ Redis（L2）
+    - Redis TTL带随机抖动，避免同一批键集中过期
+    - 防击穿：进程内同键并发只回源一次；跨进程通过get_or_lock只让一个调用方回源，其余短暂等待结果
+    - 标签失效：条目写入时登记到标签集合，invalidate_tags按标签删除两级缓存
+      （其他worker的L1只能等待过期，L1 TTL应保持较短）
+    - 回源开始前记录标签版本，写入时版本已变化（回源期间被失效）则丢弃结果，避免把旧值写回缓存
+    - 默认load为深拷贝：调用方修改返回值不会污染L1；自定义load应返回新对象
+    - 持锁方回源失败时释放锁，等待方发现锁已释放立即接手回源；
+      error_types中的异常在Redis中缓存error_ttl秒，等待方与随后的重试直接抛出同类异常（不再回源）
+    - 等待持锁方时轮询副本（REDIS_READ_FROM_REPLICAS开启时），副本上锁已消失再回主节点确认；
+      replica_reads=True的缓存（可容忍短暂旧数据，如系统配置）首次读取也先读副本
+    - Redis不可用时只使用L1并直接回源
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: int,
+        l1_ttl: Optional[int] = None,
+        l1_maxsize: Optional[int] = None,
+        jitter: Optional[float] = None,
+        dump: Callable[[Any], Any] = lambda value: value,
+        load: Callable[[Any], Any] = copy.deepcopy,
+        lock_ms: Optional[int] = None,
+        error_types: Tuple[Type[Exception], ...] = (),
+        error_ttl: int = 0,
+        replica_reads: bool = False,
+    ):
+        if name in _caches:
+            raise ValueError(f"缓存名称重复: {name}")
+        self.name = name
+        self.ttl = ttl
+        self.jitter = settings.CACHE_TTL_JITTER if jitter is None else jitter
+        self.redis = redis_client
+        self._dump = dump
+        self._load = load
+        # 重建锁有效期（也是其他进程的最长等待时间），应大于回源的最长耗时
+        self._lock_ms = settings.CACHE_LOCK_MS if lock_ms is None else lock_ms
+        # 需要缓存的回源失败（异常类型需可由单个消息参数构造）
+        self._error_types = error_types
+        self._error_ttl = error_ttl
+        self._replica_reads = replica_reads
+        # L1保存dump后的数据，每次命中重新load
+        self._memory_cache = TTLCache(
+            maxsize=l1_maxsize or settings.CACHE_L1_MAXSIZE,
+            ttl=settings.CACHE_L1_TTL if l1_ttl is None else l1_ttl,
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "loads": 0,
+            "coalesced": 0,
+            "lock_waits": 0,
+            "l2_errors": 0,
+            "invalidations": 0,
+            "stale_writes": 0,
+            "cached_errors": 0,
+            "replica_hits": 0,
+        }
+        _caches[name] = self
+
+    def _redis_key(self, key: str) -> str:
+        """Redis键名；整个键作为hash tag，使值与重建锁落在同一槽位"""
+        if len(key) > 128:
+            key = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{{cache:{self.name}:{key}}}"
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"cache_tag:{tag}"
+
+    @staticmethod
+    def _tag_version_key(tag: str) -> str:
+        return f"cache_tag_version:{tag}"
+
+    @staticmethod
+    def _invalidated_since(seq: int, tags: tuple) -> bool:
+        """本进程在序号seq之后是否失效过其中任一标签"""
+        return any(_tag_invalidated_at.get(tag, 0) > seq for tag in tags)
+
+    async def _tag_versions(self, tags: tuple) -> List[Optional[bytes]]:
+        """读取标签在Redis中的版本号（其他进程失效时递增）"""
+        return await self.redis.mget_raw([self._tag_version_key(tag) for tag in tags])
+
+    def _expire(self) -> int:
+        if self.jitter <= 0:
+            return self.ttl
+        return max(1, int(self.ttl * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], tags: Iterable[str] = ()
+    ) -> Any:
+        """读取缓存，未命中时调用loader回源并写入两级缓存"""
+        entry = self._memory_cache.get(key)
+        if entry is not None:
+            self._stats["l1_hits"] += 1
+            return self._load(entry[0])
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, loader, tuple(tags)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._stats["coalesced"] += 1
+        # shield：单个调用方取消不影响其他等待同一结果的调用方
+        return self._load(await asyncio.shield(task))
+
+    async def _fetch(self, key: str, loader: Callable[[], Awaitable[Any]], tags: tuple) -> Any:
+        redis_key = self._redis_key(key)
+        token = uuid.uuid4().hex
+        locked = False
+        use_redis = self.redis.is_healthy
+        envelope = None
+        if use_redis:
+            try:
+                raw = None
+                if self._replica_reads:
+                    raw = await self.redis.get_raw(redis_key, replica=True)
+                    if raw is not None:
+                        self._stats["replica_hits"] += 1
+                if raw is None:
+                    raw, locked = await self.redis.get_or_lock(redis_key, token, self._lock_ms)
+                if raw is None and not locked:
+                    # 其他进程正在回源，等待其写入（持锁方失败释放锁时由本调用方接手）
+                    self._stats["lock_waits"] += 1
+                    raw, locked = await self._wait_for_value(redis_key, token)
+                envelope = self.redis.decode_value(raw)
+            except Exception as e:
+                self._stats["l2_errors"] += 1
+                use_redis = False
+                logger.warning(f"缓存{self.name}读取Redis失败: {e}")
+        if envelope is not None:
+            if "e" in envelope:
+                # 近期回源失败的结果
+                self._stats["cached_errors"] += 1
+                raise self._load_error(envelope["e"])
+            self._stats["l2_hits"] += 1
+            self._memory_cache[key] = (envelope["v"], tags)
+            return envelope["v"]
+
+        self._stats["loads"] += 1
+        seq = _invalidation_seq
+        try:
+            versions = None
+            if use_redis and tags:
+                try:
+                    versions = await self._tag_versions(tags)
+                except Exception as e:
+                    # 无法确认版本时不写Redis
+                    use_redis = False
+                    logger.warning(f"缓存{self.name}读取标签版本失败: {e}")
+            dumped = self._dump(await loader())
+        except BaseException as e:
+            if locked:
+                if isinstance(e, self._error_types) and self._error_ttl > 0:
+                    await self._store_error(redis_key, e)
+                await self._release(redis_key, token)
+            raise
+        if self._invalidated_since(seq, tags):
+            # 回源期间本进程失效了相关标签，结果可能是旧值，只返回不缓存
+            self._stats["stale_writes"] += 1
+            use_redis = False
+        else:
+            self._memory_cache[key] = (dumped, tags)
+        if use_redis:
+            await self._store(key, redis_key, dumped, tags, versions)
+        if locked:
+            await self._release(redis_key, token)
+        return dumped
+
+    async def _wait_for_value(self, redis_key: str, token: str) -> Tuple[Optional[bytes], bool]:
+        """
+        轮询等待持锁方写入，返回 (值, 是否获得锁)
+        轮询读副本上的值与锁（持锁方先写值后释放锁，副本上锁消失时值也已同步）；
+        锁已消失（持锁方失败释放）时在主节点执行get_or_lock，获得锁则由本调用方接手回源，不必等到锁过期
+        """
+        deadline = asyncio.get_running_loop().time() + self._lock_ms / 1000
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.02)
+            raw, lock = await self.redis.mget_raw([redis_key, f"{redis_key}:lock"], replica=True)
+            if raw is not None:
+                return raw, False
+            if lock is None:
+                raw, locked = await self.redis.get_or_lock(redis_key, token, self._lock_ms)
+                if raw is not None or locked:
+                    return raw, locked
+        return None, False
+
+    async def _store_error(self, redis_key: str, error: Exception) -> None:
+        """短暂缓存回源失败，等待方与重试直接失败"""
+        try:
+            await self.redis.set(
+                redis_key,
+                self.redis.encode_value({"e": {"type": type(error).__name__, "message": str(error)}}),
+                expire=self._error_ttl,
+            )
+        except Exception as e:
+            logger.warning(f"缓存{self.name}写入回源失败结果失败: {e}")
+
+    def _load_error(self, data: dict) -> Exception:
+        """按类型名还原缓存的异常（类型未登记时使用第一个类型）"""
+        for error_type in self._error_types:
+            if error_type.__name__ == data["type"]:
+                return error_type(data["message"])
+        return self._error_types[0](data["message"]) if self._error_types else RuntimeError(data["message"])
+
+    async def _store(
+        self, key: str, redis_key: str, dumped: Any, tags: tuple, versions: Optional[List] = None
+    ) -> None:
+        """
+        写入值并登记标签（单次pipeline往返）
+        有标签时写入后再核对标签版本：回源期间其他进程失效过标签（版本递增）则删除刚写入的旧值
+        """
+        expire = self._expire()
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.set(self.redis.generate_key(redis_key), self.redis.encode_value({"v": dumped}), ex=expire)
+                for tag in tags:
+                    tag_key = self.redis.generate_key(self._tag_key(tag))
+                    pipe.sadd(tag_key, redis_key)
+                    # 标签集合比成员多保留一个TTL，失效时不会漏删
+                    pipe.expire(tag_key, self.ttl * 2)
+            if tags and await self._tag_versions(tags) != versions:
+                self._stats["stale_writes"] += 1
+                self._memory_cache.pop(key, None)
+                await self.redis.delete(redis_key)
+        except Exception as e:
+            self._stats["l2_errors"] += 1
+            logger.warning(f"缓存{self.name}写入Redis失败: {e}")
+
+    async def _release(self, redis_key: str, token: str) -> None:
+        try:
+            await self.redis.release_lock(redis_key, token)
+        except Exception as e:
+            # 锁会按有效期自动过期
+            logger.warning(f"缓存{self.name}释放重建锁失败: {e}")
+
+    def _invalidate_local(self, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+        for key in keys:
+            self._memory_cache.pop(key, None)
+        tags = set(tags)
+        if tags:
+            for key, (_, entry_tags) in list(self._memory_cache.items()):
+                if tags.intersection(entry_tags):
+                    self._memory_cache.pop(key, None)
+        self._stats["invalidations"] += 1
+
+    async def invalidate(self, *keys: str) -> None:
+        """按键删除两级缓存"""
+        if not keys:
+            return
+        self._invalidate_local(keys=keys)
+        try:
+            await self.redis.delete(*[self._redis_key(key) for key in keys])
+        except Exception as e:
+            logger.warning(f"缓存{self.name}删除Redis键失败: {e}")
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        lookups = sum(self._stats[name] for name in ("l1_hits", "l2_hits", "coalesced", "loads"))
+        return {
+            "l1_size": len(self._memory_cache),
+            "l1_maxsize": self._memory_cache.maxsize,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "hit_rate": round((lookups - self._stats["loads"]) / lookups, 4) if lookups else 0,
+            **self._stats,
+        }
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """按标签删除所有缓存中的相关条目（先递增标签版本，使正在进行的回源不会写回旧值）"""
+    global _invalidation_seq
+    if not tags:
+        return
+    _invalidation_seq += 1
+    for tag in tags:
+        _tag_invalidated_at[tag] = _invalidation_seq
+    for cache in _caches.values():
+        cache._invalidate_local(tags=tags)
+    if not redis_client.is_healthy:
+        return
+    try:
+        tag_keys = [TwoTierCache._tag_key(tag) for tag in tags]
+        async with redis_client.pipeline() as pipe:
+            for tag in tags:
+                version_key = redis_client.generate_key(TwoTierCache._tag_version_key(tag))
+                pipe.incr(version_key)
+                pipe.expire(version_key, TAG_VERSION_TTL)
+            for tag_key in tag_keys:
+                pipe.smembers(redis_client.generate_key(tag_key))
+            results = await pipe.execute()
+        members = results[2 * len(tags):]
+        keys: List[str] = [key for tag_members in members for key in tag_members]
+        await redis_client.delete(*keys, *tag_keys)
+    except Exception as e:
+        logger.warning(f"按标签删除缓存失败: {e}")
+
+
+def cached(
+    name: str,
+    key: Callable[..., str],
+    ttl: int = 300,
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+    l1_ttl: Optional[int] = None,
+    l1_maxsize: Optional[int] = None,
+    jitter: Optional[float] = None,
+    dump: Callable[[Any], Any] = lambda value: value,
+    load: Callable[[Any], Any] = copy.deepcopy,
+    lock_ms: Optional[int] = None,
+    error_types: Tuple[Type[Exception], ...] = (),
+    error_ttl: int = 0,
+    replica_reads: bool = False,
+):
+    """
+    两级缓存装饰器（用于异步函数/方法）
+    key/tags接收与被装饰函数相同的参数；dump/load负责与可序列化数据互转（如Pydantic模型）
+    lock_ms: 重建锁有效期，默认CACHE_LOCK_MS；回源可能超过该时间时（如外部HTTP调用）需单独设置
+    error_types/error_ttl: 回源抛出这些异常时在Redis中缓存error_ttl秒，期间同键调用直接抛出同类异常
+    replica_reads: 可容忍短暂旧数据时先读副本，未命中再到主节点加锁回源
+
+    用法：
+        @cached("system_config", key=lambda self, keys: ",".join(sorted(keys)), tags=lambda self, keys: ["system_config"])
+        async def get_configs(self, keys): ...
+
+        await invalidate_tags("system_config")
+    """
+    cache = TwoTierCache(
+        name, ttl, l1_ttl=l1_ttl, l1_maxsize=l1_maxsize, jitter=jitter, dump=dump, load=load, lock_ms=lock_ms,
+        error_types=error_types, error_ttl=error_ttl, replica_reads=replica_reads,
+    )
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(
+                key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                tags(*args, **kwargs) if tags else (),
+            )
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats() -> Dict[str, dict]:
+    """获取所有两级缓存的统计信息"""
+    return {name: cache.get_stats() for name, cache in _caches.items()}
@@ -1,7 +1,11 @@
 from app.entities.user_entity import User
 from typing import Optional, Dict
+from app.core.config import settings
 from app.utils.logger_service import logger
 from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.redis.write_behind import RedisWriteBehind
+from app.infrastructure.cache.shared_memory_cache import SharedMemoryCache
+from app.infrastructure.cache.tinylfu_cache import TinyLFUCache
 from cachetools import TTLCache
 import asyncio
 import time
@@ -10,91 +14,302 @@ from typing import Optional, Dict
 class UserCache:
     def __init__(self):
         self.redis = redis_client
-        self.cache_expire = 3600
+        self.cache_expire = settings.USER_CACHE_REDIS_TTL
         self._operation_timeout = 5.0
-        
-        # 使用TTLCache，自动过期
-        self._memory_cache = TTLCache(
-            maxsize=1000,  # 最多缓存1000个用户
-            ttl=300        # 5分钟自动过期
+        self._memory_ttl = settings.USER_CACHE_L1_TTL
+
+        self._memory_backend = settings.USER_CACHE_L1_BACKEND
+        if self._memory_backend == "shared":
+            # 同主机多个worker共享一份内存层
+            self._memory_cache = SharedMemoryCache(
+                # 包含数据库名与Redis前缀，同一主机上的不同部署（环境）不共享缓存
+                name=f"{settings.DATABASE_NAME}_{settings.REDIS_PREFIX.strip(':')}_user_cache",
+                maxsize=settings.USER_CACHE_SHM_SLOTS,
+                ttl=self._memory_ttl,
+                slot_size=settings.USER_CACHE_SHM_SLOT_SIZE,
+            )
+        else:
+            # 使用W-TinyLFU，按访问频率准入，自动过期
+            self._memory_cache = TinyLFUCache(
+                maxsize=settings.USER_CACHE_L1_MAXSIZE,
+                ttl=self._memory_ttl
+            )
+        self._tier_stats = {
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+            "l2_errors": 0,
+        }
+
+        # 提前刷新（refresh-ahead）：条目进入TTL末段后被访问时，后台刷新，当前请求仍返回旧值
+        self._refresh_ahead_ratio = settings.USER_CACHE_REFRESH_AHEAD_RATIO
+        self._refresh_semaphore = asyncio.Semaphore(settings.USER_CACHE_REFRESH_CONCURRENCY)
+        self._refreshing: set = set()  # 正在刷新的token，避免重复刷新
+        self._refresh_tasks: set = set()  # 持有后台任务引用，防止被GC
+        self._refresh_stats = {
+            "scheduled": 0,
+            "completed": 0,
+            "failed": 0,
+            "skipped": 0,
+        }
+
+        # 降级模式：Redis不可用时，通过token->(用户ID, 会话过期时间)索引有限并发地回源数据库
+        # 索引记录Redis中会话的过期时间，刷新时沿用，不会延长会话有效期
+        self._token_index = TTLCache(
+            maxsize=settings.USER_CACHE_TOKEN_INDEX_MAXSIZE,
+            ttl=self.cache_expire
+        )
+        self._degraded_semaphore = asyncio.Semaphore(settings.USER_CACHE_DEGRADED_CONCURRENCY)
+        self._degraded_stats = {
+            "lookups": 0,
+            "hits": 0,
+            "rejected": 0,
+            "skipped_writes": 0,
+        }
+
+        # Redis写入走批量队列，避免每次登录单独起任务、单独往返
+        self._writer = RedisWriteBehind(
+            self.redis,
+            max_pending=settings.USER_CACHE_WRITE_BEHIND_MAX_PENDING,
+            batch_size=settings.USER_CACHE_WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.USER_CACHE_WRITE_BEHIND_FLUSH_MS / 1000,
         )
 
     async def get_user_by_token(self, token: str) -> Optional[User]:
         """通过token获取用户数据（使用TTLCache）"""
         if not token:
             return None
-        
+
         token_key = token
-        
-        # 1. 检查内存缓存（TTLCache自动处理过期）
-        if token_key in self._memory_cache:
-            user_data = self._memory_cache[token_key]
-            return User(**user_data)
-        
-        # 2. 检查Redis缓存
+
+        # 1. 检查内存缓存（自动处理过期）
+        entry = self._memory_cache.get(token_key)
+        if entry is not None and self._session_expired(entry["redis_expires_at"]):
+            # 会话已在Redis过期，内存层不能继续放行
+            self._memory_cache.pop(token_key, None)
+            entry = None
+        if entry is not None:
+            self._tier_stats["l1_hits"] += 1
+            self._maybe_refresh_ahead(token_key, entry)
+            return User(**entry["data"])
+        self._tier_stats["l1_misses"] += 1
+
+        # 2. Redis不可用时走降级回源
+        if not self.redis.is_healthy:
+            return await self._get_user_degraded(token_key)
+
+        # 3. 检查Redis缓存
         try:
             async with asyncio.timeout(self._operation_timeout):
-                user_data = await self.redis.get_json(token_key)
+                # 登录态必须读主节点：刚登录时主节点已写入，副本可能因复制延迟未命中，
+                # 其他worker据此回退到已使用过的code会导致新登录用户收到401
+                user_data, redis_ttl = await self.redis.get_json_with_ttl(token_key)
                 if user_data:
-                    # 缓存到内存（TTLCache自动管理过期）
-                    self._memory_cache[token_key] = user_data
+                    self._tier_stats["l2_hits"] += 1
+                    # 缓存到内存（自动管理过期）
+                    entry = self._build_entry(user_data, redis_ttl)
+                    self._memory_cache[token_key] = entry
+                    self._index_token(token_key, user_data, entry["redis_expires_at"])
+                    self._maybe_refresh_ahead(token_key, entry)
                     return User(**user_data)
+                self._tier_stats["l2_misses"] += 1
                 return None
         except asyncio.TimeoutError:
+            self._tier_stats["l2_errors"] += 1
             logger.warning(f"Redis获取超时: {token_key}")
             return None
         except Exception as e:
+            self._tier_stats["l2_errors"] += 1
             logger.warning(f"Redis获取失败: {e}")
+            return await self._get_user_degraded(token_key)
+
+    @staticmethod
+    def _session_expired(expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    @staticmethod
+    def _remaining_ttl(expires_at: Optional[float]) -> Optional[int]:
+        """会话剩余秒数（未知过期时间时为None）"""
+        if expires_at is None:
+            return None
+        return max(int(expires_at - time.monotonic()), 0)
+
+    def _index_token(self, token_key: str, user_data: dict, expires_at: Optional[float]) -> None:
+        user_id = user_data.get("id")
+        if user_id:
+            self._token_index[token_key] = (user_id, expires_at)
+
+    async def _get_user_degraded(self, token_key: str) -> Optional[User]:
+        """降级回源：按token索引到用户ID后查询数据库，超过并发上限直接放弃"""
+        # 延迟导入，避免基础设施层与CRUD层的循环依赖
+        from app.crud.user_crud import user_crud
+
+        indexed = self._token_index.get(token_key)
+        if not indexed or self._session_expired(indexed[1]):
+            return None
+        user_id, expires_at = indexed
+        if self._degraded_semaphore.locked():
+            self._degraded_stats["rejected"] += 1
             return None
-    
+
+        self._degraded_stats["lookups"] += 1
+        try:
+            async with self._degraded_semaphore:
+                async with asyncio.timeout(self._operation_timeout):
+                    user = await user_crud.get(user_id)
+        except Exception as e:
+            logger.warning(f"降级回源用户失败: {e}")
+            return None
+        if not user or user.is_deleted:
+            return None
+
+        self._degraded_stats["hits"] += 1
+        user_data = user.model_dump(exclude={"password"})
+        self._memory_cache[token_key] = self._build_entry(user_data, self._remaining_ttl(expires_at))
+        return user
+
     async def cache_user_by_token(self, token: str, user: User) -> None:
         """缓存用户数据"""
         if not token:
             return
-        
+
         token_key = token
         user_data = user.model_dump(exclude={"password"})
-        
-        # 立即缓存到内存（TTLCache自动管理过期）
-        self._memory_cache[token_key] = user_data
-        
-        # 异步缓存到Redis
-        asyncio.create_task(self._cache_to_redis(token_key, user_data))
-    
-    async def _cache_to_redis(self, token_key: str, user_data: dict):
-        """异步缓存到Redis"""
+
+        # 立即缓存到内存（自动管理过期）
+        entry = self._build_entry(user_data, self.cache_expire)
+        self._memory_cache[token_key] = entry
+        self._index_token(token_key, user_data, entry["redis_expires_at"])
+
+        # 异步批量缓存到Redis
+        self._cache_to_redis(token_key, user_data)
+
+    def _cache_to_redis(self, token_key: str, user_data: dict, keep_ttl: bool = False) -> None:
+        """加入Redis批量写入队列；keep_ttl时只更新已存在的会话，不改变其过期时间"""
+        if not self.redis.is_healthy:
+            self._degraded_stats["skipped_writes"] += 1
+            return
+        if not self._writer.enqueue_json(token_key, user_data, expire=self.cache_expire, keep_ttl=keep_ttl):
+            logger.warning(f"Redis写入队列已满，跳过缓存: {token_key}")
+
+    def _build_entry(self, user_data: dict, redis_ttl: Optional[int]) -> dict:
+        """构建内存缓存条目，记录内存层过期时间与会话（Redis）过期时间"""
+        now = time.monotonic()
+        if redis_ttl is None or redis_ttl < 0:
+            # -1: 无过期时间；-2: 键不存在（或超时），都视为无需按Redis TTL刷新
+            redis_expires_at = None
+        else:
+            redis_expires_at = now + redis_ttl
+        return {
+            "data": user_data,
+            "memory_expires_at": now + self._memory_ttl,
+            "redis_expires_at": redis_expires_at,
+        }
+
+    def _should_refresh(self, entry: dict) -> bool:
+        """
+        判断条目是否进入内存层TTL末段
+        会话（Redis）过期时间不参与判断：刷新不延长会话，接近会话结束时刷新没有意义
+        """
+        return entry["memory_expires_at"] - time.monotonic() <= self._memory_ttl * self._refresh_ahead_ratio
+
+    def _maybe_refresh_ahead(self, token_key: str, entry: dict) -> None:
+        """必要时调度后台刷新（受并发上限约束，超限则跳过）"""
+        if self._refresh_ahead_ratio <= 0 or not self._should_refresh(entry):
+            return
+        if token_key in self._refreshing:
+            return
+        if self._refresh_semaphore.locked():
+            self._refresh_stats["skipped"] += 1
+            return
+
+        self._refreshing.add(token_key)
+        self._refresh_stats["scheduled"] += 1
+        task = asyncio.create_task(self._refresh(token_key, entry["data"].get("id"), entry["redis_expires_at"]))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, token_key: str, user_id: Optional[str], expires_at: Optional[float]) -> None:
+        """从数据库重新加载用户并回写两级缓存（保留会话剩余有效期）"""
+        # 延迟导入，避免基础设施层与CRUD层的循环依赖
+        from app.crud.user_crud import user_crud
+
         try:
-            async with asyncio.timeout(self._operation_timeout):
-                await self.redis.set_json(token_key, user_data, expire=self.cache_expire)
+            async with self._refresh_semaphore:
+                if not user_id:
+                    raise ValueError("缓存条目缺少用户ID")
+                async with asyncio.timeout(self._operation_timeout):
+                    user = await user_crud.get(user_id)
+                if not user or user.is_deleted:
+                    # 用户已不存在，直接让缓存失效
+                    self._memory_cache.pop(token_key, None)
+                    self._token_index.pop(token_key, None)
+                    await self.redis.delete(token_key)
+                elif not self._session_expired(expires_at):
+                    user_data = user.model_dump(exclude={"password"})
+                    self._memory_cache[token_key] = self._build_entry(user_data, self._remaining_ttl(expires_at))
+                    self._index_token(token_key, user_data, expires_at)
+                    self._cache_to_redis(token_key, user_data, keep_ttl=True)
+                self._refresh_stats["completed"] += 1
         except Exception as e:
-            logger.warning(f"Redis缓存失败: {e}")
-    
+            self._refresh_stats["failed"] += 1
+            logger.warning(f"用户缓存后台刷新失败: {e}")
+        finally:
+            self._refreshing.discard(token_key)
+
     async def invalidate_user(self, user_id: str) -> None:
         """删除用户缓存"""
         # 从内存缓存中删除
-        keys_to_remove = []
-        for key, user_data in list(self._memory_cache.items()):
-            if user_data.get('id') == user_id:
-                keys_to_remove.append(key)
+        keys_to_remove = set()
+        for key, entry in list(self._memory_cache.items()):
+            if entry["data"].get('id') == user_id:
+                keys_to_remove.add(key)
+        for key, (indexed_user_id, _) in list(self._token_index.items()):
+            if indexed_user_id == user_id:
+                keys_to_remove.add(key)
         for key in keys_to_remove:
             self._memory_cache.pop(key, None)
-            async with asyncio.timeout(self._operation_timeout):
-                await self.redis.delete(key)
+            self._token_index.pop(key, None)
+            self._writer.discard(key)
         # 从Redis删除
+        if not keys_to_remove:
+            return
         try:
             async with asyncio.timeout(self._operation_timeout):
-                for key in keys_to_remove:
-                    await self.redis.delete(key)
+                await self.redis.delete(*keys_to_remove)
         except Exception as e:
             logger.warning(f"删除Redis用户缓存失败: {e}")
-    
+
+    async def close(self) -> None:
+        """关闭缓存：排空Redis写入队列，释放共享内存映射"""
+        await self._writer.close()
+        if isinstance(self._memory_cache, SharedMemoryCache):
+            self._memory_cache.close()
+
     def get_cache_stats(self) -> dict:
         """获取缓存统计信息"""
-        return {
+        stats = {
+            "memory_cache_backend": self._memory_backend,
             "memory_cache_size": len(self._memory_cache),
             "memory_cache_maxsize": self._memory_cache.maxsize,
             "memory_cache_currsize": self._memory_cache.currsize,
-            "memory_cache_ttl": self._memory_cache.ttl
+            "memory_cache_ttl": self._memory_cache.ttl,
+            "refresh_ahead_ratio": self._refresh_ahead_ratio,
+            "refresh_in_flight": len(self._refreshing),
+            "refresh_scheduled": self._refresh_stats["scheduled"],
+            "refresh_completed": self._refresh_stats["completed"],
+            "refresh_failed": self._refresh_stats["failed"],
+            "refresh_skipped": self._refresh_stats["skipped"],
+            "write_behind": self._writer.get_stats(),
+            "degraded": not self.redis.is_healthy,
+            "degraded_stats": dict(self._degraded_stats, token_index_size=len(self._token_index)),
+            **self._tier_stats,
         }
+        if isinstance(self._memory_cache, SharedMemoryCache):
+            stats["shared_memory"] = self._memory_cache.get_stats()
+        else:
+            stats["tinylfu"] = self._memory_cache.get_stats()
+        return stats
 
 user_cache = UserCache()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from app.infrastructure.redis.redis_client import RedisClient
+from app.utils.logger_service import logger
+
+
+class RedisWriteBehind:
+    """
+    Redis异步批量写入队列（write-behind）
+    - 收集待写入的键值，每隔flush_interval秒或累积batch_size条时通过一次pipeline写入
+    - 同一键的多次写入只保留最新值；队列满时丢弃新写入并计数
+    - keep_ttl写入只更新已存在的键并保留其剩余过期时间（SET XX KEEPTTL）
+    """
+
+    def __init__(
+        self,
+        client: RedisClient,
+        max_pending: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 0.005,
+    ):
+        self.client = client
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: "OrderedDict[str, Tuple[Any, Optional[int], bool]]" = OrderedDict()
+        self._has_items = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "flushed": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+    def start(self) -> None:
+        """启动后台刷写任务（首次写入时也会自动启动）"""
+        if self._task is None or self._task.done():
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue_json(self, key: str, value: Any, expire: Optional[int] = None, keep_ttl: bool = False) -> bool:
+        """
+        加入待写入队列，返回是否被接受
+        keep_ttl为True时忽略expire：键不存在则不写入，存在则只替换值、不改变过期时间
+        """
+        if self._closed:
+            self._stats["dropped"] += 1
+            return False
+
+        if key in self._pending:
+            _, pending_expire, pending_keep_ttl = self._pending[key]
+            if keep_ttl and not pending_keep_ttl:
+                # 尚未写入的是完整写入（如登录），沿用其过期时间，否则XX会因键不存在而丢弃
+                expire, keep_ttl = pending_expire, False
+            self._pending.move_to_end(key)
+            self._stats["coalesced"] += 1
+        elif len(self._pending) >= self.max_pending:
+            self._stats["dropped"] += 1
+            return False
+        self._pending[key] = (value, expire, keep_ttl)
+        self._stats["enqueued"] += 1
+
+        self._has_items.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+        self.start()
+        return True
+
+    def discard(self, key: str) -> None:
+        """移除尚未写入的键（用于缓存失效，防止旧值被回写）"""
+        self._pending.pop(key, None)
+
+    async def _run(self):
+        """后台刷写循环"""
+        while True:
+            await self._has_items.wait()
+            if len(self._pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush_once()
+            if len(self._pending) < self.batch_size:
+                self._batch_ready.clear()
+            if not self._pending:
+                self._has_items.clear()
+
+    async def _flush_once(self) -> int:
+        """取出一批数据并通过pipeline写入"""
+        if not self._pending:
+            return 0
+
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False))
+
+        try:
+            async with self.client.pipeline() as pipe:
+                for key, (value, expire, keep_ttl) in batch:
+                    if keep_ttl:
+                        pipe.set(self.client.generate_key(key), self.client.encode_value(value), xx=True, keepttl=True)
+                    else:
+                        pipe.set(self.client.generate_key(key), self.client.encode_value(value), ex=expire)
+            self._stats["flushed"] += len(batch)
+        except asyncio.CancelledError:
+            # 刷写中途被取消（如关闭时），放回队首由close排空
+            for key, item in reversed(batch):
+                if key not in self._pending:
+                    self._pending[key] = item
+                    self._pending.move_to_end(key, last=False)
+            raise
+        except Exception as e:
+            self._stats["failed"] += len(batch)
+            logger.warning(f"Redis批量写入失败({len(batch)}条): {e}")
+        self._stats["batches"] += 1
+        return len(batch)
+
+    async def flush(self) -> None:
+        """立即刷写所有待写入数据"""
+        while self._pending:
+            await self._flush_once()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """停止接收新写入，并在超时时间内排空队列"""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            async with asyncio.timeout(timeout):
+                await self.flush()
+        except asyncio.TimeoutError:
+            self._stats["dropped"] += len(self._pending)
+            logger.warning(f"Redis批量写入排空超时，丢弃{len(self._pending)}条")
+            self._pending.clear()
+
+    def get_stats(self) -> dict:
+        """获取队列统计信息"""
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            **self._stats,
+        }
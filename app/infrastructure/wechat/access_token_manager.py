@@ -0,0 +1,174 @@
+import time
+import uuid
+import random
+import asyncio
+from typing import Optional
+from app.core.config import settings
+from app.infrastructure.redis.redis_client import RedisClient, redis_client
+from app.infrastructure.wechat.wechat_auth import WechatAuth, WechatAuthError
+from app.utils.logger_service import logger
+
+
+class AccessTokenManager:
+    """
+    微信access_token管理（各worker共享Redis中的同一个token）
+    - 当前token保存在进程内，get_token直接返回，不产生I/O；仅首次获取或token已过期时等待刷新
+    - 后台任务在过期前refresh_ahead秒刷新：先读Redis，其他worker已刷新则直接采用；
+      否则抢分布式锁，只有持锁方请求微信接口并写回Redis，其余worker等待其结果
+    - 微信每次下发新token后旧token只再有效5分钟，因此refresh_ahead不应超过300秒，
+      且后台每sync_interval秒读一次Redis，及时采用其他worker提前换发的token
+    - Redis不可用时各worker自行获取（进程内并发合并为一次请求）
+    """
+
+    KEY = "wechat:access_token"
+    LOCK_KEY = "wechat:access_token:lock"
+    # 本地记录的过期时间比微信返回的提前，抵消网络延迟
+    EXPIRY_MARGIN = 60
+    # 刷新失败后的重试间隔（秒）
+    RETRY_INTERVAL = 5
+
+    def __init__(
+        self,
+        wechat_auth: WechatAuth,
+        client: RedisClient,
+        refresh_ahead: int = 300,
+        sync_interval: int = 60,
+        lock_ms: int = 15000,
+    ):
+        self.wechat_auth = wechat_auth
+        self.redis = client
+        self.refresh_ahead = refresh_ahead
+        self.sync_interval = sync_interval
+        self.lock_ms = lock_ms
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # Unix时间戳，与Redis中保存的一致，便于worker间比较新旧
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"fetches": 0, "adopted": 0, "lock_waits": 0, "errors": 0}
+
+    async def get_token(self) -> str:
+        """获取当前access_token，失败时抛出WechatAuthError"""
+        if self._token is None or time.time() >= self._expires_at:
+            await self.refresh()
+        self.start()
+        return self._token
+
+    def start(self) -> None:
+        """启动后台刷新任务（首次获取token后自动启动）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def refresh(self) -> None:
+        """同步Redis中的token，即将过期时刷新（进程内并发合并为一次）"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._sync())
+        # shield：单个调用方取消不影响正在进行的刷新
+        await asyncio.shield(self._refreshing)
+
+    def _remaining(self) -> float:
+        return self._expires_at - time.time()
+
+    def _set(self, token: str, expires_at: float) -> None:
+        self._token = token
+        self._expires_at = expires_at
+
+    async def _adopt_from_redis(self) -> bool:
+        """采用Redis中更新的token，返回当前token是否无需刷新"""
+        data = await self.redis.get_json(self.KEY)
+        if data and data["expires_at"] > self._expires_at:
+            self._set(data["token"], data["expires_at"])
+            self._stats["adopted"] += 1
+        return self._remaining() > self.refresh_ahead
+
+    async def _fetch(self) -> dict:
+        """向微信服务器请求新token"""
+        self._stats["fetches"] += 1
+        token, expires_in = await self.wechat_auth.fetch_access_token()
+        data = {"token": token, "expires_at": time.time() + expires_in - self.EXPIRY_MARGIN}
+        self._set(data["token"], data["expires_at"])
+        logger.info(f"微信access_token已刷新，有效期{expires_in}秒")
+        return data
+
+    async def _sync(self) -> None:
+        if self.redis.is_healthy:
+            try:
+                if await self._adopt_from_redis():
+                    return
+                lock_token = uuid.uuid4().hex
+                if await self.redis.compare_and_set(self.LOCK_KEY, None, lock_token, self.lock_ms):
+                    try:
+                        # 双重检查：等锁期间其他worker可能刚写入
+                        if await self._adopt_from_redis():
+                            return
+                        data = await self._fetch()
+                        await self.redis.set_json(self.KEY, data, max(1, int(data["expires_at"] - time.time())))
+                    finally:
+                        await self._release(lock_token)
+                    return
+                self._stats["lock_waits"] += 1
+                if await self._wait_for_holder():
+                    return
+            except WechatAuthError:
+                raise
+            except Exception as e:
+                logger.warning(f"通过Redis同步access_token失败: {e}")
+
+        # Redis不可用或持锁方超时：旧token仍有效时继续使用，等下次重试
+        if self._token is not None and self._remaining() > 0:
+            return
+        await self._fetch()
+
+    async def _wait_for_holder(self) -> bool:
+        """等待持锁的worker写入新token，最长等待锁的有效期"""
+        deadline = time.monotonic() + self.lock_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            if await self._adopt_from_redis():
+                return True
+        return False
+
+    async def _release(self, lock_token: str) -> None:
+        try:
+            await self.redis.compare_and_delete(self.LOCK_KEY, lock_token)
+        except Exception as e:
+            # 锁会按有效期自动过期
+            logger.warning(f"释放access_token刷新锁失败: {e}")
+
+    async def _run(self) -> None:
+        """后台刷新循环"""
+        while True:
+            delay = min(self._remaining() - self.refresh_ahead, self.sync_interval)
+            # 随机抖动，避免各worker同时抢锁
+            await asyncio.sleep(max(delay, self.RETRY_INTERVAL) + random.uniform(0, 1))
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"后台刷新access_token失败: {e}")
+
+    async def close(self) -> None:
+        """停止后台任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        """获取token状态"""
+        return {
+            "has_token": self._token is not None,
+            "expires_in": max(0, int(self._remaining())) if self._token else 0,
+            **self._stats,
+        }
+
+
+access_token_manager = AccessTokenManager(
+    WechatAuth(),
+    redis_client,
+    refresh_ahead=settings.WECHAT_TOKEN_REFRESH_AHEAD,
+    sync_interval=settings.WECHAT_TOKEN_SYNC_INTERVAL,
+    lock_ms=settings.WECHAT_TOKEN_LOCK_MS,
+)
@@ -1,56 +1,117 @@
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 from fastapi import HTTPException
-import aiohttp
+import httpx
 import json
+import hmac
+import base64
+import asyncio
+import hashlib
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from datetime import datetime, timedelta
 from app.core.config import settings
 from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.http.http_client import http_client
+from app.infrastructure.redis.two_tier_cache import cached
 from app.utils.logger_service import logger
 
 class WechatAuthError(Exception):
     """微信认证相关错误"""
     pass
 
+
+class WechatAPIError(WechatAuthError):
+    """微信接口返回的业务错误（errcode非0，如code无效或已使用），重试同一请求不会成功"""
+    pass
+
+
+def _decrypt_payload(session_key: str, encrypted_data: str, iv: str) -> Dict[str, Any]:
+    """AES-128-CBC解密并校验PKCS#7补位（纯CPU计算，可在线程池中执行）"""
+    decryptor = Cipher(
+        algorithms.AES(base64.b64decode(session_key)),
+        modes.CBC(base64.b64decode(iv))
+    ).decryptor()
+    padded = decryptor.update(base64.b64decode(encrypted_data)) + decryptor.finalize()
+    # 补位不合法时抛出ValueError
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    return json.loads(unpadder.update(padded) + unpadder.finalize())
+
+
 class WechatAuth:
     def __init__(self):
         self.settings = settings
         self.redis_client = redis_client
+        self.http_client = http_client
+        self.base_url = settings.WECHAT_API_BASE_URL.rstrip("/")
         
     async def _request(self, url: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """发送HTTP请求到微信服务器"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    # 先获取响应文本
-                    response_text = await response.text()
-                    logger.info(f"微信API响应: {response_text}")
-                    
-                    # 检查HTTP状态码
-                    if response.status != 200:
-                        raise WechatAuthError(f"HTTP错误: {response.status}, 响应: {response_text}")
-                    
-                    # 尝试解析JSON
-                    try:
-                        data = json.loads(response_text)
-                    except json.JSONDecodeError:
-                        raise WechatAuthError(f"无法解析微信API响应: {response_text}")
-                    
-                    # 检查微信API错误码
-                    if "errcode" in data and data["errcode"] != 0:
-                        error_msg = data.get('errmsg', '未知错误')
-                        raise WechatAuthError(f"微信API错误 {data['errcode']}: {error_msg}")
-                    
-                    return data
-        except aiohttp.ClientError as e:
+            # 使用共享客户端，复用到微信服务器的长连接
+            response = await self.http_client.client.get(url, params=params)
+            # 先获取响应文本
+            response_text = response.text
+            logger.info(f"微信API响应: {response_text}")
+            
+            # 检查HTTP状态码
+            if response.status_code != 200:
+                raise WechatAuthError(f"HTTP错误: {response.status_code}, 响应: {response_text}")
+            
+            # 尝试解析JSON
+            try:
+                data = json.loads(response_text)
+            except json.JSONDecodeError:
+                raise WechatAuthError(f"无法解析微信API响应: {response_text}")
+            
+            # 检查微信API错误码
+            if "errcode" in data and data["errcode"] != 0:
+                error_msg = data.get('errmsg', '未知错误')
+                raise WechatAPIError(f"微信API错误 {data['errcode']}: {error_msg}")
+            
+            return data
+        except httpx.HTTPError as e:
             raise WechatAuthError(f"网络请求失败: {str(e)}")
         except Exception as e:
             if isinstance(e, WechatAuthError):
                 raise
             raise WechatAuthError(f"请求微信服务器失败: {str(e)}")
 
+    @cached(
+        "wechat_code2session",
+        key=lambda self, code: code,
+        ttl=settings.WECHAT_CODE_SESSION_TTL,
+        jitter=0,
+        load=dict,
+        # 锁须覆盖一次完整的微信请求：锁提前过期时其他worker会再次兑换同一code，收到40163
+        lock_ms=int((settings.HTTP_CONNECT_TIMEOUT + settings.HTTP_TIMEOUT) * 1000) + 2000,
+        # code无效/已使用时短暂缓存失败：等待中的worker与客户端重试直接失败，不再向微信兑换
+        error_types=(WechatAPIError,),
+        error_ttl=settings.WECHAT_CODE_ERROR_TTL,
+    )
+    async def _code2session(self, code: str) -> Dict[str, Any]:
+        """调用jscode2session（失败抛出WechatAuthError）"""
+        url = f"{self.base_url}/sns/jscode2session"
+        params = {
+            "appid": self.settings.WECHAT_APP_ID,
+            "secret": self.settings.WECHAT_APP_SECRET,
+            "js_code": code,
+            "grant_type": "authorization_code"
+        }
+        
+        data = await self._request(url, params)
+        if "openid" not in data or "session_key" not in data:
+            raise WechatAPIError("无效的登录凭证")
+        return {
+            "openid": data["openid"],
+            "session_key": data["session_key"],
+            "unionid": data.get("unionid")  # 如果开发者帐号下存在同主体的公众号，返回 unionid
+        }
+
     async def code2session(self, code: str) -> Dict[str, Any]:
         """
         使用 code 换取用户的 openid 和 session_key
+        code只能使用一次：同一code的并发与重试调用共享一次微信请求，结果在Redis中短暂缓存，
+        客户端重试时直接返回同一会话；code无效时失败结果缓存WECHAT_CODE_ERROR_TTL秒
         
         Args:
             code: 小程序登录时获取的 code
@@ -58,57 +119,37 @@ class WechatAuth:
         Returns:
             Dict: 包含 openid 和 session_key 的字典
         """
-        url = "https://api.weixin.qq.com/sns/jscode2session"
-        params = {
-            "appid": self.settings.WECHAT_APP_ID,
-            "secret": self.settings.WECHAT_APP_SECRET,
-            "js_code": code,
-            "grant_type": "authorization_code"
-        }
-        
         try:
-            data = await self._request(url, params)
-            return {
-                "openid": data["openid"],
-                "session_key": data["session_key"],
-                "unionid": data.get("unionid")  # 如果开发者帐号下存在同主体的公众号，返回 unionid
-            }
+            return await self._code2session(code)
         except WechatAuthError as e:
             raise HTTPException(status_code=401, detail=str(e))
-        except KeyError:
-            raise HTTPException(status_code=401, detail="无效的登录凭证")
 
-    async def get_access_token(self) -> str:
+    async def fetch_access_token(self) -> Tuple[str, int]:
         """
-        获取小程序全局接口调用凭据
-        使用 Redis 缓存 access_token
+        向微信服务器请求新的access_token，返回 (token, 有效秒数)
+        每次请求都会使旧token在5分钟后失效，业务代码应通过get_access_token获取
         """
-        # 先从 Redis 获取
-        cached_token = await self.redis_client.get("wechat:access_token")
-        if cached_token:
-            return cached_token
-            
-        # 如果没有缓存，则从微信服务器获取
-        url = "https://api.weixin.qq.com/cgi-bin/token"
+        url = f"{self.base_url}/cgi-bin/token"
         params = {
             "grant_type": "client_credential",
             "appid": self.settings.WECHAT_APP_ID,
             "secret": self.settings.WECHAT_APP_SECRET
         }
-        
+        data = await self._request(url, params)
         try:
-            data = await self._request(url, params)
-            access_token = data["access_token"]
-            expires_in = data["expires_in"]
-            
-            # 将 token 存入 Redis，设置过期时间比微信服务器返回的时间短一点，确保安全
-            await self.redis_client.setex(
-                "wechat:access_token",
-                expires_in - 300,  # 提前5分钟过期
-                access_token
-            )
-            
-            return access_token
+            return data["access_token"], int(data["expires_in"])
+        except (KeyError, TypeError, ValueError):
+            raise WechatAuthError(f"无效的access_token响应: {data}")
+
+    async def get_access_token(self) -> str:
+        """
+        获取小程序全局接口调用凭据
+        由access_token_manager统一管理（分布式锁保证只有一个worker刷新，进程内直接返回当前token）
+        """
+        from app.infrastructure.wechat.access_token_manager import access_token_manager
+
+        try:
+            return await access_token_manager.get_token()
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -127,9 +168,6 @@ class WechatAuth:
         Returns:
             bool: 验证是否通过
         """
-        import hashlib
-        import hmac
-        
         try:
             signature_generated = hmac.new(
                 session_key.encode(),
@@ -156,27 +194,12 @@ class WechatAuth:
         Returns:
             Dict: 解密后的数据
         """
-        from Crypto.Cipher import AES
-        import base64
-        
         try:
-            # 使用 base64 解码
-            session_key = base64.b64decode(session_key)
-            encrypted_data = base64.b64decode(encrypted_data)
-            iv = base64.b64decode(iv)
-            
-            # 创建解密器
-            cipher = AES.new(session_key, AES.MODE_CBC, iv)
-            
-            # 解密
-            decrypted = cipher.decrypt(encrypted_data)
-            
-            # 去除补位
-            pad = decrypted[-1]
-            decrypted = decrypted[:-pad]
-            
-            # 将解密后的数据转换为字典
-            decrypted_data = json.loads(decrypted)
+            # 大数据量时在线程池中解密，避免阻塞事件循环（小数据量切换线程的开销大于解密本身）
+            if len(encrypted_data) >= self.settings.WECHAT_DECRYPT_OFFLOAD_BYTES:
+                decrypted_data = await asyncio.to_thread(_decrypt_payload, session_key, encrypted_data, iv)
+            else:
+                decrypted_data = _decrypt_payload(session_key, encrypted_data, iv)
             
             # 检查数据水印
             if decrypted_data["watermark"]["appid"] != self.settings.WECHAT_APP_ID:
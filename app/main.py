@@ -1,17 +1,27 @@
-from fastapi import FastAPI
+import hmac
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.data_source import init_db
+from app.core.query_plan_check import check_query_plans
 from app.middleware.error_handler import register_error_handler
 from contextlib import asynccontextmanager
+from typing import Any, Dict
 
 from app.features import (
     user_router,
     ai_agent_router
 )
 from app.utils.logger_service import logger
+from app.schemas.response_schema import BaseResponse
 from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.http.http_client import http_client
+from app.infrastructure.wechat.access_token_manager import access_token_manager
+from app.infrastructure.redis.user_cache import user_cache
+from app.infrastructure.redis.two_tier_cache import get_cache_stats
 from app.middleware.auth_middleware import AuthMiddleware
+from app.middleware.rate_limiter import RateLimiter, rate_limit_cost
+from app.infrastructure.redis.hybrid_rate_limiter import hybrid_rate_limiter
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -25,9 +35,21 @@ async def lifespan(app: FastAPI):
         await init_db()
         logger.info("数据库初始化完成")
 
-        # 初始化Redis连接
+        # 检查登记的查询形态是否走索引（只告警，不影响启动）
+        if settings.MONGODB_CHECK_QUERY_PLANS:
+            reports = await check_query_plans()
+            logger.info(f"查询执行计划检查完成: {len(reports)}个形态，"
+                        f"{sum(report['collscan'] for report in reports)}个全表扫描")
+
+        # 初始化Redis连接（不可用时以降级模式启动，后台重连）
         await redis_client.init()
-        logger.info("Redis连接成功")
+        if redis_client.is_healthy:
+            logger.info("Redis连接成功")
+        else:
+            logger.warning("Redis不可用，以降级模式启动")
+
+        # 初始化共享的出站HTTP客户端
+        await http_client.init()
 
         yield  # 应用运行期间
 
@@ -36,9 +58,28 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # 这里可以添加资源清理代码
+        # 先排空用户缓存的Redis写入队列，再关闭连接
+        try:
+            await user_cache.close()
+            logger.info("用户缓存写入队列已排空")
+        except Exception as e:
+            logger.error(f"排空用户缓存写入队列时出错: {str(e)}")
+
+        # 对账本地限流消耗
+        await hybrid_rate_limiter.close()
+
+        # 停止access_token后台刷新
+        await access_token_manager.close()
+
+        try:
+            await http_client.close()
+            logger.info("出站HTTP客户端已关闭")
+        except Exception as e:
+            logger.error(f"关闭出站HTTP客户端时出错: {str(e)}")
+
         if redis_client and redis_client.redis:
             try:
-                await redis_client.redis.close()
+                await redis_client.close()
                 logger.info("Redis连接已关闭")
             except Exception as e:
                 logger.error(f"关闭Redis连接时出错: {str(e)}")
@@ -66,6 +107,17 @@ app = FastAPI(
 # 以正确的顺序添加中间件
 # 错误处理中间件应该最先添加，这样它可以捕获其他中间件中的错误
 register_error_handler(app)
+# 限流在认证之后执行（后添加的中间件在外层），以便按用户ID限流
+app.add_middleware(
+    RateLimiter,
+    requests_per_minute=settings.RATE_LIMIT_PER_MINUTE,
+    anonymous_requests_per_minute=settings.RATE_LIMIT_ANONYMOUS_PER_MINUTE,
+    routes={
+        "/docs": None,
+        "/redoc": None,
+        "/openapi.json": None,
+    },
+)
 app.add_middleware(AuthMiddleware)
 
 # 添加CORS中间件
@@ -79,5 +131,35 @@ app.add_middleware(
 
 
 
+@app.get("/health", response_model=BaseResponse[Dict[str, Any]])
+@rate_limit_cost(0)
+async def health():
+    """服务健康状态（公开接口，只返回状态；Redis降级时status为degraded）"""
+    return BaseResponse.success(data={"status": "ok" if redis_client.is_healthy else "degraded"})
+
+
+@app.get("/internal/metrics", response_model=BaseResponse[Dict[str, Any]], include_in_schema=False)
+@rate_limit_cost(0)
+async def internal_metrics(x_metrics_token: str = Header("")):
+    """内部运行指标（连接池、熔断、缓存、限流、DNS缓存、access_token），需携带X-Metrics-Token"""
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(x_metrics_token, settings.METRICS_TOKEN):
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "code": 404,
+                "message": "Not Found"
+            }
+        )
+    return BaseResponse.success(data={
+        "status": "ok" if redis_client.is_healthy else "degraded",
+        "redis": redis_client.get_pool_status(),
+        "user_cache": user_cache.get_cache_stats(),
+        "caches": get_cache_stats(),
+        "rate_limiter": hybrid_rate_limiter.get_stats(),
+        "http_client": http_client.get_stats(),
+        "wechat_access_token": access_token_manager.get_stats(),
+    })
+
+
 app.include_router(user_router, prefix="/api/v1", tags=["users"])
 app.include_router(ai_agent_router, prefix="/api/v1", tags=["ai_agent"])
\ No newline at end of file
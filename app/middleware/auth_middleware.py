@@ -28,6 +28,8 @@ class AuthMiddleware(BaseHTTPMiddleware):
         self.excluded_verify_prefixes = [
             "/api/v1/users/sync",
             "/health",
+            # 由X-Metrics-Token校验，不走用户token
+            "/internal/metrics",
             "/favicon.ico",
             "/docs",
             "/redoc", 
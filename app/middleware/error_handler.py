@@ -21,6 +21,7 @@ def determine_status_code(exc_type: str) -> int:
         "NotFoundError": 404,
         "TimeoutError": 504,
         "ConnectionError": 503,
+        "CircuitOpenError": 503,
         "AttributeError": 500,
         "KeyError": 500,
         "ValueError": 400,
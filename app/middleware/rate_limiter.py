@@ -1,36 +1,128 @@
+import math
 import time
-from typing import Dict, Optional
-from fastapi import Request, HTTPException
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+from cachetools import TTLCache
+from app.core.config import settings
 from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.redis.hybrid_rate_limiter import hybrid_rate_limiter
 from app.utils.logger_service import logger
 
 
+DEFAULT_COST = 1
+
+
+def rate_limit_cost(cost: int):
+    """
+    标注路由的限流成本（放在路由装饰器下方）
+    同一身份的所有请求从同一额度中按成本扣除；成本为0的路由不限流
+
+    用法：
+        @router.post("/decision")
+        @rate_limit_cost(50)
+        async def get_decision_advice(...): ...
+    """
+    def decorator(func):
+        func.rate_limit_cost = cost
+        return func
+    return decorator
+
+
+class RateLimitPolicy:
+    """
+    限流策略：任意period秒的滑动区间内最多消耗limit单位额度（GCRA，无窗口边界的2倍突发）
+    anonymous_limit: 未登录（按IP识别）时的上限，不设置时与limit相同
+    """
+
+    def __init__(self, name: str, limit: int, period: int = 60, anonymous_limit: Optional[int] = None):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.anonymous_limit = anonymous_limit if anonymous_limit is not None else limit
+
+    def limit_for(self, client_id: str) -> int:
+        return self.limit if client_id.startswith("user:") else self.anonymous_limit
+
+
 class RateLimiter(BaseHTTPMiddleware):
-    """API限流中间件"""
-    
-    def __init__(self, app, requests_per_minute: int = 60):
+    """
+    API限流中间件
+    - 按路由前缀选择策略（最长前缀优先），策略为None的路径不限流
+    - 每个请求按路由标注的成本（rate_limit_cost，默认1）扣除额度，昂贵接口与廉价接口共用同一额度
+    - 已登录用户按用户ID限流，否则按IP；需注册在AuthMiddleware内层才能拿到当前用户
+    - 超限直接返回429及Retry-After，所有响应带X-RateLimit-*头
+    - mode为hybrid时使用本地令牌桶+定期对账（见HybridRateLimiter），多数请求无需访问Redis
+    - Redis不可用时退化为进程内GCRA，仅限制单个worker
+    """
+
+    def __init__(
+        self,
+        app,
+        requests_per_minute: int = 60,
+        anonymous_requests_per_minute: Optional[int] = None,
+        routes: Optional[Dict[str, Optional[RateLimitPolicy]]] = None,
+        mode: Optional[str] = None,
+    ):
         super().__init__(app)
-        self.requests_per_minute = requests_per_minute
+        self.mode = mode or settings.RATE_LIMIT_MODE
+        self.default_policy = RateLimitPolicy("default", requests_per_minute, 60, anonymous_requests_per_minute)
+        # 按前缀长度降序，保证最长前缀优先匹配
+        self.routes = sorted((routes or {}).items(), key=lambda item: len(item[0]), reverse=True)
         self.redis = redis_client
-    
+        # Redis不可用时的进程内TAT（理论到达时间）
+        self._local_tat = TTLCache(maxsize=100000, ttl=max([self.default_policy.period] + [
+            policy.period for _, policy in self.routes if policy
+        ]))
+        self.degraded_requests = 0
+
     async def dispatch(self, request: Request, call_next):
-        # 获取客户端标识
+        policy = self._get_policy(request.url.path)
+        cost = self._get_cost(request)
+        if policy is None or cost <= 0:
+            return await call_next(request)
+
         client_id = self._get_client_id(request)
-        
-        # 检查限流
-        if await self._is_rate_limited(client_id):
-            raise HTTPException(
+        limit = policy.limit_for(client_id)
+        allowed, remaining, retry_after_ms, reset_after_ms = await self._acquire(policy, client_id, limit, cost)
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Cost": str(cost),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(math.ceil(reset_after_ms / 1000)),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_after_ms / 1000)))
+            return JSONResponse(
                 status_code=429,
-                detail="请求过于频繁，请稍后再试"
+                content={
+                    "code": 429,
+                    "message": "请求过于频繁，请稍后再试"
+                },
+                headers=headers,
             )
-        
-        # 记录请求
-        await self._record_request(client_id)
-        
+
         response = await call_next(request)
+        response.headers.update(headers)
         return response
-    
+
+    def _get_policy(self, path: str) -> Optional[RateLimitPolicy]:
+        """按路由前缀匹配限流策略"""
+        for prefix, policy in self.routes:
+            if path.startswith(prefix):
+                return policy
+        return self.default_policy
+
+    def _get_cost(self, request: Request) -> int:
+        """匹配请求对应的路由，读取其标注的限流成本"""
+        for route in request.app.router.routes:
+            match, _ = route.matches(request.scope)
+            if match == Match.FULL:
+                return getattr(getattr(route, "endpoint", None), "rate_limit_cost", DEFAULT_COST)
+        return DEFAULT_COST
+
     def _get_client_id(self, request: Request) -> str:
         """获取客户端标识"""
         # 优先使用用户ID，否则使用IP
@@ -38,19 +130,32 @@ class RateLimiter(BaseHTTPMiddleware):
             return f"user:{request.state.current_user.id}"
         else:
             return f"ip:{request.client.host}"
-    
-    async def _is_rate_limited(self, client_id: str) -> bool:
-        """检查是否达到限流阈值"""
-        key = f"rate_limit:{client_id}"
-        current_requests = await self.redis.get(key)
-        
-        if current_requests is None:
-            return False
-        
-        return int(current_requests) >= self.requests_per_minute
-    
-    async def _record_request(self, client_id: str):
-        """记录请求"""
-        key = f"rate_limit:{client_id}"
-        await self.redis.incr(key)
-        await self.redis.expire(key, 60)  # 1分钟过期
\ No newline at end of file
+
+    async def _acquire(
+        self, policy: RateLimitPolicy, client_id: str, limit: int, cost: int
+    ) -> Tuple[bool, int, int, int]:
+        """检查并按成本消耗额度，返回 (是否放行, 剩余额度, 需等待毫秒, 额度完全恢复的毫秒)"""
+        key = f"rate_limit:{policy.name}:{client_id}"
+        if self.redis.is_healthy:
+            try:
+                if self.mode == "hybrid":
+                    return await hybrid_rate_limiter.acquire(key, limit, policy.period * 1000, cost)
+                return await self.redis.gcra(key, limit, policy.period * 1000, cost)
+            except Exception as e:
+                logger.warning(f"限流检查失败，使用进程内限流: {e}")
+
+        self.degraded_requests += 1
+        return self._acquire_local(key, limit, policy.period * 1000, cost)
+
+    def _acquire_local(self, key: str, limit: int, period_ms: int, cost: int) -> Tuple[bool, int, int, int]:
+        """进程内GCRA，与Redis脚本逻辑一致"""
+        now = time.monotonic() * 1000
+        emission = period_ms / limit
+        tat = max(self._local_tat.get(key, now), now)
+        new_tat = tat + emission * cost
+        diff = now - (new_tat - period_ms)
+        if diff < 0:
+            remaining = max(0, math.floor((now - (tat - period_ms)) / emission))
+            return False, remaining, math.ceil(-diff), math.ceil(tat - now)
+        self._local_tat[key] = new_tat
+        return True, math.floor(diff / emission), 0, math.ceil(new_tat - now)
@@ -123,6 +123,16 @@ class UserProfileResponse(BaseModel):
     
     model_config = {"from_attributes": True}
 
+# 用户摘要（列表/批量查询用的精简读模型，只从数据库读取这些字段）
+class UserSummary(BaseModel):
+    id: str = Field(alias="_id")
+    nickname: Optional[str] = ""
+    name: Optional[str] = ""
+    avatar_url: Optional[str] = ""
+    gender: Optional[int] = 0
+
+    model_config = {"populate_by_name": True}
+
 # 微信登录响应模型
 class WechatLoginResponse(BaseModel):
     session_info: WechatSession
@@ -133,16 +143,18 @@ class WechatLoginResponse(BaseModel):
 # 分页响应模型
 #######################
 
-# 增量更新参数
+# 增量更新参数（按 (created_at, id) 键集分页）
 class UserIncrementalParams(BaseModel):
     last_id: Optional[str] = Field(None, description="最后一条用户ID，用于增量获取")
-    limit: int = Field(default=20, ge=1, le=99999, description="限制数量")
-    direction: str = Field(default="before", description="获取方向: after(之后的数据) 或 before(之前的数据)")
+    last_timestamp: Optional[datetime] = Field(None, description="最后一条的创建时间（与last_id一起传入可省去一次查询）")
+    limit: int = Field(default=20, ge=1, le=100, description="限制数量")
+    direction: str = Field(default="before", pattern="^(before|after)$", description="获取方向: after(之后的数据) 或 before(之前的数据)")
+    with_total: bool = Field(default=False, description="是否返回总数量（需额外一次计数查询）")
 
 # 增量响应模型
 class UserIncrementalResponse(BaseModel):
-    items: List[UserResponse]
+    items: List[UserProfileResponse]
     has_more: bool = Field(description="是否还有更多数据")
     last_id: Optional[str] = Field(None, description="本次返回的最后一条用户ID")
     last_timestamp: Optional[datetime] = Field(None, description="本次返回的最后一条时间戳")
-    total: int = Field(default=0, description="总数量")
\ No newline at end of file
+    total: Optional[int] = Field(None, description="总数量（仅with_total为true时返回）")
@@ -0,0 +1,44 @@
+import unicodedata
+from typing import List
+
+# 参与分词的最大字符数（昵称、姓名都较短，超出部分不建索引）
+MAX_TOKEN_TEXT_LENGTH = 32
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    搜索文本归一化：全角转半角（NFKC）、忽略大小写、去除空白
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(text.split())
+
+
+def ngram_tokens(text: str) -> List[str]:
+    """
+    生成写入索引的检索词：单字 + 相邻两字
+    中文没有空格分词，按字切分即可支持任意位置的子串检索
+
+    Examples:
+        >>> ngram_tokens("张三丰")
+        ['张', '三', '丰', '张三', '三丰']
+    """
+    text = normalize_search_text(text)[:MAX_TOKEN_TEXT_LENGTH]
+    unigrams = list(dict.fromkeys(text))
+    bigrams = list(dict.fromkeys(text[i:i + 2] for i in range(len(text) - 1)))
+    return unigrams + bigrams
+
+
+def query_tokens(keyword: str) -> List[str]:
+    """
+    生成查询用的检索词：单字关键词查单字，否则查所有相邻两字（文档需包含全部）
+
+    Examples:
+        >>> query_tokens("三丰")
+        ['三丰']
+    """
+    text = normalize_search_text(keyword)[:MAX_TOKEN_TEXT_LENGTH]
+    if len(text) <= 1:
+        return [text] if text else []
+    return list(dict.fromkeys(text[i:i + 2] for i in range(len(text) - 1)))
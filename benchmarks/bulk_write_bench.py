@@ -0,0 +1,110 @@
+"""
+批量写入吞吐：逐条create与bulk_create（validate开/关）、bulk_update、bulk_upsert对比
+使用替身集合：不落库，每次往返固定增加--latency-ms延迟，测得的是客户端开销（构造/校验/编码）加往返次数
+
+用法: python -m benchmarks.bulk_write_bench [--docs 20000] [--latency-ms 0.5]
+"""
+import os
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import InsertOne
+from app.entities import User, SystemConfig
+from app.crud.user_crud import user_crud
+from app.schemas.user_schema import UserCreate
+
+
+class LatencyCollection:
+    """只统计写入条数与往返次数的替身集合，每次往返等待固定延迟"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.round_trips = 0
+
+    async def insert_one(self, document, session=None):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def bulk_write(self, operations, ordered=True):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+        inserted = sum(isinstance(op, InsertOne) for op in operations)
+        updated = len(operations) - inserted
+        return SimpleNamespace(bulk_api_result={
+            "nInserted": inserted, "nMatched": updated, "nModified": updated, "nUpserted": 0,
+        })
+
+    def find(self, query, projection=None):
+        """bulk_upsert按非_id键查询受影响ID时使用，替身不返回文档"""
+        async def cursor():
+            self.round_trips += 1
+            await asyncio.sleep(self.latency)
+            return
+            yield
+        return cursor()
+
+
+def make_users(count: int):
+    return [
+        UserCreate(wechat_openid=f"o{i:027d}", wechat_unionid=f"u{i:027d}", nickname=f"用户{i}", gender=i % 3)
+        for i in range(count)
+    ]
+
+
+async def run(docs: int, latency: float) -> None:
+    await init_beanie(database=AsyncMongoMockClient(tz_aware=True)["bench"], document_models=[User, SystemConfig])
+    collection = LatencyCollection(latency)
+    User.get_motor_collection = classmethod(lambda cls: collection)
+    users = make_users(docs)
+    # 逐条写入每条一次往返，只取一部分样本
+    one_by_one = users[:min(docs, 2000)]
+
+    async def create_each():
+        for user in one_by_one:
+            await user_crud.create(user)
+        return len(one_by_one)
+
+    async def bulk_create(validate: bool):
+        await user_crud.bulk_create(users, validate=validate)
+        return docs
+
+    async def bulk_update():
+        await user_crud.bulk_update([(f"id{i}", {"nickname": f"新昵称{i}", "gender": 1}) for i in range(docs)])
+        return docs
+
+    async def bulk_upsert():
+        await user_crud.bulk_upsert(users, keys=["wechat_openid"])
+        return docs
+
+    cases = [
+        ("逐条create", create_each),
+        ("bulk_create validate=True", lambda: bulk_create(True)),
+        ("bulk_create validate=False", lambda: bulk_create(False)),
+        ("bulk_update", bulk_update),
+        ("bulk_upsert", bulk_upsert),
+    ]
+    for label, case in cases:
+        collection.round_trips = 0
+        start = time.perf_counter()
+        count = await case()
+        elapsed = time.perf_counter() - start
+        print(f"{label:28s} {count / elapsed:>9,.0f} 条/s  往返 {collection.round_trips}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(run(args.docs, args.latency_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
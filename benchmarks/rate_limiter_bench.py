@@ -0,0 +1,116 @@
+"""
+限流吞吐对比：redis模式（每次请求一次GCRA往返）与hybrid模式（本地令牌桶 + 定期对账）
+1. 单个热点键顺序请求
+2. 多键并发请求（多个HybridRateLimiter实例模拟多个worker），统计Redis往返次数
+3. 大量空闲键时一次flush的耗时（只处理有消耗的键）
+
+需要本地redis-server: python -m benchmarks.rate_limiter_bench [--redis 127.0.0.1:6379]
+"""
+import time
+import asyncio
+import argparse
+from app.core.config import settings
+from app.infrastructure.redis.redis_client import RedisClient
+from app.infrastructure.redis.hybrid_rate_limiter import HybridRateLimiter, _LocalBucket
+
+LIMIT = 10 ** 9  # 吞吐测试不触发拒绝
+PERIOD_MS = 60000
+
+
+def configure(address: str) -> None:
+    host, _, port = address.rpartition(":")
+    settings.REDIS_MODE = "standalone"
+    settings.REDIS_HOST = host
+    settings.REDIS_PORT = port
+    settings.REDIS_READ_FROM_REPLICAS = False
+    settings.REDIS_PREFIX = "bench_rate_limiter:"
+    # 压测时新建连接较多，放宽截止时间，避免建连超时触发熔断
+    settings.REDIS_READ_TIMEOUT_MS = settings.REDIS_WRITE_TIMEOUT_MS = settings.REDIS_PIPELINE_TIMEOUT_MS = 5000
+    settings.REDIS_BREAKER_SLOW_CALL_MS = settings.REDIS_BREAKER_SLOW_PIPELINE_MS = 5000
+
+
+async def sequential(client: RedisClient, requests: int) -> None:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.gcra("hot", LIMIT, PERIOD_MS)
+    redis_elapsed = time.perf_counter() - start
+
+    limiter = HybridRateLimiter(client, sync_interval=0.2, local_share=0.1)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await limiter.acquire("hot", LIMIT, PERIOD_MS)
+    hybrid_elapsed = time.perf_counter() - start
+    await limiter.close()
+    for name, elapsed in (("redis", redis_elapsed), ("hybrid", hybrid_elapsed)):
+        print(f"单键顺序 {name:6s} {requests / elapsed:9.0f} req/s  {elapsed / requests * 1e6:7.1f}us/req")
+
+
+async def concurrent(client: RedisClient, requests: int, keys: int, workers: int, concurrency: int) -> None:
+    async def drive(acquire) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            async with semaphore:
+                await acquire(i % workers, f"key{i % keys}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        return time.perf_counter() - start
+
+    async def redis_acquire(_, key):
+        await client.gcra(key, LIMIT, PERIOD_MS)
+
+    redis_elapsed = await drive(redis_acquire)
+
+    limiters = [HybridRateLimiter(client, sync_interval=0.2, local_share=0.1) for _ in range(workers)]
+
+    async def hybrid_acquire(worker, key):
+        await limiters[worker].acquire(key, LIMIT, PERIOD_MS)
+
+    hybrid_elapsed = await drive(hybrid_acquire)
+    for limiter in limiters:
+        await limiter.close()
+    round_trips = sum(limiter.get_stats()["sync_calls"] + limiter.get_stats()["batch_syncs"] for limiter in limiters)
+    print(f"{keys}键{workers}worker并发{concurrency} redis  {requests / redis_elapsed:9.0f} req/s  往返 {requests}")
+    print(f"{keys}键{workers}worker并发{concurrency} hybrid {requests / hybrid_elapsed:9.0f} req/s  往返 {round_trips}")
+
+
+async def flush_cost(client: RedisClient, idle_keys: int) -> None:
+    limiter = HybridRateLimiter(client, sync_interval=3600, local_share=0.5, max_keys=idle_keys + 10)
+    # 直接构造已对账、无待扣除消耗的空闲桶，避免逐键往返
+    for i in range(idle_keys):
+        bucket = _LocalBucket(LIMIT, PERIOD_MS, f"idle{i}")
+        bucket.synced = True
+        limiter._buckets[bucket.key] = bucket
+    await limiter.acquire("busy", LIMIT, PERIOD_MS)
+    await limiter.acquire("busy", LIMIT, PERIOD_MS)
+    start = time.perf_counter()
+    await limiter.flush()
+    elapsed = time.perf_counter() - start
+    print(f"{idle_keys}个空闲键时flush一个有消耗的键: {elapsed * 1000:.2f}ms")
+    await limiter.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis", default="127.0.0.1:6379")
+    parser.add_argument("--requests", type=int, default=40000)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--idle-keys", type=int, default=100000)
+    args = parser.parse_args()
+
+    configure(args.redis)
+    client = RedisClient()
+    await client.init()
+    try:
+        await sequential(client, args.requests // 4)
+        await concurrent(client, args.requests, args.keys, args.workers, args.concurrency)
+        await flush_cost(client, args.idle_keys)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
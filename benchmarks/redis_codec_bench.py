@@ -0,0 +1,63 @@
+"""
+Redis值编码对比：json / msgpack / msgpack+zlib 的体积与编解码耗时
+样本为用户缓存条目（User.model_dump），以及metadata放大20倍的大文档
+
+用法: python -m benchmarks.redis_codec_bench [--rounds 20000]
+"""
+import os
+import time
+import argparse
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.entities.user_entity import User
+from app.infrastructure.redis.codec import RedisCodec
+
+
+def sample_users() -> dict:
+    # model_construct不要求Beanie已初始化
+    user = User.model_construct(
+        wechat_openid="oAbCdEfGhIjKlMnOpQrStUvWxYz0",
+        wechat_unionid="uAbCdEfGhIjKlMnOpQrStUvWxYz0",
+        nickname="测试用户",
+        avatar_url="https://thirdwx.qlogo.cn/mmopen/vi_32/" + "x" * 96 + "/132",
+        name="tester",
+        bio="这是一段个人简介",
+        country="China",
+        province="Guangdong",
+        city="Shenzhen",
+        fcm_token={"device-1": ("f" * 152, "android")},
+    )
+    plain = user.model_dump(exclude={"password"})
+    large = dict(plain, metadata={f"key_{i}": {"note": "说明" * 20, "values": list(range(20))} for i in range(20)})
+    return {"plain doc": plain, "20x metadata": large}
+
+
+def timed(func, value, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(value)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    codecs = {
+        "json": RedisCodec("json"),
+        "msgpack": RedisCodec("msgpack", compress_threshold=0),
+        "msgpack+zlib": RedisCodec("msgpack", compress_threshold=1024),
+    }
+    for label, value in sample_users().items():
+        for name, codec in codecs.items():
+            encoded = codec.encode(value)
+            size = len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded)
+            encode_us = timed(codec.encode, value, args.rounds)
+            decode_us = timed(codec.decode, encoded, args.rounds)
+            print(f"{label:13s} {name:13s} {size:6d} B  encode {encode_us:6.1f}us  decode {decode_us:6.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+SharedMemoryCache与原UserCache内存层（cachetools.TTLCache）的对比
+1. 单进程get/set耗时
+2. 多个worker进程访问同一批热点token时的命中率：TTLCache每个进程各自缓存一份，共享内存只需一份
+
+用法: python -m benchmarks.shared_memory_cache_bench [--workers 4] [--keys 4000] [--requests 20000]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from cachetools import TTLCache
+from app.infrastructure.cache.shared_memory_cache import SharedMemoryCache
+
+
+def user_entry(i: int) -> dict:
+    """与UserCache内存层条目大小相当的数据"""
+    return {
+        "data": {
+            "id": f"{i:024x}",
+            "wechat_openid": f"o{i:027d}",
+            "nickname": f"用户{i}",
+            "avatar_url": f"https://thirdwx.qlogo.cn/mmopen/{i:064x}/132",
+            "gender": i % 3,
+            "city": "Shenzhen",
+            "is_deleted": False,
+            "metadata": {},
+        },
+        "memory_expires_at": time.monotonic() + 300,
+        "redis_expires_at": None,
+    }
+
+
+def make_cache(kind: str, args, path: str):
+    if kind == "shared":
+        return SharedMemoryCache("bench", maxsize=args.slots, ttl=300, slot_size=args.slot_size, path=path)
+    return TTLCache(maxsize=args.slots, ttl=300)
+
+
+def bench_latency(kind: str, args, path: str) -> None:
+    cache = make_cache(kind, args, path)
+    entries = [user_entry(i) for i in range(args.keys)]
+    keys = [f"token-{i}" for i in range(args.keys)]
+
+    start = time.perf_counter()
+    for key, entry in zip(keys, entries):
+        cache[key] = entry
+    set_us = (time.perf_counter() - start) / args.keys * 1e6
+
+    rng = random.Random(0)
+    lookups = [rng.choice(keys) for _ in range(args.requests)]
+    start = time.perf_counter()
+    hits = sum(cache.get(key) is not None for key in lookups)
+    get_us = (time.perf_counter() - start) / args.requests * 1e6
+    print(f"{kind:7s} set {set_us:6.1f}us  get {get_us:6.1f}us  hit {hits / args.requests:.1%}")
+    if kind == "shared":
+        cache.close()
+
+
+def worker(kind: str, args, path: str, seed: int, queue) -> None:
+    cache = make_cache(kind, args, path)
+    rng = random.Random(seed)
+    hits = 0
+    for _ in range(args.requests):
+        # 近似Zipf分布的热点访问
+        i = min(int(rng.paretovariate(1.2)) - 1, args.keys - 1)
+        key = f"token-{i}"
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            # 未命中时回源（Redis/数据库），写入本进程可见的内存层
+            cache[key] = user_entry(i)
+    queue.put(hits)
+    if kind == "shared":
+        cache.close()
+
+
+def bench_hit_rate(kind: str, args, path: str) -> None:
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(kind, args, path, seed, queue))
+        for seed in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    hits = sum(queue.get() for _ in processes)
+    for process in processes:
+        process.join()
+    total = args.requests * args.workers
+    print(f"{kind:7s} {args.workers}个worker 命中率 {hits / total:.1%}（回源 {total - hits} 次）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=4000)
+    parser.add_argument("--slots", type=int, default=4096)
+    parser.add_argument("--slot-size", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    try:
+        print("单进程耗时:")
+        for kind in ("ttl", "shared"):
+            path = os.path.join(directory, f"latency-{kind}.cache")
+            bench_latency(kind, args, path)
+        print("多进程命中率:")
+        for kind in ("ttl", "shared"):
+            path = os.path.join(directory, f"hit-rate-{kind}.cache")
+            bench_hit_rate(kind, args, path)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
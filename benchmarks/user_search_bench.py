@@ -0,0 +1,174 @@
+"""
+用户搜索与计数在大数据量下的开销：n-gram检索词 + $facet 与原无锚点$regex + count对比
+合成昵称：按Zipf分布抽取的常用汉字，约10%为拉丁字母昵称
+
+1. 默认（无需MongoDB）：按检索词统计倒排列表长度。查询扫描的索引键数不超过其最短检索词的倒排列表长度，
+   原$regex查询无法使用索引，每次都要扫描全部未删除用户
+2. --mongodb URL：写入临时数据库后实测 search_users、原$regex查询及count_active 的耗时，结束后删除该库
+
+用法: python -m benchmarks.user_search_bench [--users 1000000] [--queries 500] [--mongodb mongodb://localhost:27017]
+"""
+import os
+import re
+import time
+import uuid
+import random
+import itertools
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.utils.search_tokens import ngram_tokens, query_tokens
+
+# 常用字表，按Zipf分布抽取（越靠前出现越频繁）
+HANZI = "".join(chr(code) for code in range(0x4E00, 0x4E00 + 3000))
+LATIN = "abcdefghijklmnopqrstuvwxyz"
+
+
+def zipf_cum_weights(size: int, s: float = 1.1):
+    return list(itertools.accumulate(1 / (rank ** s) for rank in range(1, size + 1)))
+
+
+def make_nicknames(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    cum_weights = zipf_cum_weights(len(HANZI))
+    nicknames = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            nicknames.append("".join(rng.choices(LATIN, k=rng.randint(4, 10))))
+        else:
+            nicknames.append("".join(rng.choices(HANZI, cum_weights=cum_weights, k=rng.randint(2, 4))))
+    return nicknames
+
+
+def sample_keywords(nicknames, queries: int, seed: int = 1):
+    """从已有昵称中截取子串作为查询关键词，按类别分组"""
+    rng = random.Random(seed)
+    groups = {"单字": [], "两字": [], "三字": [], "拉丁三字母": []}
+    while min(len(keywords) for keywords in groups.values()) < queries:
+        nickname = rng.choice(nicknames)
+        if nickname.isascii():
+            if len(groups["拉丁三字母"]) < queries:
+                start = rng.randint(0, len(nickname) - 3)
+                groups["拉丁三字母"].append(nickname[start:start + 3])
+            continue
+        for label, length in (("单字", 1), ("两字", 2), ("三字", 3)):
+            if len(nickname) >= length and len(groups[label]) < queries:
+                start = rng.randint(0, len(nickname) - length)
+                groups[label].append(nickname[start:start + length])
+    return groups
+
+
+def percentile(values, q: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def simulate(nicknames, groups) -> None:
+    start = time.perf_counter()
+    postings = Counter()
+    keys = 0
+    for nickname in nicknames:
+        tokens = ngram_tokens(nickname)
+        keys += len(tokens)
+        postings.update(tokens)
+    elapsed = time.perf_counter() - start
+    print(f"分词 {len(nicknames) / elapsed:,.0f} 个/s，平均每个用户 {keys / len(nicknames):.1f} 个索引键")
+    print(f"{'关键词':12s} {'扫描键数中位数':>14s} {'p99':>10s}   原$regex扫描文档数")
+    for label, keywords in groups.items():
+        scanned = [min(postings[token] for token in query_tokens(keyword)) for keyword in keywords]
+        print(f"{label:12s} {statistics.median(scanned):>14,.0f} {percentile(scanned, 0.99):>10,}   {len(nicknames):,}")
+
+
+async def measure_mongodb(url: str, nicknames, groups) -> None:
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.entities import User, SystemConfig
+    from app.crud.user_crud import user_crud
+
+    client = AsyncIOMotorClient(url, tz_aware=True)
+    database = client[f"bench_{uuid.uuid4().hex[:12]}"]
+    try:
+        await init_beanie(database=database, document_models=[User, SystemConfig])
+        collection = User.get_motor_collection()
+        base = datetime.now(UTC)
+        start = time.perf_counter()
+        batch = []
+        for i, nickname in enumerate(nicknames):
+            batch.append({
+                "_id": str(uuid.uuid4()),
+                "created_at": base - timedelta(seconds=i),
+                "updated_at": base,
+                # 约5%的已删除用户
+                "is_deleted": i % 20 == 0,
+                "wechat_openid": f"o{i:027d}",
+                "wechat_unionid": f"u{i:027d}",
+                "nickname": nickname,
+                "name": "",
+                **user_crud._derived_fields({"nickname": nickname, "name": ""}),
+            })
+            if len(batch) == 10000:
+                await collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await collection.insert_many(batch, ordered=False)
+        print(f"写入 {len(nicknames):,} 个用户 {time.perf_counter() - start:.1f}s")
+
+        async def old_search(keyword: str):
+            pattern = re.escape(keyword)
+            query = {
+                "is_deleted": False,
+                "$or": [{"nickname": {"$regex": pattern, "$options": "i"}}, {"name": {"$regex": pattern, "$options": "i"}}],
+            }
+            await collection.find(query).sort([("created_at", -1)]).limit(20).to_list(length=20)
+            await collection.count_documents(query)
+
+        async def new_search(keyword: str):
+            await user_crud.search_users(keyword=keyword, limit=20)
+
+        print(f"{'关键词':12s} {'新 p50':>9s} {'新 p99':>9s} {'原 p50':>9s} {'原 p99':>9s}")
+        for label, keywords in groups.items():
+            timings = {}
+            # 原查询每次全表扫描，只取少量样本
+            for name, search, sample in (("new", new_search, keywords), ("old", old_search, keywords[:20])):
+                latencies = []
+                for keyword in sample:
+                    begin = time.perf_counter()
+                    await search(keyword)
+                    latencies.append(time.perf_counter() - begin)
+                timings[name] = latencies
+            print(f"{label:12s} "
+                  f"{statistics.median(timings['new']) * 1000:>7.1f}ms {percentile(timings['new'], 0.99) * 1000:>7.1f}ms "
+                  f"{statistics.median(timings['old']) * 1000:>7.1f}ms {percentile(timings['old'], 0.99) * 1000:>7.1f}ms")
+
+        latencies = []
+        for _ in range(20):
+            begin = time.perf_counter()
+            await user_crud.count_active()
+            latencies.append(time.perf_counter() - begin)
+        print(f"count_active p50 {statistics.median(latencies) * 1000:.1f}ms")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--mongodb", default=os.getenv("MONGODB_BENCH_URL"), help="实测用的MongoDB地址（会创建并删除临时库）")
+    args = parser.parse_args()
+
+    nicknames = make_nicknames(args.users)
+    groups = sample_keywords(nicknames, args.queries)
+    simulate(nicknames, groups)
+    if args.mongodb:
+        asyncio.run(measure_mongodb(args.mongodb, nicknames, groups))
+
+
+if __name__ == "__main__":
+    main()
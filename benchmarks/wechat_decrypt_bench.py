@@ -0,0 +1,79 @@
+"""
+微信加密数据解密吞吐：不同数据量下在事件循环内解密与asyncio.to_thread解密的耗时对比，
+以及解密期间事件循环的最长停顿（由一个每1ms唤醒一次的心跳协程测得）
+
+用法: python -m benchmarks.wechat_decrypt_bench [--sizes 256 4096 65536 1048576] [--rounds 200]
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import argparse
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from app.infrastructure.wechat.wechat_auth import _decrypt_payload
+
+
+def make_payload(size: int):
+    """构造明文约size字节的加密数据，返回 (session_key, encrypted_data, iv)，均为base64"""
+    key, iv = os.urandom(16), os.urandom(16)
+    plain = json.dumps({"nickName": "x" * size, "watermark": {"appid": "bench", "timestamp": 0}}).encode()
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    padded = padder.update(plain) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    encrypted = encryptor.update(padded) + encryptor.finalize()
+    return tuple(base64.b64encode(part).decode() for part in (key, encrypted, iv))
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event) -> None:
+    """记录事件循环两次唤醒间超出预期的最大间隔"""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append(now - last - 0.001)
+        last = now
+
+
+async def measure(payload, rounds: int, offload: bool):
+    stalls, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stalls, stop))
+    await asyncio.sleep(0.002)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if offload:
+            await asyncio.to_thread(_decrypt_payload, *payload)
+        else:
+            _decrypt_payload(*payload)
+            # 让出一次，使心跳协程能观测到每次解密造成的停顿
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed / rounds, max(stalls, default=0.0)
+
+
+async def run(sizes, rounds: int) -> None:
+    print(f"{'密文长度(base64)':>16s} {'内联':>10s} {'to_thread':>10s} {'吞吐':>12s} {'内联停顿':>10s} {'线程停顿':>10s}")
+    for size in sizes:
+        payload = make_payload(size)
+        n = max(5, min(rounds, rounds * 4096 // max(size, 1)))
+        _decrypt_payload(*payload)  # 预热
+        inline, inline_stall = await measure(payload, n, offload=False)
+        threaded, thread_stall = await measure(payload, n, offload=True)
+        throughput = len(payload[1]) / inline / 1024 / 1024
+        print(f"{len(payload[1]):>16d} {inline * 1e6:>8.1f}us {threaded * 1e6:>8.1f}us "
+              f"{throughput:>8.1f}MiB/s {inline_stall * 1000:>8.2f}ms {thread_stall * 1000:>8.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 4096, 16384, 65536, 1048576])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+登录时code2session请求的延迟：每次请求新建客户端（旧实现每次调用新建会话）与共享的长连接客户端对比
+在子进程中启动本地微信桩服务（benchmarks/wechat_stub.py），通过WechatAuth._request发起请求
+
+用法: python -m benchmarks.wechat_login_bench [--requests 1000] [--concurrency 20]
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import asyncio
+import argparse
+import statistics
+import subprocess
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.wechat_stub:app", "--port", str(port), "--log-level", "warning"],
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("桩服务启动失败")
+
+
+async def measure(request, requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await request(f"code{i}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    return latencies
+
+
+def report(label: str, latencies: list, elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(f"{label:28s} p50 {statistics.median(ordered) * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms  "
+          f"{len(ordered) / elapsed:7.0f} req/s")
+
+
+async def run(base_url: str, requests: int, concurrency: int) -> None:
+    from app.infrastructure.http.http_client import http_client
+    from app.infrastructure.wechat.wechat_auth import WechatAuth
+
+    # 微信接口日志按请求打印，压测时关闭
+    logging.getLogger("app").setLevel(logging.WARNING)
+    auth = WechatAuth()
+    url = f"{base_url}/sns/jscode2session"
+
+    async def per_call(code: str):
+        # 旧实现：每次调用新建会话，无法复用连接
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, params={"js_code": code})
+            response.json()
+
+    async def shared(code: str):
+        await auth._request(url, {"js_code": code})
+
+    await http_client.init()
+    try:
+        for label, request in (("每次新建客户端", per_call), ("共享客户端", shared)):
+            await measure(request, min(50, requests), concurrency)  # 预热
+            start = time.perf_counter()
+            latencies = await measure(request, requests, concurrency)
+            report(f"{label} 并发{concurrency}", latencies, time.perf_counter() - start)
+    finally:
+        await http_client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 20])
+    args = parser.parse_args()
+
+    port = free_port()
+    # 使用域名而非IP，覆盖DNS缓存
+    base_url = f"http://localhost:{port}"
+    os.environ["WECHAT_API_BASE_URL"] = base_url
+    os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+    stub = start_stub(port)
+    try:
+        for concurrency in args.concurrency:
+            asyncio.run(run(base_url, args.requests, concurrency))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
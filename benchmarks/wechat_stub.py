@@ -0,0 +1,25 @@
+"""
+本地微信接口桩服务（供基准测试使用）
+用法: python -m uvicorn benchmarks.wechat_stub:app --port 8900
+"""
+import uuid
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+async def jscode2session(request):
+    code = request.query_params.get("js_code", "")
+    if code.startswith("invalid"):
+        return JSONResponse({"errcode": 40029, "errmsg": "invalid code"})
+    return JSONResponse({"openid": f"o{code}", "session_key": uuid.uuid4().hex[:24], "unionid": f"u{code}"})
+
+
+async def token(request):
+    return JSONResponse({"access_token": uuid.uuid4().hex, "expires_in": 7200})
+
+
+app = Starlette(routes=[
+    Route("/sns/jscode2session", jscode2session),
+    Route("/cgi-bin/token", token),
+])
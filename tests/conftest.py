@@ -0,0 +1,89 @@
+"""
+测试公共设置
+设置MONGODB_TEST_URL（如mongodb://localhost:27017）时使用真实MongoDB的临时数据库，否则使用mongomock-motor
+（mongomock忽略partialFilterExpression，部分索引相关的断言以真实MongoDB为准）
+"""
+import os
+import uuid
+import asyncio
+import inspect
+from contextlib import contextmanager
+
+# 导入app.features时需要
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+import mongomock.collection
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from mongomock_motor import AsyncMongoMockClient
+from app.entities import User, SystemConfig
+
+MONGODB_TEST_URL = os.getenv("MONGODB_TEST_URL")
+
+# mongomock的批量写入不接受pymongo 4.9+ UpdateOne传入的sort参数
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+mongomock.collection.BulkOperationBuilder.add_update = (
+    lambda self, *args, sort=None, **kwargs: _add_update(self, *args, **kwargs)
+)
+
+
+def make_test_database():
+    """返回一个空的测试数据库"""
+    if MONGODB_TEST_URL:
+        client = AsyncIOMotorClient(MONGODB_TEST_URL, tz_aware=True)
+        return client[f"test_{uuid.uuid4().hex[:12]}"]
+    return AsyncMongoMockClient(tz_aware=True)["test"]
+
+
+async def init_test_db(database=None):
+    """初始化Beanie，返回数据库（真实MongoDB时用完需调用drop_test_db）"""
+    database = database if database is not None else make_test_database()
+    await init_beanie(database=database, document_models=[User, SystemConfig])
+    return database
+
+
+async def drop_test_db(database) -> None:
+    if MONGODB_TEST_URL:
+        await database.client.drop_database(database.name)
+
+
+class YieldingCollection:
+    """
+    包装集合：每次操作执行前后都让出事件循环
+    mongomock的操作中间从不让出，并发协程实际是逐个执行完的；包装后"先读后写"之间会穿插其他协程的读写，
+    与真实MongoDB的网络往返一样可能交错
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if not inspect.isawaitable(result):
+                return result
+
+            async def interleaved():
+                await asyncio.sleep(0)
+                value = await result
+                await asyncio.sleep(0)
+                return value
+            return interleaved()
+        return call
+
+
+@contextmanager
+def interleaved_operations(*models):
+    """在with块内让models的所有数据库操作前后让出事件循环（见YieldingCollection）"""
+    originals = [model.get_settings().motor_collection for model in models]
+    for model, collection in zip(models, originals):
+        model.get_settings().motor_collection = YieldingCollection(collection)
+    try:
+        yield
+    finally:
+        for model, collection in zip(models, originals):
+            model.get_settings().motor_collection = collection
@@ -0,0 +1,152 @@
+"""BaseCRUD的原子更新（设置MONGODB_TEST_URL时在真实MongoDB上运行）"""
+import enum
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.crud.system_config_crud import system_config_crud
+from app.crud.user_crud import user_crud
+from app.entities.system_config_entity import SystemConfig
+from app.entities.user_entity import User
+from app.schemas.system_config_schema import SystemConfigCreate
+from app.schemas.user_schema import UserCreate, UserUpdate
+from tests.conftest import MONGODB_TEST_URL, drop_test_db, init_test_db, interleaved_operations
+
+
+def test_concurrent_increment_field_loses_no_updates():
+    async def run():
+        database = await init_test_db()
+        try:
+            config = await system_config_crud.create(SystemConfigCreate(key="counter", value=0))
+            # 先读后写的实现在此会丢失增量：所有协程都在写入前读到同一个旧值
+            with interleaved_operations(SystemConfig):
+                await asyncio.gather(*[system_config_crud.increment_field(config.id, "version", 1) for _ in range(50)])
+            assert (await system_config_crud.get(config.id)).version == config.version + 50
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not MONGODB_TEST_URL, reason="mongomock不支持管道更新中的$$NOW")
+def test_delete_user_without_name_tombstones_name():
+    async def run():
+        database = await init_test_db()
+        try:
+            await User.get_motor_collection().insert_one({"_id": "no-name", "is_deleted": False, "metadata": {}})
+            assert await user_crud.delete("no-name")
+            document = await User.get_motor_collection().find_one({"_id": "no-name"})
+            assert document["is_deleted"] and document["name"].startswith("deleted__")
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+def test_bulk_update_invalidates_cached_users():
+    async def run():
+        database = await init_test_db()
+        try:
+            user, _ = await user_crud.get_or_create_wechat_user("bulk-openid", user_info={"nickName": "旧昵称"})
+            assert (await user_crud.get_users_by_ids([user.id]))[0].nickname == "旧昵称"
+            result = await user_crud.bulk_update([(user.id, {"nickname": "新昵称", "created_at": None, "id": "x"})])
+            assert result.ok and result.modified == 1
+            assert (await user_crud.get_users_by_ids([user.id]))[0].nickname == "新昵称"
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+def test_bulk_upsert_accepts_field_name_keys():
+    async def run():
+        database = await init_test_db()
+        try:
+            config = await system_config_crud.create(SystemConfigCreate(key="k1", value=1))
+            update = SystemConfig(id=config.id, key="k1", value=2)
+            result = await system_config_crud.bulk_upsert([update], keys=["id"])
+            assert result.ok and result.matched == 1 and result.upserted == 0
+            assert (await system_config_crud.get(config.id)).value == 2
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+def test_bulk_upsert_by_openid_invalidates_cached_users():
+    async def run():
+        database = await init_test_db()
+        try:
+            user, _ = await user_crud.get_or_create_wechat_user("upsert-openid", user_info={"nickName": "旧昵称"})
+            assert (await user_crud.get_users_by_ids([user.id]))[0].nickname == "旧昵称"
+            result = await user_crud.bulk_upsert(
+                [UserCreate(wechat_openid="upsert-openid", nickname="新昵称")], keys=["wechat_openid"]
+            )
+            assert result.ok and result.matched == 1
+            assert (await user_crud.get_users_by_ids([user.id]))[0].nickname == "新昵称"
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+class Level(enum.Enum):
+    LOW = "low"
+    HIGH = "high"
+
+
+class Limits(BaseModel):
+    level: Level = Level.LOW
+    burst: int = 10
+
+
+def test_bulk_writes_encode_values_like_find_one_and_update():
+    async def run():
+        database = await init_test_db()
+        try:
+            collection = SystemConfig.get_motor_collection()
+            configs = [
+                SystemConfigCreate(key="enum", value=Level.LOW),
+                SystemConfigCreate(key="model", value=Limits()),
+            ]
+            for validate in (True, False):
+                await collection.delete_many({})
+                result = await system_config_crud.bulk_create(configs, validate=validate)
+                assert result.ok and result.inserted == 2
+                values = {document["key"]: document["value"] async for document in collection.find({})}
+                assert values == {"enum": "low", "model": {"level": "low", "burst": 10}}
+
+            config = await collection.find_one({"key": "enum"})
+            result = await system_config_crud.bulk_update([(config["_id"], {"value": Limits(level=Level.HIGH)})])
+            assert result.ok and result.modified == 1
+            assert (await collection.find_one({"_id": config["_id"]}))["value"] == {"level": "high", "burst": 10}
+
+            result = await system_config_crud.bulk_upsert(
+                [SystemConfigCreate(key="enum", value=Level.HIGH), SystemConfigCreate(key="new", value=Level.LOW)],
+                keys=["key"],
+            )
+            assert result.ok and result.matched == 1 and result.upserted == 1
+            values = {document["key"]: document["value"] async for document in collection.find({})}
+            assert values["enum"] == "high" and values["new"] == "low"
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not MONGODB_TEST_URL, reason="mongomock不支持管道更新中的$$NOW")
+def test_bulk_soft_delete_renames_and_invalidates_users():
+    async def run():
+        database = await init_test_db()
+        try:
+            user, _ = await user_crud.get_or_create_wechat_user("bulk-delete")
+            await user_crud.update(user.id, UserUpdate(name="alice"))
+            assert len(await user_crud.get_users_by_ids([user.id])) == 1
+            result = await user_crud.bulk_soft_delete([user.id])
+            assert result.ok and result.modified == 1
+            document = await User.get_motor_collection().find_one({"_id": user.id})
+            assert document["is_deleted"] and document["name"].startswith("deleted_alice_")
+            assert await user_crud.get_users_by_ids([user.id]) == []
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+"""CircuitBreaker慢调用计数"""
+import asyncio
+from app.infrastructure.redis.circuit_breaker import CircuitBreaker
+
+
+async def probe():
+    return True
+
+
+def test_slow_call_threshold_per_operation():
+    async def run():
+        breaker = CircuitBreaker("test", probe, failure_threshold=3, slow_call_threshold=0.1, reset_timeout=60)
+        try:
+            # 批量操作按自身阈值判断：0.2秒的pipeline不算慢调用
+            for _ in range(10):
+                breaker.record_success(0.2, slow_call_threshold=0.3)
+            assert breaker.state == CircuitBreaker.CLOSED
+            # 单命令0.2秒超过默认SLO，连续3次熔断
+            for _ in range(3):
+                breaker.record_success(0.2)
+            assert breaker.state == CircuitBreaker.OPEN
+        finally:
+            await breaker.close()
+
+    asyncio.run(run())
@@ -0,0 +1,23 @@
+"""公开的/health只返回状态，详细指标需要X-Metrics-Token"""
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+
+
+def test_health_hides_metrics(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    client = TestClient(app)
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert set(response.json()["data"]) == {"status"}
+
+    assert client.get("/internal/metrics").status_code == 404
+    assert client.get("/internal/metrics", headers={"X-Metrics-Token": "wrong"}).status_code == 404
+    response = client.get("/internal/metrics", headers={"X-Metrics-Token": "secret"})
+    assert response.status_code == 200 and "user_cache" in response.json()["data"]
+
+
+def test_metrics_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    client = TestClient(app)
+    assert client.get("/internal/metrics", headers={"X-Metrics-Token": ""}).status_code == 404
@@ -0,0 +1,43 @@
+"""CachingDNSBackend：依次尝试解析到的所有地址"""
+import asyncio
+import httpcore
+import pytest
+from app.infrastructure.http.http_client import CachingDNSBackend
+
+
+class FakeBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, dead):
+        self.dead = dead
+        self.tried = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.tried.append(host)
+        if host in self.dead:
+            raise OSError(101, "Network is unreachable")
+        return host
+
+
+def make_backend(addresses, dead):
+    fake = FakeBackend(dead)
+    backend = CachingDNSBackend(fake, ttl=60)
+
+    async def resolve(host, port):
+        backend._cache[(host, port)] = (addresses, float("inf"))
+        return addresses
+
+    backend._resolve = resolve
+    return backend, fake
+
+
+def test_falls_back_to_next_address():
+    backend, fake = make_backend(["::1", "127.0.0.1"], dead={"::1"})
+    assert asyncio.run(backend.connect_tcp("example.com", 443)) == "127.0.0.1"
+    assert fake.tried == ["::1", "127.0.0.1"]
+    # 失败的解析结果被清除，下次重新解析
+    assert ("example.com", 443) not in backend._cache
+
+
+def test_all_addresses_failing_raises_connect_error():
+    backend, _ = make_backend(["::1", "10.0.0.1"], dead={"::1", "10.0.0.1"})
+    with pytest.raises(httpcore.ConnectError):
+        asyncio.run(backend.connect_tcp("example.com", 443))
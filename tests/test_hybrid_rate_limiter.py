@@ -0,0 +1,94 @@
+"""HybridRateLimiter本地桶的淘汰（需要本地redis-server，未配置REDIS_TEST_HOST时跳过）"""
+import os
+import time
+import asyncio
+import pytest
+from app.core.config import settings
+from app.infrastructure.redis.redis_client import RedisClient
+from app.infrastructure.redis.hybrid_rate_limiter import HybridRateLimiter
+
+STANDALONE = os.getenv("REDIS_TEST_HOST")
+pytestmark = pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    host, _, port = STANDALONE.rpartition(":")
+    for name, value in {"REDIS_MODE": "standalone", "REDIS_HOST": host, "REDIS_PORT": port,
+                        "REDIS_READ_FROM_REPLICAS": False, "REDIS_PREFIX": "test_hybrid:"}.items():
+        monkeypatch.setattr(settings, name, value)
+    return RedisClient()
+
+
+def test_hot_key_is_not_expired_while_accessed(client):
+    limiter = HybridRateLimiter(client, sync_interval=60, local_share=0.5, idle_ttl=0.3)
+
+    async def run():
+        await client.init()
+        try:
+            await client.delete("rl:hot")
+            await limiter.acquire("rl:hot", 100, 60000)
+            bucket = limiter._buckets["rl:hot"]
+            deadline = time.monotonic() + 0.6
+            while time.monotonic() < deadline:
+                await limiter.acquire("rl:hot", 100, 60000)
+                await asyncio.sleep(0.05)
+            assert limiter._buckets.get("rl:hot") is bucket
+        finally:
+            await limiter.close()
+            await client.delete("rl:hot")
+            await client.close()
+
+    asyncio.run(run())
+
+
+def test_evicted_bucket_pending_is_flushed(client):
+    limiter = HybridRateLimiter(client, sync_interval=60, local_share=0.5, max_keys=1)
+
+    async def run():
+        await client.init()
+        try:
+            await client.delete("rl:a", "rl:b")
+            for _ in range(10):
+                assert (await limiter.acquire("rl:a", 100, 60000))[0]
+            # 新键挤出rl:a，其本地消耗（首次对账后的9次）不能丢失
+            await limiter.acquire("rl:b", 100, 60000)
+            assert "rl:a" not in limiter._buckets
+            await limiter.flush()
+            # 新桶首次对账时读到全局剩余额度：100 - 10 - 本次1
+            allowed, remaining, _, _ = await limiter.acquire("rl:a", 100, 60000)
+            assert allowed and remaining == 89
+        finally:
+            await limiter.close()
+            await client.delete("rl:a", "rl:b")
+            await client.close()
+
+    asyncio.run(run())
+
+
+def test_flush_only_touches_dirty_keys(client):
+    limiter = HybridRateLimiter(client, sync_interval=60, local_share=0.5)
+    keys = [f"rl:idle{i}" for i in range(20)]
+
+    async def run():
+        await client.init()
+        try:
+            await client.delete("rl:busy", *keys)
+            for key in keys:
+                await limiter.acquire(key, 100, 60000)
+            await limiter.flush()
+            assert not limiter._dirty
+            for _ in range(5):
+                await limiter.acquire("rl:busy", 100, 60000)
+            assert list(limiter._dirty) == ["rl:busy"]
+            flushed = limiter.get_stats()["batch_keys"]
+            await limiter.flush()
+            assert limiter.get_stats()["batch_keys"] == flushed + 1 and not limiter._dirty
+            allowed, remaining, _, _ = await limiter.acquire("rl:busy", 100, 60000, cost=0)
+            assert remaining == 95
+        finally:
+            await limiter.close()
+            await client.delete("rl:busy", *keys)
+            await client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,151 @@
+"""
+RedisClient三种部署模式的集成测试，需要本地redis-server，未配置对应环境变量时跳过：
+    REDIS_TEST_HOST=127.0.0.1:6379        standalone主节点
+    REDIS_TEST_REPLICA=127.0.0.1:6380     主节点的副本（replicaof）
+    REDIS_TEST_SENTINELS=127.0.0.1:26379  监控mymaster（即上述主节点）的哨兵
+    REDIS_TEST_CLUSTER_NODES=127.0.0.1:7000,127.0.0.1:7001,127.0.0.1:7002
+"""
+import os
+import asyncio
+import time
+import pytest
+from app.core.config import settings
+from app.entities.user_entity import User
+from app.infrastructure.redis import redis_client as redis_client_module
+from app.infrastructure.redis import user_cache as user_cache_module
+from app.infrastructure.redis.redis_client import RedisClient
+from tests.conftest import init_test_db
+
+STANDALONE = os.getenv("REDIS_TEST_HOST")
+REPLICA = os.getenv("REDIS_TEST_REPLICA")
+SENTINELS = os.getenv("REDIS_TEST_SENTINELS")
+CLUSTER_NODES = os.getenv("REDIS_TEST_CLUSTER_NODES")
+
+
+def configure(monkeypatch, mode: str, replicas: str = "") -> None:
+    host, _, port = (STANDALONE or "127.0.0.1:6379").rpartition(":")
+    values = {
+        "REDIS_MODE": mode,
+        "REDIS_HOST": host,
+        "REDIS_PORT": port,
+        "REDIS_SENTINELS": SENTINELS or "",
+        "REDIS_SENTINEL_SERVICE": "mymaster",
+        "REDIS_CLUSTER_NODES": CLUSTER_NODES or "",
+        "REDIS_REPLICA_HOSTS": replicas,
+        "REDIS_READ_FROM_REPLICAS": bool(replicas) or mode != "standalone",
+        "REDIS_PREFIX": "test_redis_client:",
+        "REDIS_DEGRADED_START": False,
+    }
+    for name, value in values.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+async def exercise(client: RedisClient) -> None:
+    await client.init()
+    assert client.is_healthy
+    try:
+        values = {f"k{i}": {"i": i} for i in range(20)}
+        await client.mset_json(values, 60)
+        assert await client.mget_json(list(values)) == list(values.values())
+        value, ttl = await client.get_json_with_ttl("k1")
+        assert value == {"i": 1} and 0 < ttl <= 60
+        await client.delete("counter")
+        assert await client.incr("counter") == 1
+        # 副本读最终一致
+        for _ in range(50):
+            if await client.get_json("k2", replica=True) == {"i": 2}:
+                break
+            await asyncio.sleep(0.02)
+        else:
+            pytest.fail("副本未同步")
+        await client.delete(*values, "counter")
+    finally:
+        await client.close()
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_standalone(monkeypatch):
+    configure(monkeypatch, "standalone", REPLICA or "")
+    asyncio.run(exercise(RedisClient()))
+
+
+@pytest.mark.skipif(not SENTINELS, reason="未配置REDIS_TEST_SENTINELS")
+def test_sentinel(monkeypatch):
+    configure(monkeypatch, "sentinel")
+    asyncio.run(exercise(RedisClient()))
+
+
+@pytest.mark.skipif(not CLUSTER_NODES, reason="未配置REDIS_TEST_CLUSTER_NODES")
+def test_cluster(monkeypatch):
+    configure(monkeypatch, "cluster")
+    asyncio.run(exercise(RedisClient()))
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_token_lookup_reads_primary(monkeypatch):
+    """其他worker在登录后立即按token查询：副本不可用（或复制延迟）时也必须命中"""
+    # 副本指向无服务的端口，任何副本读都会失败
+    configure(monkeypatch, "standalone", "127.0.0.1:1")
+    client = RedisClient()
+    monkeypatch.setattr(redis_client_module, "redis_client", client)
+    monkeypatch.setattr(user_cache_module, "redis_client", client)
+
+    async def run():
+        await init_test_db()
+        await client.init()
+        login_worker = user_cache_module.UserCache()
+        other_worker = user_cache_module.UserCache()
+        try:
+            user = User(wechat_openid="openid", nickname="tester")
+            await login_worker.cache_user_by_token("token-primary", user)
+            await login_worker._writer.flush()
+            cached = await other_worker.get_user_by_token("token-primary")
+            assert cached is not None and cached.id == user.id
+        finally:
+            await login_worker.close()
+            await other_worker.close()
+            await client.delete("token-primary")
+            await client.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_refresh_ahead_keeps_session_ttl(monkeypatch):
+    """提前刷新只更新用户数据，不延长会话；会话已过期的token不会被刷新重新写入"""
+    configure(monkeypatch, "standalone")
+    client = RedisClient()
+    monkeypatch.setattr(redis_client_module, "redis_client", client)
+    monkeypatch.setattr(user_cache_module, "redis_client", client)
+
+    async def run():
+        await init_test_db()
+        await client.init()
+        cache = user_cache_module.UserCache()
+        try:
+            user = User(wechat_openid="openid-refresh", nickname="old")
+            await user.insert()
+            await cache.cache_user_by_token("token-refresh", user)
+            await cache._writer.flush()
+            await client.expire("token-refresh", 100)
+            user.nickname = "new"
+            await user.save()
+
+            await cache._refresh("token-refresh", user.id, time.monotonic() + 100)
+            await cache._writer.flush()
+            data, ttl = await client.get_json_with_ttl("token-refresh")
+            assert data["nickname"] == "new" and 0 < ttl <= 100
+            assert cache._token_index["token-refresh"][0] == user.id
+            assert cache._memory_cache.get("token-refresh")["redis_expires_at"] <= time.monotonic() + 100
+
+            # Redis中会话已过期：刷新不会重新创建
+            await client.delete("token-refresh")
+            await cache._refresh("token-refresh", user.id, time.monotonic() + 100)
+            await cache._writer.flush()
+            assert await client.get_json("token-refresh") is None
+        finally:
+            await cache.close()
+            await client.delete("token-refresh")
+            await client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,240 @@
+"""TwoTierCache：返回值隔离与失效/回源竞争（配置REDIS_TEST_HOST时同时覆盖Redis层，REDIS_TEST_REPLICA为其副本）"""
+import os
+import asyncio
+import pytest
+from app.core.config import settings
+from app.infrastructure.redis import two_tier_cache
+from app.infrastructure.redis.redis_client import RedisClient
+
+STANDALONE = os.getenv("REDIS_TEST_HOST")
+REPLICA = os.getenv("REDIS_TEST_REPLICA")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def client(request, monkeypatch):
+    if request.param == "redis" and not STANDALONE:
+        pytest.skip("未配置REDIS_TEST_HOST")
+    host, _, port = (STANDALONE or "127.0.0.1:1").rpartition(":")
+    for name, value in {
+        "REDIS_MODE": "standalone", "REDIS_HOST": host, "REDIS_PORT": port,
+        "REDIS_READ_FROM_REPLICAS": False, "REDIS_PREFIX": "test_two_tier:",
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    client = RedisClient()
+    monkeypatch.setattr(two_tier_cache, "redis_client", client)
+    return client
+
+
+def make_cache(client, name):
+    cache = two_tier_cache.TwoTierCache(name, ttl=60, jitter=0)
+    cache.redis = client
+    return cache
+
+
+def test_l1_hit_returns_copy(client, request):
+    cache = make_cache(client, f"copy_{request.node.callspec.id}")
+
+    async def run():
+        await client.init()
+        try:
+            async def loader():
+                return {"items": [1, 2]}
+            first = await cache.get_or_load("k", loader)
+            first["items"].append(3)
+            assert await cache.get_or_load("k", loader) == {"items": [1, 2]}
+        finally:
+            await cache.invalidate("k")
+            await client.close()
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_load_is_not_written_back(client, request):
+    cache = make_cache(client, f"race_{request.node.callspec.id}")
+    value = {"name": "old"}
+
+    async def run():
+        await client.init()
+        try:
+            started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_loader():
+                snapshot = dict(value)
+                started.set()
+                await release.wait()
+                return snapshot
+
+            loading = asyncio.create_task(cache.get_or_load("k", slow_loader, tags=["user:1"]))
+            await started.wait()
+            # 回源读到旧值后数据被更新并失效
+            value["name"] = "new"
+            await two_tier_cache.invalidate_tags("user:1")
+            release.set()
+            assert (await loading)["name"] == "old"
+
+            async def loader():
+                return dict(value)
+            assert (await cache.get_or_load("k", loader, tags=["user:1"]))["name"] == "new"
+            assert cache.get_stats()["stale_writes"] == 1
+        finally:
+            await cache.invalidate("k")
+            await client.close()
+
+    asyncio.run(run())
+
+
+def redis_test_client(monkeypatch) -> RedisClient:
+    host, _, port = STANDALONE.rpartition(":")
+    for name, value in {"REDIS_MODE": "standalone", "REDIS_HOST": host, "REDIS_PORT": port,
+                        "REDIS_READ_FROM_REPLICAS": False, "REDIS_PREFIX": "test_two_tier:"}.items():
+        monkeypatch.setattr(settings, name, value)
+    return RedisClient()
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_invalidation_from_other_process_removes_stale_l2(monkeypatch):
+    client = redis_test_client(monkeypatch)
+    cache = make_cache(client, "race_remote")
+
+    async def run():
+        await client.init()
+        try:
+            calls = []
+
+            async def loader():
+                calls.append(1)
+                if len(calls) == 1:
+                    # 其他进程在本次回源期间失效了该标签
+                    await client.incr(two_tier_cache.TwoTierCache._tag_version_key("user:2"))
+                return {"n": len(calls)}
+
+            assert await cache.get_or_load("k", loader, tags=["user:2"]) == {"n": 1}
+            assert await client.get_raw(cache._redis_key("k")) is None
+            assert await cache.get_or_load("k", loader, tags=["user:2"]) == {"n": 2}
+        finally:
+            await cache.invalidate("k")
+            await client.delete(two_tier_cache.TwoTierCache._tag_version_key("user:2"))
+            await client.close()
+
+    asyncio.run(run())
+
+
+def two_workers(client, name, **options):
+    """同名缓存的两个实例，模拟两个worker进程"""
+    first = two_tier_cache.TwoTierCache(name, ttl=60, jitter=0, lock_ms=3000, **options)
+    two_tier_cache._caches.pop(name)
+    second = two_tier_cache.TwoTierCache(name, ttl=60, jitter=0, lock_ms=3000, **options)
+    first.redis = second.redis = client
+    return first, second
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_waiter_takes_over_when_holder_fails(monkeypatch):
+    client = redis_test_client(monkeypatch)
+    holder, waiter = two_workers(client, "takeover")
+
+    async def run():
+        await client.init()
+        try:
+            async def failing_loader():
+                await asyncio.sleep(0.15)
+                raise ValueError("boom")
+
+            async def loader():
+                return {"ok": 1}
+
+            holding = asyncio.create_task(holder.get_or_load("k", failing_loader))
+            await asyncio.sleep(0.05)
+            start = asyncio.get_running_loop().time()
+            assert await waiter.get_or_load("k", loader) == {"ok": 1}
+            # 持锁方失败后立即接手，不必等到锁过期（3秒）
+            assert asyncio.get_running_loop().time() - start < 1
+            with pytest.raises(ValueError):
+                await holding
+        finally:
+            await holder.invalidate("k")
+            await client.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not STANDALONE, reason="未配置REDIS_TEST_HOST")
+def test_cached_error_fails_waiters_and_retries(monkeypatch):
+    client = redis_test_client(monkeypatch)
+    holder, waiter = two_workers(client, "cached_error", error_types=(LookupError,), error_ttl=5)
+
+    async def run():
+        await client.init()
+        try:
+            calls = []
+
+            async def failing_loader():
+                calls.append(1)
+                await asyncio.sleep(0.15)
+                raise LookupError("invalid code")
+
+            holding = asyncio.create_task(holder.get_or_load("k", failing_loader))
+            await asyncio.sleep(0.05)
+            start = asyncio.get_running_loop().time()
+            with pytest.raises(LookupError, match="invalid code"):
+                await waiter.get_or_load("k", failing_loader)
+            assert asyncio.get_running_loop().time() - start < 1
+            with pytest.raises(LookupError):
+                await holding
+            # 重试在error_ttl内直接失败，不再回源
+            with pytest.raises(LookupError):
+                await waiter.get_or_load("k", failing_loader)
+            assert len(calls) == 1 and waiter.get_stats()["cached_errors"] == 2
+        finally:
+            await holder.invalidate("k")
+            await client.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not (STANDALONE and REPLICA), reason="未配置REDIS_TEST_HOST/REDIS_TEST_REPLICA")
+def test_stale_tolerant_reads_go_to_replica(monkeypatch):
+    client = redis_test_client(monkeypatch)
+    monkeypatch.setattr(settings, "REDIS_READ_FROM_REPLICAS", True)
+    monkeypatch.setattr(settings, "REDIS_REPLICA_HOSTS", REPLICA)
+    holder, waiter = two_workers(client, "replica_reads", replica_reads=True)
+    replica_reads = []
+    mget_raw = client.mget_raw
+
+    async def spy(keys, replica=False):
+        replica_reads.append(replica)
+        return await mget_raw(keys, replica)
+
+    monkeypatch.setattr(client, "mget_raw", spy)
+
+    async def run():
+        await client.init()
+        try:
+            async def slow_loader():
+                await asyncio.sleep(0.1)
+                return {"v": 1}
+
+            holding = asyncio.create_task(holder.get_or_load("k", slow_loader))
+            await asyncio.sleep(0.02)
+            # 等待持锁方期间只轮询副本
+            assert await waiter.get_or_load("k", slow_loader) == {"v": 1}
+            assert await holding == {"v": 1}
+            assert replica_reads and all(replica_reads)
+            assert waiter.get_stats()["loads"] == 0
+
+            # 新worker（L1为空）直接从副本读到值
+            two_tier_cache._caches.pop("replica_reads")
+            reader = two_tier_cache.TwoTierCache("replica_reads", ttl=60, jitter=0, replica_reads=True)
+            reader.redis = client
+            for _ in range(50):
+                if await client.get_raw(waiter._redis_key("k"), replica=True) is not None:
+                    break
+                await asyncio.sleep(0.02)
+            assert await reader.get_or_load("k", slow_loader) == {"v": 1}
+            assert reader.get_stats()["replica_hits"] == 1
+        finally:
+            await holder.invalidate("k")
+            await client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,141 @@
+"""UserCRUD与User索引迁移（设置MONGODB_TEST_URL时在真实MongoDB上运行）"""
+import asyncio
+from datetime import datetime, timedelta, UTC
+import pytest
+from app.core.migrations import drop_text_indexes, merge_duplicate_users, migrate_indexes
+from app.crud.user_crud import user_crud
+from app.entities.user_entity import User
+from tests.conftest import MONGODB_TEST_URL, drop_test_db, init_test_db, interleaved_operations, make_test_database
+
+
+def test_parallel_get_or_create_creates_one_user():
+    async def run():
+        database = await init_test_db()
+        try:
+            # 并发创建依赖唯一索引兜底
+            indexes = await User.get_motor_collection().index_information()
+            assert indexes["wechat_openid_unique"].get("unique")
+            assert indexes["wechat_unionid_unique"].get("unique")
+            # 先查询后插入的实现在此会让所有协程都查不到用户再各自插入
+            with interleaved_operations(User):
+                results = await asyncio.gather(*[
+                    user_crud.get_or_create_wechat_user("openid-concurrent", unionid="unionid-concurrent")
+                    for _ in range(20)
+                ])
+            assert await User.find({"wechat_openid": "openid-concurrent"}).count() == 1
+            assert sum(created for _, created in results) == 1
+            assert len({user.id for user, _ in results}) == 1
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+async def insert_duplicates(collection):
+    """旧版本的索引与先查询后插入产生的重复数据"""
+    await collection.create_index([("wechat_openid", 1)])
+    await collection.create_index([("wechat_unionid", 1)])
+    await collection.create_index([("created_at", -1)])
+    await collection.create_index([("is_deleted", 1)])
+    await collection.create_index([("nickname", "text"), ("name", "text")])
+    now = datetime.now(UTC)
+    await collection.insert_many([
+        {"_id": "first", "wechat_openid": "dup", "wechat_unionid": "", "nickname": "",
+         "fcm_token": {"a": ["t1", "ios"]}, "is_deleted": False, "created_at": now - timedelta(days=2),
+         "metadata": {}},
+        {"_id": "second", "wechat_openid": "dup", "wechat_unionid": "u1", "nickname": "张三",
+         "fcm_token": {"b": ["t2", "android"]}, "is_deleted": False, "created_at": now - timedelta(days=1),
+         "metadata": {}},
+        {"_id": "other", "wechat_openid": "single", "is_deleted": False, "created_at": now, "metadata": {}},
+        # 同一unionid在另一个应用下的账号
+        {"_id": "third", "wechat_openid": "dup-app2", "wechat_unionid": "u1", "name": "zhangsan",
+         "is_deleted": False, "created_at": now, "metadata": {}},
+    ])
+
+
+def test_merge_duplicate_openids():
+    async def run():
+        database = make_test_database()
+        collection = database[User.Settings.name]
+        try:
+            await insert_duplicates(collection)
+            assert await merge_duplicate_users(collection, "wechat_openid") == 1
+            keeper = await collection.find_one({"_id": "first"})
+            assert keeper["nickname"] == "张三" and keeper["wechat_unionid"] == "u1"
+            assert "张三" in keeper["nickname_tokens"]
+            assert set(keeper["fcm_token"]) == {"a", "b"}
+            duplicate = await collection.find_one({"_id": "second"})
+            assert duplicate["is_deleted"] and duplicate["metadata"]["merged_into"] == "first"
+            # 幂等
+            assert await merge_duplicate_users(collection, "wechat_openid") == 0
+            # openid合并后first带上了unionid，再按unionid合并third
+            assert await merge_duplicate_users(collection, "wechat_unionid") == 1
+            keeper = await collection.find_one({"_id": "first"})
+            assert keeper["wechat_openid"] == "dup" and keeper["name"] == "zhangsan"
+            assert (await collection.find_one({"_id": "third"}))["metadata"]["merged_into"] == "first"
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+def test_drop_legacy_text_index():
+    async def run():
+        database = make_test_database()
+        collection = database[User.Settings.name]
+        try:
+            await collection.create_index([("nickname", "text"), ("name", "text")])
+            assert await drop_text_indexes(collection) == ["nickname_text_name_text"]
+            assert "nickname_text_name_text" not in await collection.index_information()
+            assert await drop_text_indexes(collection) == []
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not MONGODB_TEST_URL, reason="mongomock忽略partialFilterExpression，需要真实MongoDB")
+def test_migration_builds_unique_index_on_duplicated_collection():
+    async def run():
+        database = make_test_database()
+        collection = database[User.Settings.name]
+        try:
+            await insert_duplicates(collection)
+            await migrate_indexes(database)
+            await init_test_db(database)
+            indexes = await collection.index_information()
+            assert "wechat_openid_unique" in indexes and "wechat_openid_1" not in indexes
+            assert "wechat_unionid_unique" in indexes and "wechat_unionid_1" not in indexes
+            assert not {"created_at_-1", "is_deleted_1", "nickname_text_name_text"} & set(indexes)
+            assert (await user_crud.get_by_wechat_unionid("u1")).id == "first"
+            assert (await user_crud.get_by_wechat_openid("dup")).id == "first"
+            # 再次启动时索引已存在，不再扫描
+            await migrate_indexes(database)
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())
+
+
+def test_list_users_keyset_pages_through_equal_timestamps():
+    async def run():
+        database = await init_test_db()
+        try:
+            created_at = datetime(2024, 1, 1, tzinfo=UTC)
+            await User.get_motor_collection().insert_many([
+                {"_id": f"user-{i}", "wechat_openid": f"openid-{i}", "wechat_unionid": f"unionid-{i}",
+                 "created_at": created_at, "is_deleted": i == 2}
+                for i in range(5)
+            ])
+            seen, last_created_at, last_id, has_more = [], None, None, True
+            while has_more:
+                users, has_more = await user_crud.list_users_keyset(last_created_at, last_id, limit=2, fields=["created_at"])
+                seen.extend(user.id for user in users)
+                last_created_at, last_id = users[-1].created_at, users[-1].id
+            assert seen == ["user-4", "user-3", "user-1", "user-0"]
+            with pytest.raises(ValueError):
+                await user_crud.list_users_keyset(last_created_at=created_at)
+        finally:
+            await drop_test_db(database)
+
+    asyncio.run(run())